@@ -1,4 +1,4 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, current_app
 # flasgger is optional in production; if missing, disable Swagger UI but keep app running.
 try:
     from flasgger import Swagger
@@ -6,11 +6,26 @@ try:
 except Exception:
     Swagger = None
     _HAS_FLASGGER = False
-from database import db, init_db, Ticker, Price
-from finance_service import FinanceService
+from database import db, init_db, Ticker, Price, PeriodPrice, TickerStats, ScanSnapshot, SignalTransition
+from finance_service import FinanceService, STATS_FIELDS, STATS_TYPES
+from scan_engine import ScanEngine, MAX_WORKERS, clamp_workers
+from signal_cache import SignalCache, CacheCounters, DEFAULT_MAX_ENTRIES, source_version
+from single_flight import SingleFlight
+import backtest
+import finance_service
+import indicators
+import scan_delta
+import screener
+import strategies
+from strategies import (resolve, normalize_params, params_key, format_last_sync, STRATEGIES,
+                        UnknownStrategyError, InvalidParameterError)
+import hashlib
 import os
+import threading
 import time
-from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
 app = Flask(__name__)
 # Use DATABASE_URL env var if provided (for deployment platforms like Render).
@@ -122,6 +137,10 @@ def handle_tickers():
 def delete_ticker(ticker_id):
     ticker = Ticker.query.get_or_404(ticker_id)
     Price.query.filter_by(ticker_id=ticker.id).delete()
+    PeriodPrice.query.filter_by(ticker_id=ticker.id).delete()
+    TickerStats.query.filter_by(ticker_id=ticker.id).delete()
+    ScanSnapshot.query.filter_by(ticker_id=ticker.id).delete()
+    SignalTransition.query.filter_by(ticker_id=ticker.id).delete()
     db.session.delete(ticker)
     db.session.commit()
     return jsonify({'message': 'Ticker deleted'})
@@ -144,35 +163,739 @@ def refresh_data():
     results = []
     delay_between_tickers = 0.3  # Segundos de espera entre tickers para evitar bloqueos
 
-    # Invalidar caché antes de refrescar datos
-    get_cached_signals.cache_clear()
-    
+    changed = []
     for i, t in enumerate(tickers):
         count = FinanceService.sync_ticker_data(t, max_retries=3, retry_delay=2)
+        if count:
+            # Solo se invalidan los tickers con barras nuevas (en todos los workers)
+            signals_cache.invalidate(t.id)
+            changed.append(t.id)
         results.append({'symbol': t.symbol, 'new_records': count})
         
         # Agregar delay entre tickers (excepto el último)
         if i < len(tickers) - 1:
             time.sleep(delay_between_tickers)
-    
+
+    # Recalcular en segundo plano solo los tickers que cambiaron y después guardar la foto del día
+    schedule_warmup(changed)
+    schedule_snapshot()
     return jsonify(results)
 
-@lru_cache(maxsize=128)
-def get_cached_signals(ticker_id, strategy, cache_key):
-    ticker = db.session.get(Ticker, ticker_id)
-    return FinanceService.get_signals(ticker, strategy=strategy)
+# Precálculo de señales en segundo plano: un hilo que procesa los pedidos en orden
+_warmup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='warmup')
+_warmup_lock = threading.Lock()
+warmup_status = {'running': False, 'pending': 0, 'done': 0, 'total': 0, 'tickers': 0, 'last_finished': None}
+
+def warmup_strategies():
+    """Estrategias a precalcular: cada una sola y 'all' (la que pide el dashboard)."""
+    return [(name,) for name in STRATEGIES] + [resolve('all')]
+
+def schedule_warmup(ticker_ids):
+    """Encola el recálculo de señales de ``ticker_ids`` para todas las estrategias."""
+    if not ticker_ids:
+        return None
+    strategies = warmup_strategies()
+    with _warmup_lock:
+        if not warmup_status['running']:
+            # Nueva tanda: el progreso se cuenta desde cero
+            warmup_status.update(done=0, total=0, tickers=0)
+        warmup_status['pending'] += 1
+        warmup_status['running'] = True
+        warmup_status['total'] += len(strategies)
+        warmup_status['tickers'] += len(ticker_ids)
+    return _warmup_executor.submit(warm_signals_cache, current_app._get_current_object(), list(ticker_ids), strategies)
+
+def warm_signals_cache(flask_app, ticker_ids, strategies):
+    try:
+        with flask_app.app_context():
+            tickers = Ticker.query.filter(Ticker.id.in_(ticker_ids)).all()
+            for strategy in strategies:
+                get_cached_signals(tickers, strategy)
+                with _warmup_lock:
+                    warmup_status['done'] += 1
+    except Exception:
+        flask_app.logger.exception("Error precalculando señales")
+    finally:
+        with _warmup_lock:
+            warmup_status['pending'] -= 1
+            if not warmup_status['pending']:
+                warmup_status.update(running=False, last_finished=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        with flask_app.app_context():
+            log_cache_stats()
+
+def schedule_snapshot(as_of=None):
+    """Encola la foto del escaneo de ``as_of`` (hoy por defecto), detrás del precálculo."""
+    return _warmup_executor.submit(save_scan_snapshots, current_app._get_current_object(),
+                                   as_of or datetime.now().date())
+
+def save_scan_snapshots(flask_app, as_of):
+    """Guarda el resultado de cada estrategia para todo el universo en ``as_of``.
+
+    Corre después del precálculo, así casi todo sale de la caché de señales.
+    """
+    try:
+        with flask_app.app_context():
+            tickers = Ticker.query.all()
+            for name in STRATEGIES:
+                signals = get_cached_signals(tickers, (name,), as_of=as_of)
+                FinanceService.save_scan_snapshot(name, as_of, {t.id: s for t, s in zip(tickers, signals)})
+            db.session.commit()
+            flask_app.logger.info("Foto del escaneo guardada: %s (%d tickers)", as_of, len(tickers))
+    except Exception:
+        flask_app.logger.exception("Error guardando la foto del escaneo")
+
+@app.route('/api/cache/warmup', methods=['GET'])
+def warmup_progress():
+    """Progreso del precálculo de señales posterior a la sincronización
+    ---
+    responses:
+      200:
+        description: running, estrategias hechas/total, tickers encolados y última finalización
+    """
+    with _warmup_lock:
+        return jsonify(dict(warmup_status))
+
+# Caché de señales en SQLite compartida por todos los workers del servidor; se vacía
+# cuando cambia el código que calcula las señales
+SIGNALS_CODE_VERSION = source_version(indicators, strategies, finance_service)
+signals_cache = SignalCache(
+    os.environ.get('SIGNAL_CACHE_PATH', os.path.join(app.instance_path, 'signal_cache.db')),
+    max_entries=int(os.environ.get('SIGNAL_CACHE_SIZE', DEFAULT_MAX_ENTRIES)),
+    version=SIGNALS_CODE_VERSION
+)
+
+_signals_flight = SingleFlight()
+
+def parse_as_of(value, name='as_of'):
+    """Fecha de un pedido (``YYYY-MM-DD``, no futura); None si no viene."""
+    if not value:
+        return None
+    try:
+        as_of = datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        # TypeError: un valor no texto en un cuerpo JSON (p. ej. 20240101)
+        raise ValueError(f"{name} inválido (formato YYYY-MM-DD): {value}") from None
+    if as_of > datetime.now().date():
+        raise ValueError(f"{name} no puede ser una fecha futura: {value}")
+    return as_of
+
+def parse_price_range(args):
+    """``(desde, hasta, max_points)`` de un pedido de precios; ValueError si son inválidos."""
+    start = parse_as_of(args.get('from'), name='from')
+    end = parse_as_of(args.get('to'), name='to')
+    if start and end and start > end:
+        raise ValueError('from no puede ser posterior a to')
+    max_points = args.get('max_points')
+    if max_points is not None:
+        try:
+            max_points = int(max_points)
+        except ValueError:
+            raise ValueError(f"max_points inválido: {max_points}") from None
+        if max_points < 3:
+            raise ValueError('max_points debe ser al menos 3')
+    return start, end, max_points
+
+def get_cached_signals(tickers, strategy, exact=False, params=None, as_of=None):
+    """Señales por ticker con caché compartida.
+
+    La clave incluye la fecha de la última barra de cada ticker hasta
+    ``as_of`` (versión de sus datos), los parámetros normalizados y la
+    fecha ``as_of`` (hoy por defecto), de la que dependen los conteos de
+    días. Los tickers sin caché se calculan juntos: sus precios se cargan
+    con una sola consulta en lugar de una por ticker.
+    """
+    name, pkey = SignalCache.key_parts(strategy, params_key(normalize_params(strategy, params)), exact)
+    day = as_of or datetime.now().date()
+    as_of = day.isoformat()
+    versions = FinanceService.last_bar_dates([t.id for t in tickers], until=day)
+    results = signals_cache.get_many(name, pkey, versions, as_of)
+    for t in tickers:
+        # Una sincronización sin barras nuevas no cambia la clave, pero sí last_sync
+        if results.get(t.id):
+            results[t.id]['last_sync'] = format_last_sync(t.last_sync)
+
+    misses = {(name, pkey, as_of, t.id, str(versions[t.id])): t for t in tickers if t.id not in results}
+    if misses:
+        def compute(keys):
+            pending = {misses[k].id: misses[k] for k in keys}
+            with signals_cache.lock(name, pkey):
+                # Otro worker pudo calcularlos mientras se esperaba el lock (ya contados como fallos)
+                done = signals_cache.get_many(name, pkey, {i: versions[i] for i in pending}, as_of, count=False)
+                todo = [t for i, t in pending.items() if i not in done]
+                if todo:
+                    started = time.perf_counter()
+                    computed = FinanceService.get_signals_bulk(todo, strategy=strategy, exact=exact, params=params,
+                                                               as_of=day, last_dates=versions)
+                    signals_cache.set_many(name, pkey, versions, as_of, computed,
+                                           compute_seconds=time.perf_counter() - started)
+                    done.update(computed)
+            return {k: done[misses[k].id] for k in keys}
+
+        # Pedidos concurrentes con los mismos faltantes esperan un único cálculo
+        for key, value in _signals_flight.do_many(list(misses), compute).items():
+            results[misses[key].id] = value
+
+    return [results[t.id] for t in tickers]
+
+def get_cached_signal_history(ticker, strategy, params=None, as_of=None):
+    """Series completas de un ticker con caché compartida (None si no tiene barras suficientes).
+
+    No dependen de la fecha de referencia: la clave es solo la última barra
+    hasta ``as_of`` (versión de sus datos) y los parámetros normalizados.
+    """
+    name, pkey = SignalCache.key_parts(strategy, params_key(normalize_params(strategy, params)))
+    name = 'history:' + name
+    versions = FinanceService.last_bar_dates([ticker.id], until=as_of)
+    found = signals_cache.get_many(name, pkey, versions, '')
+    if ticker.id in found:
+        return found[ticker.id]
+    started = time.perf_counter()
+    history = FinanceService.get_signal_history(ticker, strategy, params=params, as_of=as_of)
+    signals_cache.set_many(name, pkey, versions, '', {ticker.id: history},
+                           compute_seconds=time.perf_counter() - started)
+    return history
+
+# Respuestas ya serializadas, por ETag (0 desactiva la caché en memoria). La comparten
+# /api/scan, el historial de señales y los precios; cada uno cuenta en su propia capa
+SCAN_RESPONSE_CACHE_SIZE = int(os.environ.get('SCAN_RESPONSE_CACHE_SIZE', 16))
+RESPONSE_LAYERS = ('scan_responses', 'history_responses', 'price_responses')
+_scan_responses = OrderedDict()
+# Los hilos del servidor comparten el OrderedDict: toda lectura o cambio pasa por este lock
+_scan_responses_lock = threading.Lock()
+_scan_flight = SingleFlight()
+_response_stats = {layer: CacheCounters() for layer in RESPONSE_LAYERS}
+
+def _scan_responses_size(layer=None):
+    """Entradas y bytes de la caché de respuestas, de una capa o de todas (lectura bajo el lock)."""
+    with _scan_responses_lock:
+        bodies = [b for l, b in _scan_responses.values() if layer is None or l == layer]
+    return len(bodies), sum(len(b) for b in bodies)
+
+
+def clear_scan_responses():
+    """Vacía la caché de respuestas en memoria."""
+    with _scan_responses_lock:
+        _scan_responses.clear()
+
+
+def cached_json_response(etag, build, layer='scan_responses'):
+    """Respuesta JSON con ETag fuerte.
+
+    Si el cliente ya tiene esa versión (``If-None-Match``) se responde 304
+    sin cuerpo; si no, se sirve el cuerpo serializado en memoria o se arma
+    con ``build()`` y se guarda. Aciertos y fallos se cuentan en ``layer``
+    (ver ``RESPONSE_LAYERS``).
+    """
+    stats = _response_stats[layer]
+    if request.if_none_match.contains(etag):
+        # El cliente ya tiene el cuerpo: cuenta como acierto
+        stats.add(hits=1)
+        response = app.response_class(status=304)
+    else:
+        with _scan_responses_lock:
+            cached = _scan_responses.get(etag)
+            if cached is not None:
+                _scan_responses.move_to_end(etag)
+        if cached is None:
+            started = time.perf_counter()
+            # Pedidos idénticos simultáneos comparten una sola construcción (fuera del lock)
+            body = _scan_flight.do(etag, lambda: app.json.dumps(build()))
+            stats.add(misses=1, computed=1, compute_seconds=time.perf_counter() - started)
+            if SCAN_RESPONSE_CACHE_SIZE:
+                with _scan_responses_lock:
+                    _scan_responses[etag] = (layer, body)
+                    evicted = (_scan_responses.popitem(last=False)[1][0]
+                               if len(_scan_responses) > SCAN_RESPONSE_CACHE_SIZE else None)
+                if evicted:
+                    # El desalojo se cuenta en la capa de la respuesta desalojada
+                    _response_stats[evicted].add(evictions=1)
+        else:
+            stats.add(hits=1)
+            body = cached[1]
+        response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    # El navegador guarda la respuesta pero revalida siempre con If-None-Match
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Argumentos de /api/scan que no son parámetros de estrategia
+SCAN_ARGS = ('strategy', 'engine', 'exact', 'workers', 'filter', 'sort', 'limit', 'cursor', 'prefilter', 'as_of',
+             'date', 'since')
 
 @app.route('/api/scan', methods=['GET'])
 def scan_tickers():
+    # strategy admite un nombre, una lista separada por comas o 'all' (una sola pasada)
     strategy = request.args.get('strategy', 'rsi_macd')
-    tickers = Ticker.query.all()
-    signals = []
-    for t in tickers:
-        cache_key = f"{t.id}_{strategy}"
-        signal = get_cached_signals(t.id, strategy, cache_key)
-        if signal:
-            signals.append(signal)
-    return jsonify(signals)
+    try:
+        strategy = resolve(strategy)
+    except UnknownStrategyError:
+        return jsonify({'error': f'Unknown strategy: {strategy}'}), 400
+    # El resto de la query son parámetros de la estrategia (ej: rsi_length=10)
+    params = {k: v for k, v in request.args.items() if k not in SCAN_ARGS}
+    try:
+        normalize_params(strategy, params)
+    except InvalidParameterError as e:
+        return jsonify({'error': str(e)}), 400
+    # as_of=YYYY-MM-DD escanea como si fuera ese día (precios hasta esa fecha, días contados desde ella)
+    # date=YYYY-MM-DD sirve la foto guardada ese día (sin calcular indicadores)
+    try:
+        as_of = parse_as_of(request.args.get('as_of'))
+        snapshot_date = parse_as_of(request.args.get('date'), name='date')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    engine = request.args.get('engine', 'ticker')
+    # exact=1 usa todo el histórico en lugar de la ventana de warm-up de la estrategia
+    exact = request.args.get('exact', '0') == '1'
+    # Screener: filter=rsi<30 (repetible), sort=<orden con nombre o campo>, limit/cursor para paginar
+    filter_args = request.args.getlist('filter')
+    # prefilter=last_close>10 descarta tickers por ticker_stats antes de calcular indicadores
+    prefilter_args = request.args.getlist('prefilter')
+    # Con since, sort es repetible: cada fila trae su clave para cada orden (sort_keys)
+    sort_args = request.args.getlist('sort')
+    sort = sort_args[0] if sort_args else None
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    # since=<version> devuelve solo lo que cambió desde esa respuesta (since= vacío: respuesta completa)
+    since = request.args.get('since')
+    try:
+        client = scan_delta.decode_version(since) if since else None
+    except scan_delta.DeltaError as e:
+        return jsonify({'error': str(e)}), 400
+    if since is not None and (limit or cursor or snapshot_date):
+        return jsonify({'error': 'since cannot be combined with limit, cursor or date'}), 400
+    if since is None and len(sort_args) > 1:
+        return jsonify({'error': 'several sort values require since'}), 400
+    try:
+        filters = [screener.parse_filter(f) for f in filter_args]
+        prefilters = [screener.parse_filter(f, STATS_TYPES) for f in prefilter_args]
+        unknown = [field for field, _, _ in prefilters if field not in STATS_FIELDS]
+        if unknown:
+            raise screener.ScreenerError(f"Campo de pre-filtro desconocido: {', '.join(unknown)}")
+        for s in sort_args:
+            screener.sort_key(s)
+        if cursor:
+            screener.decode_cursor(cursor)
+    except screener.ScreenerError as e:
+        return jsonify({'error': str(e)}), 400
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            return jsonify({'error': 'limit must be a positive integer'}), 400
+    tickers = FinanceService.prefilter_tickers(Ticker.query.all(), prefilters)
+    if snapshot_date:
+        # Las fotos guardan cada estrategia con sus parámetros por defecto
+        if as_of or exact or normalize_params(strategy, params) != normalize_params(strategy):
+            return jsonify({'error': 'date only supports default strategy parameters (no as_of or exact)'}), 400
+        snapshot = FinanceService.scan_snapshot_version(strategy, snapshot_date)
+        if snapshot is None:
+            return jsonify({'error': f'No scan snapshot for {snapshot_date}'}), 404
+        version = (snapshot, [t.id for t in tickers] if prefilters else None)
+    else:
+        version = FinanceService.data_version(tickers)
+    # La respuesta depende solo de la versión de los datos, la fecha y los argumentos
+    etag = hashlib.sha1(repr((
+        version, snapshot_date, as_of or datetime.now().date(), strategy,
+        params_key(normalize_params(strategy, params)), engine, exact, filter_args, prefilter_args,
+        sort_args, limit, cursor, since
+    )).encode()).hexdigest()
+
+    def scan(tickers):
+        if snapshot_date:
+            return FinanceService.load_scan_snapshot(strategy, snapshot_date,
+                                                     [t.id for t in tickers] if prefilters else None)
+        if engine == 'panel':
+            # Escaneo transversal: una consulta y operaciones 2-D para todo el universo
+            return ScanEngine.scan(tickers, strategy, exact=exact, params=params, as_of=as_of)
+        if engine == 'parallel':
+            # Panel repartido por columnas en un pool de procesos (memoria compartida), hasta uno por CPU
+            workers = clamp_workers(request.args.get('workers', type=int) or MAX_WORKERS)
+            return ScanEngine.scan(tickers, strategy, workers=workers, exact=exact, params=params, as_of=as_of)
+        return [s for s in get_cached_signals(tickers, strategy, exact=exact, params=params, as_of=as_of) if s]
+
+    def build_delta():
+        day = as_of or datetime.now().date()
+        key = scan_delta.args_key(strategy, params_key(normalize_params(strategy, params)), exact,
+                                  filter_args, prefilter_args, sort_args)
+        # Las marcas se leen antes de escanear: lo que llegue durante el escaneo se reenvía después
+        mark, synced_mark = FinanceService.bars_watermark(), scan_delta.sync_mark(tickers)
+        full = client is None or client['day'] != day or client['key'] != key
+        if full:
+            computed = tickers
+        else:
+            # Solo se recalculan los tickers con barras nuevas desde la versión del cliente
+            changed = FinanceService.tickers_with_bars_since(client['watermark'])
+            computed = [t for t in tickers if t.id in changed]
+        ids = {t.symbol: t.id for t in computed}
+        rows, _, _ = screener.query([dict(s, id=ids[s['symbol']]) for s in scan(computed)], filters, sort)
+        if sort:
+            # Clave de orden por fila: el cliente reordena lo que ya tenía sin pedirlo de nuevo
+            key_of = screener.sort_key(sort)
+            rows = [dict(r, sort_key=key_of(r)) for r in rows]
+        if len(sort_args) > 1:
+            # Varias vistas sobre las mismas filas (el dashboard): una clave por orden
+            keys_of = {s: screener.sort_key(s) for s in sort_args}
+            rows = [dict(r, sort_keys={s: k(r) for s, k in keys_of.items()}) for r in rows]
+        deleted, client_ids = scan_delta.delta(
+            rows, set() if full else client['ids'], set(ids.values()), {t.id for t in tickers}
+        )
+        # Sincronizados sin barras nuevas: la fila no cambia salvo last_sync, que se envía aparte
+        synced = {} if full else {
+            t.id: format_last_sync(t.last_sync) for t in scan_delta.synced_since(tickers, client['synced'])
+            if t.id in client_ids and t.symbol not in ids
+        }
+        return {
+            'version': scan_delta.encode_version(day, mark, synced_mark, client_ids, key),
+            'full': full,
+            'results': rows,
+            'deleted': deleted,
+            'synced': synced,
+        }
+
+    def build():
+        if since is not None:
+            return build_delta()
+        signals = scan(tickers)
+        if not (filters or sort or limit or cursor):
+            return signals
+        page, next_cursor, total = screener.query(signals, filters, sort, limit, cursor)
+        if limit is None and cursor is None:
+            return page
+        return {'results': page, 'next_cursor': next_cursor, 'total': total}
+
+    try:
+        response = cached_json_response(etag, build)
+    except screener.ScreenerError as e:
+        return jsonify({'error': str(e)}), 400
+    maybe_log_cache_stats()
+    return response
+
+# Segundos entre resúmenes de métricas de caché en el log (0 los desactiva)
+CACHE_STATS_LOG_INTERVAL = int(os.environ.get('CACHE_STATS_LOG_INTERVAL', 300))
+_last_stats_log = time.monotonic()
+
+def cache_stats():
+    """Métricas de cada capa de caché del escaneo."""
+    return {
+        'pid': os.getpid(),
+        # Compartida por todos los workers (contadores en el mismo archivo SQLite)
+        'signals': signals_cache.stats(),
+        # Por proceso: cuerpos ya serializados de /api/scan, del historial de señales y de precios
+        # (comparten el tope de SCAN_RESPONSE_CACHE_SIZE entradas)
+        **{layer: dict(_response_stats[layer].summary(*_scan_responses_size(layer)),
+                       max_entries=SCAN_RESPONSE_CACHE_SIZE)
+           for layer in RESPONSE_LAYERS},
+        'warmup': dict(warmup_status),
+    }
+
+def log_cache_stats():
+    for layer, stats in cache_stats().items():
+        if isinstance(stats, dict) and 'hit_rate' in stats:
+            app.logger.info(
+                "cache %s: %d entradas (%.1f KB), aciertos %d / fallos %d (hit rate %s), "
+                "desalojos %d, %.1f s de cálculo ahorrados",
+                layer, stats['entries'], stats['memory_bytes'] / 1024, stats['hits'], stats['misses'],
+                stats['hit_rate'], stats['evictions'], stats['compute_seconds_saved']
+            )
+
+def maybe_log_cache_stats():
+    global _last_stats_log
+    if CACHE_STATS_LOG_INTERVAL and time.monotonic() - _last_stats_log >= CACHE_STATS_LOG_INTERVAL:
+        _last_stats_log = time.monotonic()
+        log_cache_stats()
+
+@app.route('/api/signals/changes', methods=['GET'])
+def signal_changes():
+    """Transiciones de señales entre fotos diarias del escaneo
+    ---
+    parameters:
+      - name: since
+        in: query
+        type: string
+        description: Fecha YYYY-MM-DD desde la que listar (inclusive); por defecto la última foto
+      - name: strategy
+        in: query
+        type: string
+        description: Estrategia, lista separada por comas o 'all'
+    responses:
+      200:
+        description: Lista de {date, symbol, strategy, field, old, new}
+      400:
+        description: Fecha o estrategia inválida
+    """
+    strategy = request.args.get('strategy', 'all')
+    try:
+        since = parse_as_of(request.args.get('since'), name='since')
+        names = resolve(strategy)
+    except UnknownStrategyError:
+        return jsonify({'error': f'Unknown strategy: {strategy}'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(FinanceService.signal_changes(since, names))
+
+@app.route('/api/tickers/<int:ticker_id>/signals', methods=['GET'])
+def ticker_signal_history(ticker_id):
+    """Series completas de indicadores y condiciones de un ticker (para graficar)
+    ---
+    parameters:
+      - name: ticker_id
+        in: path
+        type: integer
+        required: true
+      - name: strategy
+        in: query
+        type: string
+        description: Estrategia, lista separada por comas o 'all'
+      - name: as_of
+        in: query
+        type: string
+        description: Fecha YYYY-MM-DD hasta la que usar precios
+    responses:
+      200:
+        description: Por temporalidad, {dates, indicators, conditions, entries} como listas alineadas a dates
+      400:
+        description: Estrategia, parámetros o fecha inválidos
+      404:
+        description: Ticker inexistente o sin barras suficientes
+    """
+    ticker = Ticker.query.get_or_404(ticker_id)
+    strategy = request.args.get('strategy', 'rsi_macd')
+    # El resto de la query son parámetros de la estrategia (como en /api/scan)
+    params = {k: v for k, v in request.args.items() if k not in ('strategy', 'as_of')}
+    try:
+        strategy = resolve(strategy)
+        normalized = normalize_params(strategy, params)
+        as_of = parse_as_of(request.args.get('as_of'))
+    except UnknownStrategyError:
+        return jsonify({'error': f'Unknown strategy: {strategy}'}), 400
+    except (InvalidParameterError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    last_bar = FinanceService.last_bar_dates([ticker.id], until=as_of)[ticker.id]
+    if last_bar is None:
+        return jsonify({'error': f'No price data for {ticker.symbol}'}), 404
+    etag = hashlib.sha1(repr(('history', ticker.id, last_bar, strategy, params_key(normalized))).encode()).hexdigest()
+
+    def build():
+        history = get_cached_signal_history(ticker, strategy, params=params, as_of=as_of)
+        if history is None:
+            raise LookupError(f'Not enough price data for {ticker.symbol}')
+        return {'symbol': ticker.symbol, 'strategy': list(strategy), 'timeframes': history}
+
+    try:
+        return cached_json_response(etag, build, layer='history_responses')
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+
+def price_series_response(tickers, single=False):
+    """Series de precios columnares de ``tickers`` para los argumentos del pedido, con ETag.
+
+    Con ``single`` la respuesta es la serie del único ticker (con su
+    símbolo) en lugar de símbolo -> serie.
+    """
+    try:
+        start, end, max_points = parse_price_range(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Cambia con cada barra nueva o sincronización de estos tickers
+    etag = hashlib.sha1(repr((
+        'prices', FinanceService.data_version(tickers), start, end, max_points, single
+    )).encode()).hexdigest()
+
+    def build():
+        series = FinanceService.get_price_series(tickers, start, end, max_points)
+        if single:
+            return dict(series[tickers[0].id], symbol=tickers[0].symbol)
+        return {t.symbol: series[t.id] for t in tickers}
+
+    return cached_json_response(etag, build, layer='price_responses')
+
+@app.route('/api/tickers/<int:ticker_id>/prices', methods=['GET'])
+def ticker_prices(ticker_id):
+    """Barras almacenadas de un ticker en un rango de fechas (columnar)
+    ---
+    parameters:
+      - name: ticker_id
+        in: path
+        type: integer
+        required: true
+      - name: from
+        in: query
+        type: string
+        description: Fecha YYYY-MM-DD inicial (inclusive)
+      - name: to
+        in: query
+        type: string
+        description: Fecha YYYY-MM-DD final (inclusive)
+      - name: max_points
+        in: query
+        type: integer
+        description: Máximo de barras; los rangos más largos se reducen con LTTB
+    responses:
+      200:
+        description: "{symbol, bars, dates, open, high, low, close, volume} con listas alineadas a dates"
+      400:
+        description: Fechas o max_points inválidos
+      404:
+        description: Ticker inexistente
+    """
+    ticker = Ticker.query.get_or_404(ticker_id)
+    return price_series_response([ticker], single=True)
+
+@app.route('/api/prices', methods=['GET'])
+def batch_prices():
+    """Barras almacenadas de varios tickers en un rango de fechas (columnar)
+    ---
+    parameters:
+      - name: symbols
+        in: query
+        type: string
+        required: true
+        description: Símbolos separados por comas
+      - name: from
+        in: query
+        type: string
+      - name: to
+        in: query
+        type: string
+      - name: max_points
+        in: query
+        type: integer
+    responses:
+      200:
+        description: "Símbolo -> {bars, dates, open, high, low, close, volume}"
+      400:
+        description: Sin símbolos, fechas o max_points inválidos
+      404:
+        description: Algún símbolo no existe
+    """
+    symbols = [s.strip().upper() for s in request.args.get('symbols', '').split(',') if s.strip()]
+    if not symbols:
+        return jsonify({'error': 'symbols is required'}), 400
+    tickers = {t.symbol: t for t in Ticker.query.filter(Ticker.symbol.in_(symbols)).all()}
+    missing = [s for s in symbols if s not in tickers]
+    if missing:
+        return jsonify({'error': f"Unknown symbols: {', '.join(missing)}"}), 404
+    return price_series_response([tickers[s] for s in dict.fromkeys(symbols)])
+
+@app.route('/api/admin/cache', methods=['GET'])
+def admin_cache_stats():
+    """Métricas de las cachés del escaneo
+    ---
+    responses:
+      200:
+        description: aciertos, fallos, desalojos, entradas, memoria estimada y tiempo de cálculo ahorrado por capa
+    """
+    return jsonify(cache_stats())
+
+@app.route('/api/scan/grid', methods=['POST'])
+def scan_grid():
+    """Evalúa una grilla de parámetros sobre una sola carga de precios
+    ---
+    requestBody:
+      required: true
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              strategy:
+                type: string
+                example: rsi_macd
+              grid:
+                type: object
+                example: {"rsi_length": [10, 14], "oversold": [25, 30]}
+              exact:
+                type: boolean
+              as_of:
+                type: string
+                example: "2024-06-28"
+    responses:
+      200:
+        description: Lista de {params, signals} por combinación
+      400:
+        description: Estrategia o parámetros inválidos
+    """
+    data = request.json if request.json is not None else {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'body must be a JSON object'}), 400
+    strategy = data.get('strategy', 'rsi_macd')
+    if not isinstance(strategy, str):
+        return jsonify({'error': 'strategy must be a string'}), 400
+    grid = data.get('grid') or {}
+    if not isinstance(grid, dict) or not all(isinstance(v, list) for v in grid.values()):
+        return jsonify({'error': 'grid must map parameter names to lists of values'}), 400
+    try:
+        strategy = resolve(strategy)
+        results = ScanEngine.scan_grid(Ticker.query.all(), strategy, grid, exact=bool(data.get('exact')),
+                                       as_of=parse_as_of(data.get('as_of')))
+    except UnknownStrategyError:
+        return jsonify({'error': f'Unknown strategy: {strategy}'}), 400
+    except (InvalidParameterError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(results)
+
+@app.route('/api/backtest', methods=['POST'])
+def run_backtest():
+    """Backtest de las señales de entrada sobre todo el histórico almacenado
+    ---
+    requestBody:
+      required: true
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              strategy:
+                type: string
+                example: all
+              params:
+                type: object
+                example: {"rsi_length": 14}
+              horizons:
+                type: array
+                items:
+                  type: integer
+                example: [5, 10, 20, 60]
+              workers:
+                type: integer
+              trades:
+                type: boolean
+                description: Incluir la lista de operaciones
+    responses:
+      200:
+        description: Operaciones, retorno medio/mediano y tasa de acierto por señal y horizonte
+      400:
+        description: Estrategia, parámetros u horizontes inválidos
+    """
+    data = request.json if request.json is not None else {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'body must be a JSON object'}), 400
+    strategy = data.get('strategy', 'all')
+    if not isinstance(strategy, str):
+        return jsonify({'error': 'strategy must be a string'}), 400
+    horizons = data.get('horizons') or backtest.DEFAULT_HORIZONS
+    params = data.get('params')
+    workers = data.get('workers')
+    if not isinstance(horizons, (list, tuple)) or not all(isinstance(h, int) for h in horizons):
+        return jsonify({'error': 'horizons must be a list of integers'}), 400
+    if params is not None and not isinstance(params, dict):
+        return jsonify({'error': 'params must be an object'}), 400
+    if workers is not None and (not isinstance(workers, int) or isinstance(workers, bool)):
+        return jsonify({'error': 'workers must be an integer'}), 400
+    try:
+        strategy = resolve(strategy)
+        summary, trades = backtest.run(Ticker.query.all(), strategy, params=params, horizons=horizons,
+                                       workers=clamp_workers(workers) if workers else None)
+    except UnknownStrategyError:
+        return jsonify({'error': f'Unknown strategy: {strategy}'}), 400
+    except InvalidParameterError as e:
+        return jsonify({'error': str(e)}), 400
+    result = {'summary': summary}
+    if data.get('trades'):
+        result['trades'] = backtest.trade_rows(trades)
+    return jsonify(result)
 
 if __name__ == '__main__':
     host = os.environ.get('HOST', '0.0.0.0')
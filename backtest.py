@@ -0,0 +1,131 @@
+"""
+Backtest vectorizado de las señales de entrada de las estrategias.
+
+Recorre todo el histórico almacenado de todos los tickers a la vez: las
+entradas de cada estrategia (``entries`` en su registro) son matrices
+booleanas ``barras x tickers`` calculadas con operaciones 2-D sobre el mismo
+grafo de indicadores que el escaneo, sin un lazo por barra en Python. Cada
+entrada es una operación que compra al cierre de la barra de la señal; su
+retorno a ``h`` barras es el cierre ``h`` barras después sobre el de entrada.
+Con ``workers > 1`` las columnas se reparten en procesos
+(``scan_engine.map_columns``).
+"""
+import numpy as np
+
+import strategies
+from scan_engine import ScanEngine, map_columns
+
+DEFAULT_HORIZONS = (5, 10, 20, 60)
+
+
+def entry_signals(panel, strategy, params=None, graph=None):
+    """Matrices de entrada por señal (``'estrategia.señal'``) para el panel."""
+    graph = graph or strategies.IndicatorGraph(panel)
+    signals = {}
+    for name, p in strategies.normalize_params(strategy, params).items():
+        spec = strategies.STRATEGIES[name]
+        if spec.entries is None:
+            continue
+        values = {alias: graph[node] for alias, node in spec.indicators(p).items()}
+        for signal, cond in spec.entries(graph, values, p).items():
+            signals[f'{name}.{signal}'] = cond
+    return signals
+
+
+def forward_returns(close, horizon):
+    """Retorno de cada barra a ``horizon`` barras (NaN si aún no pasaron)."""
+    out = np.full(close.shape, np.nan)
+    if horizon < len(close):
+        out[:-horizon] = close[horizon:] / close[:-horizon] - 1.0
+    return out
+
+
+def panel_trades(panel, strategy, params=None, horizons=DEFAULT_HORIZONS):
+    """Operaciones de cada señal en formato columnar.
+
+    Devuelve señal -> ``{'symbol', 'date', 'price', 'returns': {h: array}}``
+    con una fila por entrada, ordenadas por fecha.
+    """
+    returns = {h: forward_returns(panel.close, h) for h in horizons}
+    symbols = np.array([t.symbol for t in panel.tickers], dtype=object)
+    trades = {}
+    for name, cond in entry_signals(panel, strategy, params).items():
+        rows, cols = np.nonzero(cond)
+        order = np.lexsort((cols, panel.dates[rows, cols]))
+        rows, cols = rows[order], cols[order]
+        trades[name] = {
+            'symbol': symbols[cols],
+            'date': panel.dates[rows, cols],
+            'price': panel.close[rows, cols],
+            'returns': {h: r[rows, cols] for h, r in returns.items()},
+        }
+    return trades
+
+
+def _concat(chunks):
+    """Une las operaciones columnares de varios lotes de columnas."""
+    merged = {}
+    for name in chunks[0]:
+        parts = [chunk[name] for chunk in chunks]
+        dates = np.concatenate([p['date'] for p in parts])
+        order = np.argsort(dates, kind='stable')
+        merged[name] = {
+            'symbol': np.concatenate([p['symbol'] for p in parts])[order],
+            'date': dates[order],
+            'price': np.concatenate([p['price'] for p in parts])[order],
+            'returns': {h: np.concatenate([p['returns'][h] for p in parts])[order] for h in parts[0]['returns']},
+        }
+    return merged
+
+
+def summarize(trades):
+    """Estadísticas por señal y horizonte: operaciones cerradas, retorno medio y mediano, tasa de acierto."""
+    summary = {}
+    for name, t in trades.items():
+        horizons = {}
+        for h, r in t['returns'].items():
+            done = r[~np.isnan(r)]
+            horizons[h] = {
+                'trades': int(len(done)),
+                'mean_return': float(done.mean()) if len(done) else None,
+                'median_return': float(np.median(done)) if len(done) else None,
+                'hit_rate': float((done > 0).mean()) if len(done) else None,
+            }
+        summary[name] = {
+            'trades': int(len(t['date'])),
+            'tickers': int(len(set(t['symbol']))),
+            'horizons': horizons,
+        }
+    return summary
+
+
+def trade_rows(trades):
+    """Operaciones como lista de diccionarios (para JSON)."""
+    return [{
+        'signal': name,
+        'symbol': t['symbol'][k],
+        'date': str(t['date'][k]),
+        'price': float(t['price'][k]),
+        'returns': {h: None if np.isnan(r[k]) else float(r[k]) for h, r in t['returns'].items()},
+    } for name, t in trades.items() for k in range(len(t['date']))]
+
+
+def run(tickers, strategy='all', params=None, horizons=DEFAULT_HORIZONS, workers=None):
+    """Backtest de ``strategy`` sobre todo el histórico de ``tickers``.
+
+    Devuelve ``(resumen, operaciones)`` (ver ``summarize`` y
+    ``panel_trades``). Las señales de entrada se calculan con el histórico
+    completo (como ``exact=True``).
+    """
+    horizons = tuple(sorted(set(int(h) for h in horizons)))
+    if not horizons or horizons[0] <= 0:
+        raise strategies.InvalidParameterError(f"Horizontes inválidos: {horizons}")
+    strategies.normalize_params(strategy, params)
+    panel = ScanEngine.load_panel(tickers, timeframes=strategies.strategy_timeframes(strategy, params))
+    if not len(panel):
+        trades = {}
+    elif workers and workers > 1 and len(panel) > 1:
+        trades = _concat(map_columns(panel, panel_trades, workers, strategy, params, horizons))
+    else:
+        trades = panel_trades(panel, strategy, params, horizons)
+    return summarize(trades), trades
@@ -27,6 +27,91 @@ class Price(db.Model):
         db.Index('idx_ticker_date', 'ticker_id', 'date'),
     )
 
+class PeriodPrice(db.Model):
+    """Barras semanales ('W', cierre viernes) y mensuales ('M') agregadas desde Price.
+
+    ``date`` es la etiqueta del período (como ``resample``) y ``last_date``
+    la última barra diaria incluida; se mantienen al sincronizar.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    ticker_id = db.Column(db.Integer, db.ForeignKey('ticker.id'), nullable=False)
+    timeframe = db.Column(db.String(1), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    last_date = db.Column(db.Date, nullable=False)
+    open = db.Column(db.Float)
+    high = db.Column(db.Float)
+    low = db.Column(db.Float)
+    close = db.Column(db.Float)
+    volume = db.Column(db.BigInteger)
+
+    __table_args__ = (
+        db.UniqueConstraint('ticker_id', 'timeframe', 'date', name='_ticker_tf_date_uc'),
+    )
+
+class TickerStats(db.Model):
+    """Resumen desnormalizado por ticker, mantenido al sincronizar.
+
+    Permite descartar tickers (precio, liquidez, historia) con una sola
+    consulta indexada antes de calcular indicadores.
+    """
+    __tablename__ = 'ticker_stats'
+    ticker_id = db.Column(db.Integer, db.ForeignKey('ticker.id'), primary_key=True)
+    last_close = db.Column(db.Float, index=True)
+    last_date = db.Column(db.Date)
+    avg_volume_20 = db.Column(db.Float, index=True)
+    avg_volume_50 = db.Column(db.Float)
+    high_52w = db.Column(db.Float)
+    low_52w = db.Column(db.Float)
+    bar_count = db.Column(db.Integer)
+
+class ScanSnapshot(db.Model):
+    """Resultado de una estrategia para un ticker tal como lo dio el escaneo de ese día.
+
+    Se guarda una foto por (fecha, estrategia) después de cada sincronización;
+    ``/api/scan?date=`` la sirve sin recalcular indicadores.
+    """
+    __tablename__ = 'scan_snapshot'
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    strategy = db.Column(db.String(50), nullable=False)
+    ticker_id = db.Column(db.Integer, db.ForeignKey('ticker.id'), nullable=False)
+    result = db.Column(db.JSON, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('date', 'strategy', 'ticker_id', name='_date_strategy_ticker_uc'),
+    )
+
+class SignalTransition(db.Model):
+    """Cambio de un campo de estado de una estrategia entre dos fotos del escaneo.
+
+    Tabla de solo inserción (se reescribe únicamente el día que se vuelve a
+    fotografiar); ``/api/signals/changes`` la expone.
+    """
+    __tablename__ = 'signal_transition'
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False, index=True)
+    ticker_id = db.Column(db.Integer, db.ForeignKey('ticker.id'), nullable=False)
+    symbol = db.Column(db.String(20), nullable=False)
+    strategy = db.Column(db.String(50), nullable=False)
+    field = db.Column(db.String(50), nullable=False)
+    old = db.Column(db.JSON)
+    new = db.Column(db.JSON)
+
+class IngestBatch(db.Model):
+    """Una sincronización que agregó barras a un ticker.
+
+    Tabla de solo inserción con AUTOINCREMENT: SQLite no reutiliza el id
+    aunque se borren filas (el de ``price`` sí), así el mayor id es una marca
+    que solo avanza cuando entran barras. Sin clave foránea: sobrevive al
+    borrado del ticker.
+    """
+    __tablename__ = 'ingest_batch'
+    __table_args__ = {'sqlite_autoincrement': True}
+    id = db.Column(db.Integer, primary_key=True)
+    ticker_id = db.Column(db.Integer, nullable=False)
+    bars = db.Column(db.Integer, nullable=False)
+    created = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
 def init_db(app):
     db.init_app(app)
 
@@ -0,0 +1,36 @@
+"""
+Reducción de series de precios para gráficos.
+
+Largest-Triangle-Three-Buckets (LTTB): conserva el primer y el último punto
+y, de cada balde intermedio, el punto que forma el triángulo de mayor área
+con el punto elegido en el balde anterior y el promedio del siguiente. Así
+la forma de la curva (picos y valles) sobrevive con muchos menos puntos que
+tomando una barra cada ``k``. Se devuelven índices para poder elegir las
+mismas barras en todas las columnas (fechas, OHLC, volumen).
+"""
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    """Índices de los ``threshold`` puntos de ``(x, y)`` que elige LTTB.
+
+    Si la serie ya tiene ``threshold`` puntos o menos (o ``threshold`` es
+    menor que 3) se devuelven todos. ``x`` debe ser creciente.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # Baldes [edges[i], edges[i + 1]) de los puntos interiores; el siguiente al último es el punto final
+    edges = np.r_[np.arange(threshold - 1) * (n - 2) // (threshold - 2) + 1, n]
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi, next_hi = edges[i], edges[i + 1], edges[i + 2]
+        cx, cy = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        picked[i + 1] = a
+    return picked
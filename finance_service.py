@@ -1,15 +1,40 @@
 import yfinance as yf
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
+import strategies
+from downsample import lttb
+from strategies import PricePanel, strategy_bars
 from datetime import datetime, timedelta
-from database import db, Ticker, Price
+from database import db, Price, PeriodPrice, TickerStats, ScanSnapshot, SignalTransition, IngestBatch
 import time
+import hashlib
 import logging
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+# Tickers por consulta en la carga masiva (por debajo del límite de variables de SQLite)
+BULK_CHUNK_SIZE = 500
+_EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+# Temporalidades mayores que se guardan en PeriodPrice
+PERIOD_TIMEFRAMES = ('W', 'M')
+# Campos de TickerStats que admite el pre-filtro
+STATS_FIELDS = ('last_close', 'last_date', 'avg_volume_20', 'avg_volume_50', 'high_52w', 'low_52w', 'bar_count')
+# Conversores de los campos de TickerStats que no son números (ver screener.parse_filter)
+STATS_TYPES = {'last_date': lambda raw: datetime.strptime(raw, '%Y-%m-%d').date()}
+
+
+def _to_datetime64(dates):
+    ordinals = np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(dates))
+    return (ordinals - _EPOCH_ORDINAL).astype('datetime64[D]')
+
+
+def _nan_to_none(value):
+    return None if np.isnan(value) else float(value)
+
+
 class FinanceService:
     @staticmethod
     def normalize_symbol(symbol):
@@ -73,6 +98,7 @@ class FinanceService:
         )
         
         count = 0
+        first_new = None
         for row in data.itertuples():
             date_val = row.Index.date()
             if date_val not in existing_dates:
@@ -88,183 +114,478 @@ class FinanceService:
                     )
                     db.session.add(price)
                     count += 1
+                    first_new = min(first_new or date_val, date_val)
                 except Exception as e:
                     logger.error(f"  {symbol}: Error procesando fecha {date_val}: {str(e)}")
                     continue
         
+        if count:
+            # Solo cambian los períodos desde la primera barra nueva (normalmente la semana y el mes en curso)
+            FinanceService.update_period_bars(ticker_obj.id, since=first_new)
+            FinanceService.update_ticker_stats(ticker_obj.id)
+            FinanceService.record_ingest(ticker_obj.id, count)
         ticker_obj.last_sync = datetime.now()
         db.session.commit()
         logger.info(f"  {symbol}: {count} nuevos registros agregados")
         return count
 
     @staticmethod
-    def get_signals(ticker_obj, strategy='rsi_macd'):
-        # Optimización: Cargar solo campos necesarios
-        prices = Price.query.with_entities(
-            Price.date, Price.open, Price.high,
-            Price.low, Price.close, Price.volume
-        ).filter_by(ticker_id=ticker_obj.id).order_by(Price.date.asc()).all()
-        
-        if not prices or len(prices) < 30:
+    def update_period_bars(ticker_id, since=None, timeframes=PERIOD_TIMEFRAMES):
+        """Actualiza las barras semanales y mensuales de un ticker.
+
+        Con ``since`` solo se reescriben los períodos desde el que contiene
+        esa fecha; sin ``since`` (o si el ticker aún no tiene barras
+        agregadas) se reconstruye todo el histórico. No hace commit.
+        """
+        for timeframe in timeframes:
+            stored = PeriodPrice.query.filter_by(ticker_id=ticker_id, timeframe=timeframe)
+            start = None
+            if since is not None and stored.first() is not None:
+                period = strategies.period_index(np.datetime64(since, 'D'), timeframe)
+                start = (strategies.period_end(period - 1, timeframe) + np.timedelta64(1, 'D')).item()
+                stored = stored.filter(PeriodPrice.date >= strategies.period_end(period, timeframe).item())
+            stored.delete(synchronize_session=False)
+
+            _, dates, values = FinanceService.load_price_arrays([ticker_id], since=start)
+            if not len(dates):
+                continue
+            periods = strategies.period_index(dates, timeframe)
+            starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+            ends = np.r_[starts[1:], len(periods)] - 1
+            bars = {
+                'open': values['open'][starts],
+                'high': np.maximum.reduceat(values['high'], starts),
+                'low': np.minimum.reduceat(values['low'], starts),
+                'close': values['close'][ends],
+                'volume': np.add.reduceat(values['volume'], starts),
+            }
+            labels = strategies.period_end(periods[starts], timeframe).astype(object)
+            last_dates = dates[ends].astype(object)
+            db.session.add_all([
+                PeriodPrice(
+                    ticker_id=ticker_id, timeframe=timeframe, date=labels[k], last_date=last_dates[k],
+                    open=_nan_to_none(bars['open'][k]), high=_nan_to_none(bars['high'][k]),
+                    low=_nan_to_none(bars['low'][k]), close=_nan_to_none(bars['close'][k]),
+                    volume=None if np.isnan(bars['volume'][k]) else int(bars['volume'][k])
+                ) for k in range(len(starts))
+            ])
+
+    @staticmethod
+    def update_ticker_stats(ticker_id):
+        """Recalcula el resumen de ``ticker_stats`` de un ticker (sin commit)."""
+        _, dates, values = FinanceService.load_price_arrays(
+            [ticker_id], columns=('high', 'low', 'close', 'volume'), max_bars=300
+        )
+        if not len(dates):
+            TickerStats.query.filter_by(ticker_id=ticker_id).delete()
             return None
-            
-        df = pd.DataFrame([{
-            'date': p.date,
-            'open': p.open,
-            'high': p.high,
-            'low': p.low,
-            'close': p.close,
-            'volume': p.volume
-        } for p in prices])
-        
-        df.set_index('date', inplace=True)
-        fmt_date = lambda d: d.strftime('%y-%m-%d') if d else None
-        
-        result = {
-            'symbol': ticker_obj.symbol,
-            'price': float(df['close'].iloc[-1]),
-            'price_date': fmt_date(df.index[-1]),
-            'last_sync': ticker_obj.last_sync.strftime('%y-%m-%d %H:%M') if ticker_obj.last_sync else 'Never'
-        }
-
-        if strategy == 'rsi_macd':
-            df['RSI'] = ta.rsi(df['close'], length=14)
-            df['RSI_SMA'] = ta.sma(df['RSI'], length=14)
-            macd = ta.macd(df['close'])
-            df = pd.concat([df, macd], axis=1)
-            
-            one_year_ago = datetime.now().date() - timedelta(days=365)
-            last_year_df = df[df.index >= one_year_ago].copy()
-            rsi_under_30 = last_year_df[last_year_df['RSI'] < 30]
-            
-            days_since_rsi_30 = None
-            date_rsi_30 = None
-            date_obj_rsi_30 = None
-            if not rsi_under_30.empty:
-                last_date = rsi_under_30.index[-1]
-                date_obj_rsi_30 = last_date
-                days_since_rsi_30 = (datetime.now().date() - last_date).days
-                date_rsi_30 = fmt_date(last_date)
-                
-            days_since_rsi_bullish = None
-            date_rsi_bullish = None
-            if date_obj_rsi_30:
-                post_oversold_df = last_year_df[last_year_df.index > date_obj_rsi_30]
-                rsi_bullish_after = post_oversold_df[post_oversold_df['RSI'] > post_oversold_df['RSI_SMA']]
-                if not rsi_bullish_after.empty:
-                    first_date_after = rsi_bullish_after.index[0]
-                    days_since_rsi_bullish = (datetime.now().date() - first_date_after).days
-                    date_rsi_bullish = fmt_date(first_date_after)
-
-            macd_col = 'MACD_12_26_9'
-            signal_col = 'MACDs_12_26_9'
-            thirty_days_ago = datetime.now().date() - timedelta(days=30)
-            last_30_df = df[df.index >= thirty_days_ago].copy()
-            last_30_df['cond'] = (last_30_df[macd_col] > last_30_df[signal_col]) & (last_30_df[macd_col] <= 0)
-            
-            macd_status = 'none'
-            macd_date = None
-            macd_days = None
-            if not last_30_df.empty:
-                is_active_today = last_30_df['cond'].iloc[-1]
-                active_dates = last_30_df[last_30_df['cond']].index
-                if is_active_today:
-                    streak = last_30_df['cond'].tolist()
-                    idx = len(streak) - 1
-                    while idx >= 0 and streak[idx]: idx -= 1
-                    start_date = last_30_df.index[idx + 1]
-                    macd_status = 'active'
-                    macd_date = fmt_date(start_date)
-                    macd_days = (datetime.now().date() - start_date).days
-                elif not active_dates.empty:
-                    last_active_date = active_dates[-1]
-                    macd_status = 'inactive'
-                    macd_date = fmt_date(last_active_date)
-                    macd_days = (datetime.now().date() - last_active_date).days
-
-            result.update({
-                'rsi': float(df['RSI'].iloc[-1]) if not pd.isna(df['RSI'].iloc[-1]) else None,
-                'days_since_rsi_30': days_since_rsi_30,
-                'date_rsi_30': date_rsi_30,
-                'days_since_rsi_bullish': days_since_rsi_bullish,
-                'date_rsi_bullish': date_rsi_bullish,
-                'macd_status': macd_status,
-                'macd_date': macd_date,
-                'macd_days': macd_days
-            })
-
-        elif strategy == '3_emas':
-            # DAILY
-            df['EMA4_D'] = ta.ema(df['close'], length=4)
-            df['EMA9_D'] = ta.ema(df['close'], length=9)
-            df['EMA18_D'] = ta.ema(df['close'], length=18)
-            df['emas_cond_d'] = (df['close'] > df['EMA4_D']) & (df['close'] > df['EMA9_D']) & (df['close'] > df['EMA18_D'])
-            
-            emas_d_active_today = bool(df['emas_cond_d'].iloc[-1])
-            emas_d_date = None
-            emas_d_days = None
-            if not df[df['emas_cond_d']].empty:
-                if emas_d_active_today:
-                    streak = df['emas_cond_d'].tolist()
-                    idx = len(streak) - 1
-                    while idx >= 0 and streak[idx]: idx -= 1
-                    d_start = df.index[idx + 1]
-                    emas_d_date = fmt_date(d_start)
-                    emas_d_days = (datetime.now().date() - d_start).days
-                else:
-                    d_last = df[df['emas_cond_d']].index[-1]
-                    emas_d_date = fmt_date(d_last)
-                    emas_d_days = (datetime.now().date() - d_last).days
-
-            # Strategy 2: 3 EMAS (4, 9, 18) - WEEKLY (Resampled from Daily)
-            df_w = df[['open', 'high', 'low', 'close', 'volume']].copy()
-            df_w.index = pd.to_datetime(df_w.index)
-            # Resample to weekly ending on Friday
-            df_w = df_w.resample('W-FRI').agg({
-                'open': 'first',
-                'high': 'max',
-                'low': 'min',
-                'close': 'last',
-                'volume': 'sum'
-            })
-            
-            df_w['EMA4_W'] = ta.ema(df_w['close'], length=4)
-            df_w['EMA9_W'] = ta.ema(df_w['close'], length=9)
-            df_w['EMA18_W'] = ta.ema(df_w['close'], length=18)
-            df_w['emas_cond_w'] = (df_w['close'] > df_w['EMA4_W']) & (df_w['close'] > df_w['EMA9_W']) & (df_w['close'] > df_w['EMA18_W'])
-            
-            emas_w_active_today = bool(df_w['emas_cond_w'].iloc[-1])
-            emas_w_date = None
-            emas_w_days = None
-            
-            today = datetime.now().date()
-            
-            if not df_w[df_w['emas_cond_w']].empty:
-                if emas_w_active_today:
-                    streak = df_w['emas_cond_w'].tolist()
-                    idx = len(streak) - 1
-                    while idx >= 0 and streak[idx]: idx -= 1
-                    w_start_dt = df_w.index[idx + 1].date()
-                    # Si el viernes de la racha aún no ha llegado, limitamos a hoy para el cálculo de días
-                    w_start_capped = min(w_start_dt, today)
-                    emas_w_date = fmt_date(w_start_capped)
-                    emas_w_days = (today - w_start_capped).days
-                else:
-                    w_last_dt = df_w[df_w['emas_cond_w']].index[-1].date()
-                    w_last_capped = min(w_last_dt, today)
-                    emas_w_date = fmt_date(w_last_capped)
-                    emas_w_days = (today - w_last_capped).days
-
-            result.update({
-                'emas_d_active': emas_d_active_today,
-                'emas_d_date': emas_d_date,
-                'emas_d_days': emas_d_days,
-                'emas_w_active': emas_w_active_today,
-                'emas_w_date': emas_w_date,
-                'emas_w_days': emas_w_days,
-                'ema4_d': float(df['EMA4_D'].iloc[-1]) if not pd.isna(df['EMA4_D'].iloc[-1]) else None,
-                'ema9_d': float(df['EMA9_D'].iloc[-1]) if not pd.isna(df['EMA9_D'].iloc[-1]) else None,
-                'ema18_d': float(df['EMA18_D'].iloc[-1]) if not pd.isna(df['EMA18_D'].iloc[-1]) else None
-            })
-
-        return result
+        year = dates >= dates[-1] - np.timedelta64(365, 'D')
+        with np.errstate(invalid='ignore'):
+            stats = TickerStats(
+                ticker_id=ticker_id,
+                last_close=_nan_to_none(values['close'][-1]),
+                last_date=dates[-1].item(),
+                avg_volume_20=_nan_to_none(np.nanmean(values['volume'][-20:])),
+                avg_volume_50=_nan_to_none(np.nanmean(values['volume'][-50:])),
+                high_52w=_nan_to_none(np.nanmax(values['high'][year])),
+                low_52w=_nan_to_none(np.nanmin(values['low'][year])),
+                bar_count=Price.query.filter_by(ticker_id=ticker_id).count(),
+            )
+        return db.session.merge(stats)
+
+    @staticmethod
+    def prefilter_tickers(tickers, filters):
+        """Descarta tickers con una sola consulta sobre ``ticker_stats``.
+
+        ``filters`` son tuplas ``(campo, operador, valor)`` (ver
+        ``screener.parse_filter`` con ``STATS_TYPES``) sobre ``STATS_FIELDS``;
+        ``last_date`` se compara con un ``date``. Los tickers sin resumen no
+        pasan el filtro.
+        """
+        if not filters:
+            return tickers
+        conditions = []
+        for field, op, value in filters:
+            if field not in STATS_FIELDS:
+                raise ValueError(f"Campo de pre-filtro desconocido: {field}")
+            conditions.append(op(getattr(TickerStats, field), value))
+        keep = {i for (i,) in TickerStats.query.with_entities(TickerStats.ticker_id).filter(*conditions)}
+        return [t for t in tickers if t.id in keep]
+
+    @staticmethod
+    def save_scan_snapshot(strategy, as_of, results):
+        """Reemplaza la foto de ``strategy`` (un nombre) del día ``as_of`` (sin commit).
+
+        ``results`` mapea ticker_id -> resultado; los None (menos de 30
+        barras) no se guardan. También registra las transiciones contra la
+        foto anterior (ver ``record_transitions``).
+        """
+        ScanSnapshot.query.filter_by(date=as_of, strategy=strategy).delete()
+        db.session.add_all([
+            ScanSnapshot(date=as_of, strategy=strategy, ticker_id=ticker_id, result=result)
+            for ticker_id, result in results.items() if result
+        ])
+        FinanceService.record_transitions(strategy, as_of, results)
+
+    @staticmethod
+    def record_transitions(strategy, as_of, results):
+        """Registra los campos de estado de ``strategy`` que cambiaron desde la foto anterior a ``as_of``.
+
+        Los campos son los ``states`` de la estrategia; los tickers sin foto
+        previa no generan transiciones. Las del día se reemplazan si se
+        vuelve a fotografiar. Devuelve la cantidad registrada (sin commit).
+        """
+        SignalTransition.query.filter_by(date=as_of, strategy=strategy).delete()
+        fields = strategies.get_strategy(strategy).states
+        previous = db.session.query(db.func.max(ScanSnapshot.date)).filter(
+            ScanSnapshot.strategy == strategy, ScanSnapshot.date < as_of
+        ).scalar()
+        if not fields or previous is None:
+            return 0
+        before = dict(ScanSnapshot.query.with_entities(ScanSnapshot.ticker_id, ScanSnapshot.result)
+                      .filter_by(date=previous, strategy=strategy))
+        transitions = [
+            SignalTransition(date=as_of, ticker_id=ticker_id, symbol=result['symbol'], strategy=strategy,
+                             field=field, old=before[ticker_id].get(field), new=result.get(field))
+            for ticker_id, result in results.items() if result and ticker_id in before
+            for field in fields if result.get(field) != before[ticker_id].get(field)
+        ]
+        db.session.add_all(transitions)
+        return len(transitions)
+
+    @staticmethod
+    def signal_changes(since=None, names=None):
+        """Transiciones desde ``since`` (inclusive) en orden de registro.
+
+        Sin ``since`` devuelve las de la última foto; ``names`` limita a
+        esas estrategias.
+        """
+        if since is None:
+            since = db.session.query(db.func.max(ScanSnapshot.date)).scalar()
+            if since is None:
+                return []
+        query = SignalTransition.query.filter(SignalTransition.date >= since)
+        if names:
+            query = query.filter(SignalTransition.strategy.in_(names))
+        return [{
+            'date': t.date.isoformat(),
+            'symbol': t.symbol,
+            'strategy': t.strategy,
+            'field': t.field,
+            'old': t.old,
+            'new': t.new,
+        } for t in query.order_by(SignalTransition.date, SignalTransition.id)]
+
+    @staticmethod
+    def scan_snapshot_version(names, as_of):
+        """Versión de las fotos de ``names`` en ``as_of``; None si falta alguna estrategia."""
+        rows = ScanSnapshot.query.with_entities(
+            ScanSnapshot.strategy, db.func.count(ScanSnapshot.id), db.func.max(ScanSnapshot.id)
+        ).filter(ScanSnapshot.date == as_of, ScanSnapshot.strategy.in_(names)).group_by(ScanSnapshot.strategy).all()
+        version = {name: (count, max_id) for name, count, max_id in rows}
+        return None if set(version) != set(names) else sorted(version.items())
+
+    @staticmethod
+    def load_scan_snapshot(names, as_of, ticker_ids=None):
+        """Resultados guardados en ``as_of``, combinando los campos de ``names`` por ticker.
+
+        Mismo formato y orden (por ticker) que el escaneo; ``ticker_ids``
+        limita la respuesta a esos tickers.
+        """
+        rows = ScanSnapshot.query.with_entities(
+            ScanSnapshot.ticker_id, ScanSnapshot.strategy, ScanSnapshot.result
+        ).filter(ScanSnapshot.date == as_of, ScanSnapshot.strategy.in_(names)).all()
+        keep = None if ticker_ids is None else set(ticker_ids)
+        order = {name: k for k, name in enumerate(names)}
+        combined = {}
+        # Los campos de cada estrategia se agregan en el orden de ``names`` (como ``evaluate``)
+        for ticker_id, _, result in sorted(rows, key=lambda r: (r[0], order[r[1]])):
+            if keep is None or ticker_id in keep:
+                combined.setdefault(ticker_id, {}).update(result)
+        return list(combined.values())
+
+    @staticmethod
+    def attach_period_frames(panel, timeframes, chunk_size=BULK_CHUNK_SIZE, as_of=None):
+        """Adjunta al panel las barras semanales/mensuales almacenadas.
+
+        Se leen desde el período de la primera barra diaria de cada columna,
+        así el resultado es idéntico a remuestrear el panel. Las columnas sin
+        barras agregadas al día (su último período no llega a la última barra
+        diaria) se remuestrean desde el panel. Con ``as_of`` se ignoran los
+        períodos que cierran después de esa fecha: el período en curso a esa
+        fecha se remuestrea desde el panel ya recortado.
+        """
+        timeframes = [tf for tf in timeframes if tf in PERIOD_TIMEFRAMES]
+        if not len(panel) or not timeframes:
+            return panel
+        n_cols = len(panel)
+        first_day = panel.dates[(~np.isnat(panel.dates)).argmax(axis=0), np.arange(n_cols)]
+        col_ids = np.array([t.id for t in panel.tickers], dtype=np.int64)
+        order = np.argsort(col_ids)
+
+        for timeframe in timeframes:
+            first = strategies.period_index(first_day, timeframe)
+            query = PeriodPrice.query.with_entities(
+                PeriodPrice.ticker_id, PeriodPrice.date, PeriodPrice.last_date, PeriodPrice.close
+            ).filter(
+                PeriodPrice.timeframe == timeframe,
+                PeriodPrice.date >= strategies.period_end(first.min(), timeframe).item()
+            )
+            if as_of is not None:
+                query = query.filter(PeriodPrice.last_date <= as_of)
+            rows = []
+            for i in range(0, n_cols, chunk_size):
+                chunk = col_ids[i:i + chunk_size].tolist()
+                rows.extend(query.filter(PeriodPrice.ticker_id.in_(chunk))
+                            .order_by(PeriodPrice.ticker_id, PeriodPrice.date).all())
+            if not rows:
+                continue
+
+            ids, labels, last_dates, close = zip(*rows)
+            cols = order[np.searchsorted(col_ids[order], np.array(ids, dtype=np.int64))]
+            last_dates = _to_datetime64(last_dates)
+            ends = np.r_[np.flatnonzero(cols[1:] != cols[:-1]), len(cols) - 1]
+            fresh = np.zeros(n_cols, dtype=bool)
+            fresh[cols[ends]] = last_dates[ends] == panel.dates[-1, cols[ends]]
+            if not fresh.any():
+                continue
+
+            keep = fresh[cols]
+            periods = strategies.period_index(_to_datetime64(labels), timeframe)
+            f_dates, f_close = strategies.period_frame(
+                periods[keep], np.array(close, dtype=float)[keep], cols[keep], n_cols, timeframe, first=first
+            )
+            if not fresh.all():
+                stale = np.flatnonzero(~fresh)
+                r_dates, r_close = strategies.resample_close(panel.dates[:, stale], panel.close[:, stale], timeframe)
+                n_rows = max(len(f_dates), len(r_dates))
+                f_dates, f_close = _pad_rows(f_dates, n_rows), _pad_rows(f_close, n_rows)
+                f_dates[n_rows - len(r_dates):, stale] = r_dates
+                f_close[n_rows - len(r_close):, stale] = r_close
+            panel.frames[timeframe] = (f_dates, f_close)
+        return panel
+
+    @staticmethod
+    def load_price_arrays(ticker_ids, columns=PRICE_COLUMNS, max_bars=None, chunk_size=BULK_CHUNK_SIZE,
+                          since=None, until=None, last_dates=None):
+        """Carga los precios de muchos tickers con una consulta ordenada por lote.
+
+        Devuelve ``(ids, dates, values)``: arrays alineados y ordenados por
+        (ticker_id, date), con ``values`` como dict columna -> array float.
+        Con ``max_bars`` solo se leen las últimas ``max_bars`` barras de cada
+        ticker: el filtro por fecha usa el índice (ticker_id, date), así el
+        costo no crece con el histórico almacenado. La ventana se cuenta hacia
+        atrás desde la última barra de cada ticker (hasta ``until``), así un
+        ticker sin barras recientes conserva su ventana completa;
+        ``last_dates`` (ver ``last_bar_dates`` con el mismo ``until``) evita
+        volver a consultarla. ``since`` descarta las barras anteriores a esa
+        fecha y ``until`` las posteriores.
+        """
+        ticker_ids = sorted(set(ticker_ids))
+        entities = [Price.ticker_id, Price.date] + [getattr(Price, c) for c in columns]
+        query = Price.query.with_entities(*entities)
+        if since is not None:
+            query = query.filter(Price.date >= since)
+        if until is not None:
+            query = query.filter(Price.date <= until)
+        # Tickers agrupados por fecha de corte (None: sin corte); casi todos comparten la última barra
+        groups = {None: ticker_ids}
+        if max_bars:
+            # Margen de días calendario para fines de semana y feriados; luego se recorta exacto
+            margin = timedelta(days=max_bars * 7 // 5 + max_bars // 10 + 7)
+            groups = {}
+            if last_dates is None:
+                last_dates = FinanceService.last_bar_dates(ticker_ids, chunk_size, until=until)
+            for ticker_id in ticker_ids:
+                last = last_dates.get(ticker_id)
+                if last is not None:
+                    groups.setdefault(last - margin, []).append(ticker_id)
+        rows = []
+        for cutoff, group_ids in groups.items():
+            group_query = query if cutoff is None else query.filter(Price.date >= cutoff)
+            for i in range(0, len(group_ids), chunk_size):
+                rows.extend(group_query.filter(Price.ticker_id.in_(group_ids[i:i + chunk_size]))
+                            .order_by(Price.ticker_id, Price.date).all())
+        if len(groups) > 1:
+            # Cada grupo viene ordenado: timsort solo intercala sus tramos
+            rows.sort(key=lambda r: (r[0], r[1]))
+
+        fields = list(zip(*rows)) or [()] * len(entities)
+        ids = np.array(fields[0], dtype=np.int64)
+        dates = _to_datetime64(fields[1])
+        values = {c: np.array(fields[k + 2], dtype=float) for k, c in enumerate(columns)}
+
+        if max_bars and len(ids):
+            # Conservar solo las últimas max_bars filas de cada ticker
+            ends = np.r_[np.flatnonzero(ids[1:] != ids[:-1]), len(ids) - 1]
+            group = np.cumsum(np.r_[0, ids[1:] != ids[:-1]])
+            keep = ends[group] - np.arange(len(ids)) < max_bars
+            if not keep.all():
+                ids, dates = ids[keep], dates[keep]
+                values = {c: v[keep] for c, v in values.items()}
+        return ids, dates, values
+
+    @staticmethod
+    def data_version(tickers):
+        """Versión de los datos del universo.
+
+        Cambia con cada ingesta de barras (ver ``bars_watermark``), cada
+        sincronización y cada alta o baja de ticker; cuesta dos consultas por
+        clave primaria.
+        """
+        max_price_id = db.session.query(db.func.max(Price.id)).scalar() or 0
+        state = (max_price_id, FinanceService.bars_watermark(), sorted((t.id, str(t.last_sync)) for t in tickers))
+        return hashlib.sha1(repr(state).encode()).hexdigest()
+
+    @staticmethod
+    def record_ingest(ticker_id, bars):
+        """Registra que se agregaron ``bars`` barras a un ticker (avanza la marca de ingesta).
+
+        Quien agregue filas a ``price`` fuera de ``sync_ticker_data`` debe
+        llamarla antes del commit para que los deltas de ``/api/scan`` las vean.
+        """
+        db.session.add(IngestBatch(ticker_id=ticker_id, bars=bars))
+
+    @staticmethod
+    def bars_watermark():
+        """Marca de ingesta: el mayor id de ``ingest_batch`` (0 sin ingestas).
+
+        Solo avanza cuando se agregan barras; una sincronización sin barras
+        nuevas no la mueve y los ids borrados no se reutilizan.
+        """
+        return db.session.query(db.func.max(IngestBatch.id)).scalar() or 0
+
+    @staticmethod
+    def tickers_with_bars_since(mark):
+        """Ids de los tickers con barras agregadas después de la marca ``mark``."""
+        rows = IngestBatch.query.with_entities(IngestBatch.ticker_id).filter(IngestBatch.id > mark).distinct().all()
+        return {ticker_id for ticker_id, in rows}
+
+    @staticmethod
+    def last_bar_dates(ticker_ids, chunk_size=BULK_CHUNK_SIZE, until=None):
+        """Fecha de la última barra de cada ticker (versión de sus datos); None si no tiene.
+
+        Con ``until`` es la última barra hasta esa fecha: las barras
+        posteriores no cambian un resultado calculado a esa fecha.
+        """
+        ticker_ids = sorted(set(ticker_ids))
+        dates = dict.fromkeys(ticker_ids)
+        query = Price.query.with_entities(Price.ticker_id, db.func.max(Price.date)).group_by(Price.ticker_id)
+        if until is not None:
+            query = query.filter(Price.date <= until)
+        for i in range(0, len(ticker_ids), chunk_size):
+            dates.update(query.filter(Price.ticker_id.in_(ticker_ids[i:i + chunk_size])).all())
+        return dates
+
+    @staticmethod
+    def load_histories(ticker_ids, max_bars=None):
+        """Históricos por ticker (DataFrame indexado por fecha) a partir de una carga masiva."""
+        ids, dates, values = FinanceService.load_price_arrays(ticker_ids, max_bars=max_bars)
+        # Cortes estilo np.split en cada cambio de ticker_id
+        offsets = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+        bounds = zip(np.r_[0, offsets], np.r_[offsets, len(ids)])
+        histories = {}
+        for start, end in bounds:
+            if end > start:
+                index = pd.Index(dates[start:end].astype(object), name='date')
+                histories[int(ids[start])] = pd.DataFrame(
+                    {c: v[start:end] for c, v in values.items()}, index=index
+                )
+        return histories
+
+    @staticmethod
+    def get_signals_bulk(tickers, strategy='rsi_macd', exact=False, params=None, as_of=None, last_dates=None):
+        """Señales de varios tickers cargando todos sus precios de una vez (sin N+1).
+
+        ``as_of`` (``date``, por defecto hoy) recorta los precios a esa fecha
+        y es la referencia de los conteos de días. ``last_dates`` son las
+        últimas barras hasta ``as_of`` si ya se consultaron (ver
+        ``load_price_arrays``).
+        """
+        max_bars = strategy_bars(strategy, exact, params)
+        ids, dates, values = FinanceService.load_price_arrays(
+            [t.id for t in tickers], columns=('close',), max_bars=max_bars, until=as_of, last_dates=last_dates
+        )
+        panel = PricePanel.from_rows(tickers, ids, dates, values['close'])
+        FinanceService.attach_period_frames(panel, strategies.strategy_timeframes(strategy, params), as_of=as_of)
+        results = dict.fromkeys((t.id for t in tickers), None)
+        if len(panel):
+            incomplete = set()
+            evaluated = strategies.evaluate(panel, strategy, today=as_of, params=params, incomplete=incomplete)
+            for t, result in zip(panel.tickers, evaluated):
+                results[t.id] = result
+            # Los que la ventana dejó sin su racha o cruce se recalculan con todo el histórico
+            retry = strategies.truncated(panel, {panel.tickers[j].id for j in incomplete}, max_bars)
+            if retry:
+                results.update(FinanceService.get_signals_bulk(retry, strategy, exact=True, params=params, as_of=as_of))
+        return results
+
+    @staticmethod
+    def get_signals(ticker_obj, strategy='rsi_macd', history=None, exact=False, params=None, as_of=None):
+        """Señales de un ticker (None si tiene menos de 30 barras).
+
+        ``history`` es un DataFrame precargado (ver ``load_histories``); si
+        falta se consulta este ticker con la ventana de la estrategia
+        (``exact=True`` carga todo el histórico). ``params`` sobrescribe los
+        parámetros por defecto de la estrategia y ``as_of`` fija la fecha del
+        cálculo (ver ``get_signals_bulk``).
+        """
+        if history is None:
+            return FinanceService.get_signals_bulk(
+                [ticker_obj], strategy=strategy, exact=exact, params=params, as_of=as_of
+            )[ticker_obj.id]
+
+        strategies.normalize_params(strategy, params)
+        dates = np.array(history.index, dtype='datetime64[D]')
+        close = history['close'].to_numpy(dtype=float)
+        if as_of is not None:
+            keep = dates <= np.datetime64(as_of, 'D')
+            dates, close = dates[keep], close[keep]
+        ids = np.full(len(dates), ticker_obj.id, dtype=np.int64)
+        panel = PricePanel.from_rows([ticker_obj], ids, dates, close)
+        return strategies.evaluate(panel, strategy, today=as_of, params=params)[0] if len(panel) else None
+
+    @staticmethod
+    def get_signal_history(ticker_obj, strategy='rsi_macd', params=None, as_of=None):
+        """Series completas de indicadores y condiciones de un ticker (ver ``strategies.signal_history``).
+
+        Usa todo el histórico hasta ``as_of``; None si tiene menos de 30 barras.
+        """
+        strategies.normalize_params(strategy, params)
+        ids, dates, values = FinanceService.load_price_arrays([ticker_obj.id], columns=('close',), until=as_of)
+        panel = PricePanel.from_rows([ticker_obj], ids, dates, values['close'])
+        if not len(panel):
+            return None
+        FinanceService.attach_period_frames(panel, strategies.strategy_timeframes(strategy, params), as_of=as_of)
+        return strategies.signal_history(panel, strategy, params)
+
+    @staticmethod
+    def get_price_series(tickers, start=None, end=None, max_points=None, columns=PRICE_COLUMNS):
+        """Barras de varios tickers entre ``start`` y ``end`` (inclusive), en formato columnar.
+
+        Lee el rango con el índice (ticker_id, date) en una consulta por
+        lote. Devuelve ticker_id -> ``{'bars', 'dates', <columna>: [...]}``
+        (NaN -> None); ``bars`` son las barras del rango. Con ``max_points``
+        las series más largas se reducen con LTTB sobre el cierre, eligiendo
+        las mismas barras en todas las columnas.
+        """
+        ids, dates, values = FinanceService.load_price_arrays([t.id for t in tickers], columns=columns,
+                                                              since=start, until=end)
+        series = {}
+        for t in tickers:
+            lo, hi = np.searchsorted(ids, t.id), np.searchsorted(ids, t.id, side='right')
+            keep = np.arange(lo, hi)
+            if max_points:
+                keep = lo + lttb(dates[lo:hi].astype(np.int64), values['close'][lo:hi], max_points)
+            series[t.id] = {'bars': int(hi - lo), 'dates': [str(d) for d in dates[keep]]}
+            for c in columns:
+                series[t.id][c] = [_nan_to_none(v) for v in values[c][keep]]
+        return series
+
+
+def _pad_rows(arr, n_rows):
+    """Agrega filas vacías (NaN/NaT) arriba hasta tener ``n_rows`` filas."""
+    if len(arr) == n_rows:
+        return arr
+    pad = np.full((n_rows - len(arr),) + arr.shape[1:], np.nan if arr.dtype.kind == 'f' else np.datetime64('NaT'))
+    return np.concatenate([pad.astype(arr.dtype), arr])
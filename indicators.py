@@ -0,0 +1,267 @@
+"""
+Kernels vectorizados de indicadores sobre arrays NumPy.
+
+Reemplazan a pandas_ta en el camino caliente del escaneo. Todas las
+funciones aceptan un array 1-D (una serie) o 2-D (``barras x tickers``,
+el tiempo en el eje 0) y devuelven arrays de la misma forma. En 2-D cada
+columna puede empezar con NaN (historias de distinto largo): cada columna
+se siembra desde su primer valor válido, igual que si se calculara sola.
+
+Los resultados reproducen a pandas_ta (sin TA-Lib) dentro de la tolerancia
+de punto flotante; si una serie es más corta que el mínimo que exige
+pandas_ta, se devuelve NaN en lugar de ``None``.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _as_2d(x, dtype=float):
+    arr = np.asarray(x, dtype=dtype)
+    if arr.ndim == 1:
+        return arr[:, None], True
+    return arr, False
+
+
+def _restore(arr, was_1d):
+    return arr[:, 0] if was_1d else arr
+
+
+def _first_valid(x2):
+    """Índice de la primera fila no-NaN de cada columna (``len(x2)`` si no hay)."""
+    valid = ~np.isnan(x2)
+    first = valid.argmax(axis=0)
+    first[~valid.any(axis=0)] = len(x2)
+    return first
+
+
+def _ewm_dense(x2, first, alpha):
+    """EWM de columnas sin huecos (NaN solo antes de ``first``) con sumas acumuladas escaladas.
+
+    ``y_t = f·y_{t-1} + a·x_t`` (``f = 1 - a``) se escribe como
+    ``y_t = f^t · (a·Σ_{k≤t} x_k·f^{-k} + f·y_{-1})``: un ``cumsum`` por
+    bloque. Los bloques se cortan donde ``f^{-k}`` llegaría a ~1e150 (sin
+    desbordes) y cada uno arranca del último valor del anterior. La primera
+    barra de cada columna entra como ``x/a``: así ``y`` empieza en ese valor.
+    Los bloques se cuentan desde la última barra: en paneles alineados a la
+    derecha una columna da los mismos bits sola o junto a otras más largas.
+    """
+    n, n_cols = x2.shape
+    factor = 1.0 - alpha
+    if factor <= 0.0:
+        return x2.copy()
+    block = max(1, int(345.0 / -np.log(factor)))
+    k = np.arange(block, dtype=float)
+    down, up = factor ** k, factor ** -k
+    out = np.empty_like(x2)
+    carry = np.zeros(n_cols)
+    cols = np.arange(n_cols)
+    # El primer bloque puede quedar incompleto (empieza antes de la fila 0)
+    for start in range(n - -(-n // block) * block, n, block):
+        lo, hi = max(start, 0), start + block
+        seg = x2[lo:hi]
+        k = slice(lo - start, hi - start)
+        acc = seg * (alpha * up[k])[:, None]
+        missing = np.isnan(seg)
+        has_missing = missing.any()
+        if has_missing:
+            acc[missing] = 0.0
+        starts = (first >= lo) & (first < hi)
+        if starts.any():
+            rows, cs = first[starts] - lo, cols[starts]
+            acc[rows, cs] = seg[rows, cs] * up[rows + (lo - start)]
+        np.cumsum(acc, axis=0, out=acc)
+        acc += factor * carry
+        np.multiply(acc, down[k, None], out=out[lo:hi])
+        carry = out[hi - 1].copy()
+        if has_missing:
+            out[lo:hi][missing] = np.nan
+    return out
+
+
+def _ewm_gaps(x2, alpha):
+    """EWM de columnas con huecos como scan de la recurrencia afín ``y_t = c_t·y_{t-1} + d_t``.
+
+    Tras ``g`` NaN el peso viejo decae a ``f^(g+1)`` (``ignore_na=False``),
+    así que ``c_t`` y ``d_t`` varían por fila; las filas NaN son la
+    identidad. Se componen en ``log2(n)`` pasos (Hillis-Steele).
+    """
+    factor = 1.0 - alpha
+    obs = ~np.isnan(x2)
+    rows = np.arange(len(x2))[:, None]
+    started = np.maximum.accumulate(obs, axis=0)
+    # Fila de la observación anterior (-1 si no hay): el hueco es lo que las separa
+    prev = np.maximum.accumulate(np.where(obs, rows, -1), axis=0)
+    prev = np.vstack([np.full((1, x2.shape[1]), -1), prev[:-1]])
+    old_wt = factor ** (rows - prev)
+    first = obs & (prev < 0)
+    with np.errstate(invalid='ignore'):
+        c = np.where(obs, np.where(first, 0.0, old_wt / (old_wt + alpha)), 1.0)
+        d = np.where(obs, np.where(first, x2, alpha * x2 / (old_wt + alpha)), 0.0)
+    step = 1
+    while step < len(c):
+        d[step:] = c[step:] * d[:-step] + d[step:]
+        c[step:] = c[step:] * c[:-step]
+        step *= 2
+    d[~started] = np.nan
+    return d
+
+
+def _ewm(x2, alpha):
+    """``Series.ewm(alpha=alpha, adjust=False).mean()`` columna a columna, sin lazos por barra."""
+    first = _first_valid(x2)
+    # Sin huecos, los NaN de cada columna son justo los anteriores a su primer valor
+    gaps = np.isnan(x2).sum(axis=0) != first
+    if not gaps.any():
+        return _ewm_dense(x2, first, alpha)
+    out = np.empty_like(x2)
+    dense = ~gaps
+    if dense.any():
+        out[:, dense] = _ewm_dense(x2[:, dense], first[dense], alpha)
+    out[:, gaps] = _ewm_gaps(x2[:, gaps], alpha)
+    return out
+
+
+def _min_rows(x2, rows):
+    """Anula las columnas con menos de ``rows`` filas desde su primer valor (como ``v_series``)."""
+    short = len(x2) - _first_valid(x2) < rows
+    if short.any():
+        x2 = x2.copy()
+        x2[:, short] = np.nan
+    return x2
+
+
+def ema(x, length=10):
+    """EMA con semilla SMA de las primeras ``length`` barras (``ta.ema``)."""
+    x2, was_1d = _as_2d(x)
+    x2 = _min_rows(x2, length)
+    seed_row = _first_valid(x2) + length - 1
+    rows = np.arange(len(x2))[:, None]
+    seeded = np.where(rows > seed_row, x2, np.nan)
+    cols = np.flatnonzero(seed_row < len(x2))
+    if len(cols):
+        # Semilla de todas las columnas a la vez: media de sus primeras ``length`` barras
+        window = seed_row[cols] - np.arange(length)[:, None]
+        with np.errstate(invalid='ignore'):
+            seeded[seed_row[cols], cols] = np.nanmean(x2[window, cols], axis=0)
+    return _restore(_ewm(seeded, 2.0 / (length + 1)), was_1d)
+
+
+def rma(x, length=10):
+    """Media móvil de Wilder (``ta.rma``)."""
+    x2, was_1d = _as_2d(x)
+    x2 = _min_rows(x2, length)
+    alpha = (1.0 / length) if length > 0 else 0.5
+    return _restore(_ewm(x2, alpha), was_1d)
+
+
+def sma(x, length=10):
+    """Media simple; una ventana que contiene NaN devuelve NaN (``ta.sma``)."""
+    x2, was_1d = _as_2d(x)
+    out = np.full_like(x2, np.nan)
+    if len(x2) >= length:
+        out[length - 1:] = sliding_window_view(x2, length, axis=0).mean(axis=-1)
+    return _restore(out, was_1d)
+
+
+def rsi(x, length=14, scalar=100):
+    """RSI con medias de Wilder (``ta.rsi``)."""
+    x2, was_1d = _as_2d(x)
+    x2 = _min_rows(x2, length + 1)
+    delta = np.full_like(x2, np.nan)
+    delta[1:] = x2[1:] - x2[:-1]
+    gain = rma(np.where(delta < 0, 0.0, delta), length)
+    loss = rma(np.where(delta > 0, 0.0, delta), length)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out = scalar * gain / (gain + np.abs(loss))
+    return _restore(out, was_1d)
+
+
+def macd(x, fast=12, slow=26, signal=9):
+    """MACD como ``ta.macd``: devuelve ``(macd, histograma, señal)``."""
+    if slow < fast:
+        fast, slow = slow, fast
+    x2, was_1d = _as_2d(x)
+    x2 = _min_rows(x2, slow + signal - 1)
+    line = ema(x2, fast) - ema(x2, slow)
+    signal_line = ema(line, signal)
+    hist = line - signal_line
+    return tuple(_restore(a, was_1d) for a in (line, hist, signal_line))
+
+
+# --- Eventos ----------------------------------------------------------------
+#
+# Primitivas sobre condiciones booleanas (1-D o 2-D ``barras x tickers``) que
+# reemplazan a los lazos ``while`` hacia atrás. Los índices son filas del
+# array; -1 significa "nunca" y en 2-D se devuelve un array por columna.
+
+def last_true(cond):
+    """Índice de la última barra en que ``cond`` es verdadera (-1 si nunca)."""
+    c2, was_1d = _as_2d(cond, dtype=bool)
+    idx = len(c2) - 1 - c2[::-1].argmax(axis=0)
+    idx[~c2.any(axis=0)] = -1
+    return int(idx[0]) if was_1d else idx
+
+
+def first_true(cond):
+    """Índice de la primera barra en que ``cond`` es verdadera (-1 si nunca)."""
+    c2, was_1d = _as_2d(cond, dtype=bool)
+    idx = c2.argmax(axis=0)
+    idx[~c2.any(axis=0)] = -1
+    return int(idx[0]) if was_1d else idx
+
+
+def first_after(cond, start):
+    """Primera barra posterior a ``start`` en que ``cond`` es verdadera.
+
+    Devuelve -1 si no hay ninguna o si ``start`` es -1 (el evento previo nunca ocurrió).
+    """
+    c2, was_1d = _as_2d(cond, dtype=bool)
+    start = np.broadcast_to(np.asarray(start), (c2.shape[1],))
+    after = c2 & (np.arange(len(c2))[:, None] > start)
+    idx = np.where(start >= 0, first_true(after), -1)
+    return int(idx[0]) if was_1d else idx
+
+
+def run_length(cond):
+    """Largo de la racha de ``cond`` que termina en cada barra (0 donde es falsa)."""
+    c2, was_1d = _as_2d(cond, dtype=bool)
+    rows = np.arange(len(c2))[:, None]
+    last_false = np.maximum.accumulate(np.where(c2, -1, rows), axis=0)
+    return _restore(rows - last_false, was_1d)
+
+
+def streak_start(cond):
+    """Índice donde empieza la racha vigente de ``cond`` (-1 si hoy es falsa)."""
+    c2, was_1d = _as_2d(cond, dtype=bool)
+    start = last_true(~c2) + 1
+    start[~c2[-1]] = -1
+    return int(start[0]) if was_1d else start
+
+
+def last_true_so_far(cond):
+    """En cada barra, índice de la última barra (inclusive) en que ``cond`` fue verdadera (-1 si aún no)."""
+    c2, was_1d = _as_2d(cond, dtype=bool)
+    rows = np.arange(len(c2))[:, None]
+    return _restore(np.maximum.accumulate(np.where(c2, rows, -1), axis=0), was_1d)
+
+
+def rising(cond):
+    """Barras en que ``cond`` pasa a ser verdadera (era falsa la barra anterior)."""
+    c = np.asarray(cond, dtype=bool)
+    started = c.copy()
+    started[1:] &= ~c[:-1]
+    return started
+
+
+def crossover(a, b):
+    """Barras en que ``a`` pasa a estar por encima de ``b`` (estaba ``<=`` la barra anterior)."""
+    with np.errstate(invalid='ignore'):
+        above = np.asarray(a) > np.asarray(b)
+    crossed = np.zeros_like(above)
+    crossed[1:] = above[1:] & ~above[:-1]
+    return crossed
+
+
+def crossunder(a, b):
+    """Barras en que ``a`` pasa a estar por debajo de ``b``."""
+    return crossover(b, a)
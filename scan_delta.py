@@ -0,0 +1,90 @@
+"""
+Respuestas delta de ``/api/scan`` (``since=<version>``).
+
+El cliente guarda la ``version`` de la última respuesta y la devuelve como
+``since``: solo se recalculan y envían las filas de los tickers con barras
+agregadas desde entonces (ingestas posteriores a la marca de la versión,
+ver ``FinanceService.bars_watermark``), más los ids que dejaron de estar.
+Los tickers sincronizados sin barras nuevas solo envían su ``last_sync``
+(``synced``), sin recalcular la fila. La versión no guarda estado en el
+servidor (sirve en cualquier worker): fecha de referencia, marca de
+ingesta, última sincronización, huella de los argumentos del escaneo y el
+conjunto de ids que tiene el cliente como bitmap comprimido. Si cambia la
+fecha (los conteos de días) o los argumentos, la respuesta es completa.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import zlib
+from datetime import datetime
+
+
+class DeltaError(ValueError):
+    pass
+
+
+def args_key(*args):
+    """Huella de los argumentos que definen las filas (estrategia, parámetros, filtros...)."""
+    return hashlib.sha1(repr(args).encode()).hexdigest()[:16]
+
+
+def sync_mark(tickers):
+    """Última sincronización del universo (None si ningún ticker se sincronizó)."""
+    return max((t.last_sync for t in tickers if t.last_sync), default=None)
+
+
+def synced_since(tickers, mark):
+    """Tickers sincronizados después de ``mark`` (todos los sincronizados si ``mark`` es None)."""
+    return [t for t in tickers if t.last_sync and (mark is None or t.last_sync > mark)]
+
+
+def _pack_ids(ids):
+    bits = bytearray((max(ids) >> 3) + 1 if ids else 0)
+    for i in ids:
+        bits[i >> 3] |= 1 << (i & 7)
+    return base64.urlsafe_b64encode(zlib.compress(bytes(bits))).decode()
+
+
+def _unpack_ids(packed):
+    bits = zlib.decompress(base64.urlsafe_b64decode(packed))
+    return {k << 3 | b for k, byte in enumerate(bits) if byte for b in range(8) if byte >> b & 1}
+
+
+def encode_version(day, mark, synced, ids, key):
+    state = [day.isoformat(), int(mark), synced.isoformat() if synced else None, key, _pack_ids(ids)]
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode().rstrip('=')
+
+
+def _mark(value):
+    if type(value) is not int or value < 0:
+        raise ValueError(value)
+    return value
+
+
+def decode_version(token):
+    """``{'day', 'watermark', 'synced', 'key', 'ids'}`` de una versión; DeltaError si es inválida."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        day, mark, synced, key, packed = json.loads(raw)
+        return {
+            'day': datetime.strptime(day, '%Y-%m-%d').date(),
+            'watermark': _mark(mark),
+            'synced': datetime.fromisoformat(synced) if synced else None,
+            'key': key,
+            'ids': _unpack_ids(packed),
+        }
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError, zlib.error):
+        raise DeltaError(f"Versión inválida: {token}") from None
+
+
+def delta(rows, client_ids, computed_ids, current_ids):
+    """Ids borrados y conjunto de ids resultante para el cliente.
+
+    ``rows`` son las filas recalculadas que pasan los filtros (con ``id``);
+    se borran las que el cliente tenía y ya no pasan, y las de tickers que
+    ya no están en el universo.
+    """
+    kept = {row['id'] for row in rows}
+    deleted = ((client_ids & computed_ids) - kept) | (client_ids - current_ids)
+    return sorted(deleted), (client_ids - deleted) | kept
@@ -0,0 +1,198 @@
+"""
+Motor de escaneo transversal sobre un panel 2-D de precios.
+
+En lugar de consultar y construir un DataFrame por ticker, carga todos los
+tickers con una sola consulta en un panel ``barras x tickers`` (ver
+``strategies.PricePanel``) y evalúa las condiciones de cada estrategia para
+todas las columnas a la vez con operaciones NumPy 2-D. Devuelve los mismos
+diccionarios por símbolo que ``FinanceService.get_signals``.
+"""
+import itertools
+import multiprocessing as mp
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import indicators as ind
+import strategies
+from finance_service import FinanceService
+from strategies import PricePanel, strategy_bars
+
+# Tope de combinaciones por grilla de parámetros
+MAX_GRID_COMBINATIONS = 100
+
+# Datos mínimos del ticker que viajan a los procesos del pool (los modelos ORM no)
+TickerInfo = namedtuple('TickerInfo', 'id symbol last_sync')
+
+
+class ScanEngine:
+    @staticmethod
+    def load_panel(tickers, max_bars=None, timeframes=(), as_of=None):
+        """Carga el histórico de todos los tickers con una única consulta (por lote).
+
+        ``timeframes`` agrega las barras semanales/mensuales almacenadas que
+        use la estrategia (ver ``FinanceService.attach_period_frames``) y
+        ``as_of`` descarta las barras posteriores a esa fecha.
+        """
+        ticker_ids, dates, values = FinanceService.load_price_arrays(
+            [t.id for t in tickers], columns=('close',), max_bars=max_bars, until=as_of
+        )
+        panel = PricePanel.from_rows(tickers, ticker_ids, dates, values['close'])
+        return FinanceService.attach_period_frames(panel, timeframes, as_of=as_of)
+
+    @staticmethod
+    def scan(tickers, strategy='rsi_macd', workers=None, exact=False, params=None, as_of=None):
+        """Escanea el universo; con ``workers > 1`` reparte las columnas en procesos.
+
+        ``as_of`` (``date``) escanea como si fuera ese día: sin barras
+        posteriores y con los días contados desde esa fecha. Por defecto, hoy.
+        """
+        max_bars = strategy_bars(strategy, exact, params)
+        panel = ScanEngine.load_panel(tickers, max_bars=max_bars,
+                                      timeframes=strategies.strategy_timeframes(strategy, params), as_of=as_of)
+        if not len(panel):
+            return []
+        today = np.datetime64(as_of or datetime.now().date(), 'D')
+        if workers and workers > 1 and len(panel) > 1:
+            results, incomplete = _evaluate_parallel(panel, strategy, today, workers, params)
+        else:
+            results, incomplete = ScanEngine.evaluate(panel, strategy, today, params)
+        # Los que la ventana dejó sin su racha o cruce se recalculan con todo el histórico
+        retry = strategies.truncated(panel, set(incomplete), max_bars)
+        if retry:
+            full = {r['symbol']: r for r in ScanEngine.scan(retry, strategy, exact=True, params=params, as_of=as_of)}
+            results = [full.get(r['symbol'], r) for r in results]
+        return results
+
+    @staticmethod
+    def scan_grid(tickers, strategy, grid, exact=False, max_combinations=MAX_GRID_COMBINATIONS, as_of=None):
+        """Evalúa una grilla de parámetros sobre una sola carga de precios.
+
+        ``grid`` mapea parámetro -> lista de valores. Todas las combinaciones
+        comparten el panel y el grafo de indicadores: un nodo que no depende
+        del parámetro que varía se calcula una sola vez.
+        """
+        keys = sorted(grid)
+        empty = [k for k in keys if not grid[k]]
+        if empty:
+            raise strategies.InvalidParameterError(f"La grilla no tiene valores para: {', '.join(empty)}")
+        combinations = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+        if len(combinations) > max_combinations:
+            raise strategies.InvalidParameterError(
+                f"La grilla tiene {len(combinations)} combinaciones (máximo {max_combinations})"
+            )
+        normalized = [strategies.normalize_params(strategy, c) for c in combinations]
+        max_bars = None if exact else max(strategy_bars(strategy, params=c) for c in combinations)
+        timeframes = set().union(*(strategies.strategy_timeframes(strategy, c) for c in combinations))
+        panel = ScanEngine.load_panel(tickers, max_bars=max_bars, timeframes=timeframes, as_of=as_of)
+        graph = strategies.IndicatorGraph(panel, as_of)
+        incomplete = set()
+        signals = [strategies.evaluate(panel, strategy, graph=graph, params=c, incomplete=incomplete)
+                   if len(panel) else [] for c in combinations]
+        # Los tickers recortados por la ventana se reevalúan con todo el histórico (una sola carga)
+        retry = strategies.truncated(panel, {panel.tickers[j].id for j in incomplete}, max_bars)
+        if retry:
+            full_panel = ScanEngine.load_panel(retry, timeframes=timeframes, as_of=as_of)
+            full_graph = strategies.IndicatorGraph(full_panel, as_of)
+            for k, c in enumerate(combinations):
+                full = {r['symbol']: r for r in strategies.evaluate(full_panel, strategy, graph=full_graph, params=c)}
+                signals[k] = [full.get(r['symbol'], r) for r in signals[k]]
+        return [{
+            'params': {k: v for p in n.values() for k, v in p.items() if k in c},
+            'signals': s
+        } for c, n, s in zip(combinations, normalized, signals)]
+
+    @staticmethod
+    def evaluate(panel, strategy, today, params=None):
+        """Resultados del panel e ids de los tickers que pueden necesitar más histórico (ver ``strategies.truncated``)."""
+        incomplete = set()
+        results = strategies.evaluate(panel, strategy, today, params=params, incomplete=incomplete)
+        return results, [panel.tickers[j].id for j in sorted(incomplete)]
+
+
+# Pool persistente: los procesos se crean una vez (uno por CPU) y se reutilizan
+# entre escaneos; cada pedido usa hasta ``workers`` de ellos enviando a lo sumo
+# ``workers`` lotes. Se usa 'spawn' para no hacer fork de un proceso con
+# conexiones y hilos abiertos.
+MAX_WORKERS = os.cpu_count() or 1
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def clamp_workers(workers):
+    """Procesos a usar para un pedido: entre 1 y ``MAX_WORKERS``."""
+    return max(1, min(int(workers), MAX_WORKERS))
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=mp.get_context('spawn'))
+        return _pool
+
+
+def _to_shared(arr):
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    return shm, (shm.name, arr.shape, arr.dtype.str)
+
+
+def _from_shared(spec, start, stop):
+    """Copia las columnas ``[start, stop)`` de un array en memoria compartida."""
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        out = view[:, start:stop].copy()
+        del view
+    finally:
+        shm.close()
+    return out
+
+
+def _run_columns(func, dates_spec, close_spec, start, stop, infos, args):
+    """Trabajo de cada proceso: ``func(panel, *args)`` sobre su rango de columnas del panel compartido."""
+    dates = _from_shared(dates_spec, start, stop)
+    close = _from_shared(close_spec, start, stop)
+    # Recortar filas iniciales vacías: las columnas de este lote pueden ser más cortas
+    first = int(ind.first_true((~np.isnan(close)).any(axis=1)))
+    panel = PricePanel([TickerInfo(*info) for info in infos], dates[first:], close[first:])
+    return func(panel, *args)
+
+
+def map_columns(panel, func, workers, *args):
+    """Reparte las columnas del panel en ``workers`` procesos (memoria compartida).
+
+    Cada proceso arma un sub-panel con sus columnas y devuelve
+    ``func(sub_panel, *args)``; se devuelve la lista de resultados en el
+    orden de las columnas. ``func`` debe ser una función de módulo
+    (se envía por pickle) y los sub-paneles remuestrean las temporalidades
+    mayores en lugar de recibir ``panel.frames``. ``workers`` se limita a
+    ``MAX_WORKERS``.
+    """
+    dates_shm, dates_spec = _to_shared(panel.dates)
+    close_shm, close_spec = _to_shared(panel.close)
+    try:
+        infos = [(t.id, t.symbol, t.last_sync) for t in panel.tickers]
+        bounds = np.linspace(0, len(panel), min(clamp_workers(workers), len(panel)) + 1).astype(int)
+        pool = _get_pool()
+        futures = [
+            pool.submit(_run_columns, func, dates_spec, close_spec, int(a), int(b), infos[a:b], args)
+            for a, b in zip(bounds[:-1], bounds[1:])
+        ]
+        return [f.result() for f in futures]
+    finally:
+        for shm in (dates_shm, close_shm):
+            shm.close()
+            shm.unlink()
+
+
+def _evaluate_parallel(panel, strategy, today, workers, params=None):
+    chunks = map_columns(panel, ScanEngine.evaluate, workers, strategy, today, params)
+    return [r for results, _ in chunks for r in results], [i for _, ids in chunks for i in ids]
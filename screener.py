@@ -0,0 +1,166 @@
+"""
+Consultas de screener sobre los resultados del escaneo.
+
+Filtros sobre los campos de cada resultado (``rsi<30``,
+``emas_w_active=true``, ``macd_status=active``), órdenes con nombre que
+reproducen los del dashboard y paginación con ``limit``/``cursor``. La
+página se arma con un top-K sobre un heap (``heapq.nsmallest``), sin
+ordenar todo el universo, y el cursor es la clave de orden de la última
+fila devuelta.
+"""
+import base64
+import binascii
+import heapq
+import json
+import operator
+import re
+
+
+class ScreenerError(ValueError):
+    pass
+
+
+_OPS = {'<=': operator.le, '>=': operator.ge, '!=': operator.ne, '<': operator.lt, '>': operator.gt,
+        '=': operator.eq, '==': operator.eq}
+_FILTER = re.compile(r'^\s*([A-Za-z_]\w*)\s*(<=|>=|!=|==|<|>|=)\s*([^<>=!\s].*?)\s*$')
+
+
+def parse_filter(expr, types=None):
+    """``'rsi<30'`` -> ``('rsi', operator.lt, 30.0)``.
+
+    ``types`` mapea campo -> conversor del valor en texto (ValueError si es
+    inválido) para campos que no son números, booleanos ni texto libre.
+    """
+    match = _FILTER.match(expr)
+    if not match:
+        raise ScreenerError(f"Filtro inválido: {expr}")
+    field, op, raw = match.groups()
+    if types and field in types and raw.lower() != 'null':
+        try:
+            return field, _OPS[op], types[field](raw)
+        except ValueError:
+            raise ScreenerError(f"Valor inválido para {field}: {raw}") from None
+    return field, _OPS[op], _parse_value(raw)
+
+
+def _parse_value(raw):
+    lowered = raw.lower()
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    if lowered == 'null':
+        return None
+    try:
+        return float(raw)
+    except ValueError:
+        return raw
+
+
+def _matches(row, field, op, value):
+    current = row.get(field)
+    if current is None or value is None:
+        # null solo se compara por igualdad: rsi=null / rsi!=null
+        return op(current is None, value is None) if op in (operator.eq, operator.ne) else False
+    try:
+        return op(current, value)
+    except TypeError:
+        return False
+
+
+def _kind(value):
+    if isinstance(value, bool):
+        return 'bool'
+    return 'number' if isinstance(value, (int, float)) else 'text'
+
+
+def _nulls_last(value):
+    return (1, 0) if value is None else (0, value)
+
+
+def _or(value, default):
+    return default if value is None else value
+
+
+# Órdenes del dashboard (mismo criterio que tenía el ordenamiento en JavaScript)
+SORTS = {
+    # Cruce alcista del RSI más reciente primero; sin cruce al final
+    'rsi_bullish': lambda r: (_nulls_last(r.get('days_since_rsi_bullish')),),
+    # Más EMAs activas (diaria + semanal), luego racha semanal y diaria más recientes
+    'emas': lambda r: (-(bool(r.get('emas_d_active')) + bool(r.get('emas_w_active'))),
+                       _or(r.get('emas_w_days'), 9999), _or(r.get('emas_d_days'), 9999)),
+}
+
+
+def sort_key(sort):
+    """Clave de orden total: el orden pedido y el símbolo como desempate.
+
+    ``sort`` es un nombre de ``SORTS``, un campo (ascendente) o ``-campo``
+    (descendente, numérico); en ambos casos los nulos van al final.
+    """
+    if not sort:
+        base = lambda r: ()
+    elif sort in SORTS:
+        base = SORTS[sort]
+    elif re.fullmatch(r'-?[A-Za-z_]\w*', sort):
+        field, descending = sort.lstrip('-'), sort.startswith('-')
+
+        def base(r):
+            value = r.get(field)
+            if descending and value is not None:
+                if isinstance(value, str):
+                    raise ScreenerError(f"Orden descendente no numérico: {field}")
+                value = -value
+            return (_nulls_last(value),)
+    else:
+        raise ScreenerError(f"Orden desconocido: {sort}")
+    return lambda r: (base(r), r['symbol'])
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        return _as_tuple(json.loads(raw))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise ScreenerError(f"Cursor inválido: {cursor}") from None
+
+
+def _as_tuple(value):
+    return tuple(_as_tuple(v) for v in value) if isinstance(value, list) else value
+
+
+def query(rows, filters=(), sort=None, limit=None, cursor=None):
+    """Filtra, ordena y pagina ``rows``.
+
+    Devuelve ``(página, cursor_siguiente, total_filtrado)``; el cursor es
+    None en la última página. Sin ``limit`` ni ``sort`` se respeta el orden
+    original.
+    """
+    if rows:
+        fields = [field for field, _, _ in filters]
+        if sort and sort not in SORTS:
+            fields.append(sort.lstrip('-'))
+        unknown = [field for field in fields if field not in rows[0]]
+        if unknown:
+            raise ScreenerError(f"Campo desconocido: {', '.join(unknown)}")
+        # Un valor de otro tipo que el campo (rsi>abc) no es un filtro vacío sino un error
+        for field, _, value in filters:
+            sample = next((r[field] for r in rows if r.get(field) is not None), None)
+            if value is not None and sample is not None and _kind(sample) != _kind(value):
+                raise ScreenerError(f"Valor inválido para {field}: {value}")
+    rows = [r for r in rows if all(_matches(r, *f) for f in filters)]
+    total = len(rows)
+    key = sort_key(sort)
+    if cursor is not None:
+        after = decode_cursor(cursor)
+        try:
+            rows = [r for r in rows if key(r) > after]
+        except TypeError:
+            raise ScreenerError(f"Cursor inválido: {cursor}") from None
+    if limit is None:
+        return (sorted(rows, key=key) if sort else rows), None, total
+    page = heapq.nsmallest(limit, rows, key=key)
+    next_cursor = encode_cursor(key(page[-1])) if len(rows) > limit else None
+    return page, next_cursor, total
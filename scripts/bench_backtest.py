@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark del backtest vectorizado sobre un panel sintético.
+
+Uso: python scripts/bench_backtest.py [tickers] [años] [workers]
+"""
+import sys
+import os
+import time
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import backtest
+from scan_engine import map_columns
+from strategies import PricePanel
+
+
+def synthetic_panel(tickers, years):
+    bars = years * 252
+    rng = np.random.default_rng(0)
+    days = np.arange(np.datetime64('2000-01-03'), np.datetime64('2000-01-03') + bars * 2)
+    business = days[np.is_busday(days)][:bars]
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (bars, tickers)), axis=0))
+    fake = namedtuple('FakeTicker', 'id symbol last_sync')
+    return PricePanel([fake(i, f'SYN{i}', None) for i in range(tickers)],
+                      np.repeat(business[:, None], tickers, axis=1), close)
+
+
+def main():
+    tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    years = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    panel = synthetic_panel(tickers, years)
+
+    started = time.perf_counter()
+    if workers > 1:
+        trades = backtest._concat(map_columns(panel, backtest.panel_trades, workers, 'all', None,
+                                              backtest.DEFAULT_HORIZONS))
+    else:
+        trades = backtest.panel_trades(panel, 'all')
+    summary = backtest.summarize(trades)
+    elapsed = time.perf_counter() - started
+
+    print(f"Tickers: {tickers} | Barras: {len(panel.close)} | Workers: {workers} | {elapsed:.2f} s")
+    print(f"{'señal':<24}{'operaciones':>12}{'acierto 20b':>14}{'retorno 20b':>14}")
+    for name, s in summary.items():
+        h = s['horizons'][20]
+        print(f"{name:<24}{s['trades']:>12}{h['hit_rate'] or 0:>14.3f}{h['mean_return'] or 0:>14.4f}")
+
+
+if __name__ == '__main__':
+    main()
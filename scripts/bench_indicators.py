@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark de los kernels NumPy de indicators.py frente a pandas_ta.
+
+Uso: python scripts/bench_indicators.py [barras] [tickers]
+"""
+import sys
+import os
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+import indicators as ind
+
+
+def bench(stmt, number):
+    return min(timeit.repeat(stmt, number=number, repeat=3)) / number * 1000
+
+
+def main():
+    bars = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    tickers = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    rng = np.random.default_rng(0)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+    series = pd.Series(closes)
+    panel = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (bars, tickers)), axis=0))
+    rsi_values = ind.rsi(closes)
+    cond = closes > ind.ema(closes, 9)
+
+    cases = [
+        ('ema(18)', lambda: ind.ema(closes, 18), lambda: ta.ema(series, length=18), lambda: ind.ema(panel, 18)),
+        ('sma(14)', lambda: ind.sma(rsi_values, 14), lambda: ta.sma(series, length=14), lambda: ind.sma(panel, 14)),
+        ('rsi(14)', lambda: ind.rsi(closes, 14), lambda: ta.rsi(series, length=14), lambda: ind.rsi(panel, 14)),
+        ('macd(12,26,9)', lambda: ind.macd(closes), lambda: ta.macd(series), lambda: ind.macd(panel)),
+        ('streak_start', lambda: ind.streak_start(cond), None, lambda: ind.streak_start(panel > 100)),
+    ]
+
+    print(f"Barras: {bars} | Tickers en panel: {tickers}")
+    print(f"{'kernel':<15}{'numpy (ms)':>12}{'pandas_ta (ms)':>16}{'panel (ms)':>12}{'panel/ticker (ms)':>20}")
+    for name, ours, ref, on_panel in cases:
+        t_ours = bench(ours, 200)
+        t_ref = bench(ref, 50) if ref else float('nan')
+        t_panel = bench(on_panel, 3)
+        print(f"{name:<15}{t_ours:>12.3f}{t_ref:>16.3f}{t_panel:>12.1f}{t_panel / tickers:>20.4f}")
+
+
+if __name__ == '__main__':
+    main()
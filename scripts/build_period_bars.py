@@ -0,0 +1,18 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+from database import db, Ticker
+from finance_service import FinanceService
+
+# Reconstruye las barras semanales y mensuales de todos los tickers.
+# Solo hace falta una vez (o tras cargar precios por fuera de la sincronización):
+# después se mantienen incrementalmente al sincronizar.
+with app.app_context():
+    tickers = Ticker.query.all()
+    print(f"Reconstruyendo barras semanales y mensuales de {len(tickers)} tickers...")
+    for t in tickers:
+        FinanceService.update_period_bars(t.id)
+        db.session.commit()
+        print(f"  [OK] {t.symbol}")
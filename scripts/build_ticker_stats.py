@@ -0,0 +1,17 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+from database import db, Ticker
+from finance_service import FinanceService
+
+# Reconstruye la tabla ticker_stats (precio, volumen medio, máximos/mínimos de 52 semanas).
+# Solo hace falta una vez sobre una base existente: después se mantiene al sincronizar.
+with app.app_context():
+    tickers = Ticker.query.all()
+    print(f"Reconstruyendo ticker_stats de {len(tickers)} tickers...")
+    for t in tickers:
+        FinanceService.update_ticker_stats(t.id)
+        db.session.commit()
+        print(f"  [OK] {t.symbol}")
@@ -1,5 +1,5 @@
 from app import app
-from database import db, Ticker, Price
+from database import db, Ticker, Price, PeriodPrice, TickerStats, ScanSnapshot, SignalTransition
 
 # Lista de tickers sin datos para eliminar
 tickers_sin_datos = [
@@ -25,6 +25,10 @@ with app.app_context():
             price_count = Price.query.filter_by(ticker_id=ticker.id).count()
             if price_count > 0:
                 Price.query.filter_by(ticker_id=ticker.id).delete()
+                PeriodPrice.query.filter_by(ticker_id=ticker.id).delete()
+                TickerStats.query.filter_by(ticker_id=ticker.id).delete()
+                ScanSnapshot.query.filter_by(ticker_id=ticker.id).delete()
+                SignalTransition.query.filter_by(ticker_id=ticker.id).delete()
                 print(f"  ✓ {symbol:15} - Eliminado (tenía {price_count} precios)")
             else:
                 print(f"  ✓ {symbol:15} - Eliminado")
@@ -3,7 +3,7 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app import app
-from database import db, Ticker, Price
+from database import db, Ticker, Price, PeriodPrice, TickerStats, ScanSnapshot, SignalTransition
 
 with app.app_context():
     tickers_to_delete = ["DESP", "SQ", "WBA"]
@@ -19,6 +19,10 @@ with app.app_context():
             # Eliminar precios asociados primero
             price_count = Price.query.filter_by(ticker_id=ticker.id).count()
             Price.query.filter_by(ticker_id=ticker.id).delete()
+            PeriodPrice.query.filter_by(ticker_id=ticker.id).delete()
+            TickerStats.query.filter_by(ticker_id=ticker.id).delete()
+            ScanSnapshot.query.filter_by(ticker_id=ticker.id).delete()
+            SignalTransition.query.filter_by(ticker_id=ticker.id).delete()
             
             # Eliminar el ticker
             db.session.delete(ticker)
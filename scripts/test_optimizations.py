@@ -5,6 +5,7 @@ Script de prueba para verificar las optimizaciones de rendimiento.
 """
 import sys
 import os
+import tempfile
 
 # Agregar el directorio actual al path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -104,6 +105,1377 @@ def test_app_routes():
         traceback.print_exc()
         return False
 
+def _synthetic_closes(n=600, seed=7, drift=0.0):
+    """Serie de cierres sintética (paseo aleatorio, con tendencia ``drift`` por barra) reproducible."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(drift, 0.02, n)))
+
+def test_streaming_indicators():
+    """Verificar que los indicadores incrementales coinciden con pandas_ta."""
+    print("\n=== Probando indicadores incrementales ===")
+    try:
+        import json
+        import numpy as np
+        import pandas as pd
+        import pandas_ta as ta
+        import streaming_indicators as si
+
+        closes = _synthetic_closes()
+        series = pd.Series(closes)
+        rsi_ref = ta.rsi(series, length=14)
+        macd_ref = ta.macd(series)
+        expected = {
+            'ema': ta.ema(series, length=9).to_numpy(),
+            'rsi': rsi_ref.to_numpy(),
+            'rsi_sma': ta.sma(rsi_ref, length=14).to_numpy(),
+            'macd': macd_ref['MACD_12_26_9'].to_numpy(),
+            'signal': macd_ref['MACDs_12_26_9'].to_numpy(),
+        }
+
+        ema, rsi, rsi_sma, macd = si.EMA(9), si.RSI(14), si.SMA(14), si.MACD()
+        got = {k: [] for k in expected}
+        for i, close in enumerate(closes):
+            if i == len(closes) // 2:
+                # Serializar a mitad de la serie y continuar desde el estado restaurado
+                ema, rsi, rsi_sma, macd = (si.from_dict(json.loads(json.dumps(o.to_dict())))
+                                           for o in (ema, rsi, rsi_sma, macd))
+            got['ema'].append(ema.update(close))
+            got['rsi'].append(rsi.update(close))
+            got['rsi_sma'].append(rsi_sma.update(rsi.value))
+            m, _, s = macd.update(close)
+            got['macd'].append(m)
+            got['signal'].append(s)
+
+        for name, ref in expected.items():
+            if not np.allclose(np.array(got[name]), ref, equal_nan=True, atol=1e-9):
+                print(f"[ERROR] {name} difiere de pandas_ta")
+                return False
+        print("[OK] EMA, RSI, SMA y MACD incrementales coinciden con pandas_ta")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en indicadores incrementales: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_indicator_kernels():
+    """Verificar paridad de los kernels NumPy con pandas_ta (1-D y panel 2-D)."""
+    print("\n=== Probando kernels de indicadores ===")
+    try:
+        import numpy as np
+        import pandas as pd
+        import pandas_ta as ta
+        import indicators as ind
+
+        # 3000 barras: la EMA corta cruza varios bloques de sumas acumuladas
+        histories = [_synthetic_closes(n, seed) for seed, n in enumerate((35, 120, 600, 3000))]
+        for closes in histories:
+            series = pd.Series(closes)
+            rsi_ref = ta.rsi(series, length=14)
+            macd_ref = ta.macd(series)
+            checks = {
+                'ema4': (ind.ema(closes, 4), ta.ema(series, length=4)),
+                'ema18': (ind.ema(closes, 18), ta.ema(series, length=18)),
+                'rsi': (ind.rsi(closes, 14), rsi_ref),
+                'rsi_sma': (ind.sma(ind.rsi(closes, 14), 14), ta.sma(rsi_ref, length=14)),
+                'macd': (ind.macd(closes)[0], macd_ref['MACD_12_26_9']),
+                'macd_hist': (ind.macd(closes)[1], macd_ref['MACDh_12_26_9']),
+                'macd_signal': (ind.macd(closes)[2], macd_ref['MACDs_12_26_9']),
+            }
+            for name, (got, ref) in checks.items():
+                if not np.allclose(got, ref.to_numpy(), equal_nan=True, atol=1e-9):
+                    print(f"[ERROR] {name} difiere de pandas_ta ({len(closes)} barras)")
+                    return False
+
+        # Panel con historias de distinto largo alineadas por la última barra
+        panel = np.full((3000, len(histories)), np.nan)
+        for j, closes in enumerate(histories):
+            panel[-len(closes):, j] = closes
+        for name, kernel in (('ema', lambda x: ind.ema(x, 9)), ('rsi', ind.rsi), ('macd', lambda x: ind.macd(x)[2])):
+            full = kernel(panel)
+            for j, closes in enumerate(histories):
+                if not np.allclose(full[-len(closes):, j], kernel(closes), equal_nan=True):
+                    print(f"[ERROR] {name} en panel difiere del cálculo por serie")
+                    return False
+        # La EWM da los mismos bits para un ticker solo o en el panel (bloques contados desde la última barra)
+        for alpha in (2 / 5, 2 / 27):
+            full = ind._ewm(panel, alpha)
+            if any(not np.array_equal(full[-len(c):, j], ind._ewm(c[:, None], alpha)[:, 0])
+                   for j, c in enumerate(histories)):
+                print("[ERROR] La EWM en panel depende de las otras columnas")
+                return False
+
+        # Huecos en medio de la serie: el peso viejo decae por cada barra faltante (ignore_na=False)
+        def ewm_reference(values, alpha):
+            out, weighted, old_wt = [], np.nan, 1.0
+            for cur in values:
+                if weighted == weighted:
+                    old_wt *= 1.0 - alpha
+                    if cur == cur:
+                        weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                        old_wt = 1.0
+                elif cur == cur:
+                    weighted = cur
+                out.append(weighted)
+            return np.array(out)
+
+        gapped = panel[:, 1:3].copy()
+        gapped[np.random.default_rng(4).random(gapped.shape) < 0.05] = np.nan
+        for alpha in (2 / 3, 1 / 14):
+            got = ind._ewm(gapped, alpha)
+            for j in range(gapped.shape[1]):
+                if not np.allclose(got[:, j], ewm_reference(gapped[:, j], alpha), equal_nan=True, rtol=1e-12):
+                    print("[ERROR] EWM con huecos difiere de la recurrencia")
+                    return False
+
+        cond = np.array([True, False, True, True])
+        if ind.streak_start(cond) != 2 or ind.last_true(~cond) != 1:
+            print("[ERROR] streak_start/last_true incorrectos")
+            return False
+        if ind.run_length(cond).tolist() != [1, 0, 1, 2] or ind.first_after(cond, 0) != 2 \
+                or ind.first_after(cond, -1) != -1:
+            print("[ERROR] run_length/first_after incorrectos")
+            return False
+        if ind.last_true_so_far(~cond).tolist() != [-1, 1, 1, 1] or ind.rising(cond).tolist() != [True, False, True, False]:
+            print("[ERROR] last_true_so_far/rising incorrectos")
+            return False
+        a, b = np.array([1.0, 3.0, 1.0, 4.0]), np.array([2.0, 2.0, 2.0, 2.0])
+        if ind.crossover(a, b).tolist() != [False, True, False, True] \
+                or ind.crossunder(a, b).tolist() != [False, False, True, False]:
+            print("[ERROR] crossover/crossunder incorrectos")
+            return False
+        # En 2-D cada columna equivale a su serie
+        conds = np.random.default_rng(3).random((50, 4)) > 0.4
+        starts = np.array([-1, 5, 20, 49])
+        for j in range(conds.shape[1]):
+            if ind.run_length(conds)[:, j].tolist() != ind.run_length(conds[:, j]).tolist() \
+                    or ind.first_after(conds, starts)[j] != ind.first_after(conds[:, j], starts[j]) \
+                    or ind.streak_start(conds)[j] != ind.streak_start(conds[:, j]) \
+                    or ind.last_true_so_far(conds)[:, j].tolist() != ind.last_true_so_far(conds[:, j]).tolist():
+                print("[ERROR] Primitivas de eventos en panel difieren del cálculo por serie")
+                return False
+        print("[OK] Kernels coinciden con pandas_ta")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en kernels de indicadores: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def _panel_from_closes(histories):
+    """PricePanel de tickers sintéticos con barras en días hábiles hasta hoy."""
+    from collections import namedtuple
+    from datetime import date, timedelta
+    import numpy as np
+    from strategies import PricePanel
+
+    fake = namedtuple('FakeTicker', 'id symbol last_sync')
+    days = [date.today() - timedelta(days=i) for i in range(max(map(len, histories)) * 2)]
+    business_days = np.array(sorted(d for d in days if d.weekday() < 5), dtype='datetime64[D]')
+    ids = np.concatenate([np.full(len(c), i) for i, c in enumerate(histories)])
+    dates = np.concatenate([business_days[-len(c):] for c in histories])
+    tickers = [fake(i, f'SYN{i}', None) for i in range(len(histories))]
+    return PricePanel.from_rows(tickers, ids, dates, np.concatenate(histories))
+
+def _seeded_app(n_tickers=12, bars=400, drift=0.0):
+    """App Flask sobre una base SQLite temporal con históricos sintéticos.
+
+    Con ``drift`` los tickers pares bajan y los impares suben esa tendencia por barra.
+    """
+    from datetime import date, datetime, timedelta
+    import numpy as np
+    from flask import Flask
+    from database import db, init_db, Ticker, Price
+
+    test_app = Flask('scanner_test')
+    test_app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+    init_db(test_app)
+    days = [date.today() - timedelta(days=i) for i in range(bars * 2)]
+    business_days = sorted(d for d in days if d.weekday() < 5)[-bars:]
+    with test_app.app_context():
+        for i in range(n_tickers):
+            n = bars if i % 3 else 40 + 10 * i
+            closes = _synthetic_closes(n, seed=100 + i, drift=drift if i % 2 else -drift)
+            dates = business_days[-n:]
+            if i == 1:
+                # Hueco de varias semanas sin datos
+                dates, closes = dates[:200] + dates[220:], np.r_[closes[:200], closes[220:]]
+            ticker = Ticker(symbol=f'SYN{i}', last_sync=datetime.now())
+            db.session.add(ticker)
+            db.session.flush()
+            db.session.add_all([
+                Price(ticker_id=ticker.id, date=d, open=c, high=c * 1.01, low=c * 0.99, close=c, volume=1000)
+                for d, c in zip(dates, closes)
+            ])
+        db.session.commit()
+    return test_app
+
+def test_scan_engine():
+    """Verificar que el escaneo en panel coincide con get_signals por ticker."""
+    print("\n=== Probando escaneo en panel ===")
+    try:
+        import math
+        import scan_engine
+        from database import Ticker
+        from finance_service import FinanceService
+        from scan_engine import ScanEngine
+
+        test_app = _seeded_app()
+        with test_app.app_context():
+            tickers = Ticker.query.all()
+            for strategy in ('rsi_macd', '3_emas'):
+                expected = [r for r in (FinanceService.get_signals(t, strategy) for t in tickers) if r]
+                got = ScanEngine.scan(tickers, strategy)
+                if ScanEngine.scan(tickers, strategy, workers=2) != got:
+                    print(f"[ERROR] {strategy}: el escaneo en paralelo difiere del serial")
+                    return False
+                # Otro número de workers reutiliza el mismo pool (limitado a uno por CPU)
+                pool = scan_engine._get_pool()
+                if ScanEngine.scan(tickers, strategy, workers=2000) != got or scan_engine._get_pool() is not pool \
+                        or scan_engine.clamp_workers(2000) != scan_engine.MAX_WORKERS:
+                    print(f"[ERROR] {strategy}: workers sin tope o pool recreado")
+                    return False
+                if len(got) != len(expected):
+                    print(f"[ERROR] {strategy}: {len(got)} resultados, se esperaban {len(expected)}")
+                    return False
+                for a, b in zip(expected, got):
+                    for key, value in a.items():
+                        same = (math.isclose(value, b[key], rel_tol=1e-9)
+                                if isinstance(value, float) and isinstance(b[key], float) else value == b[key])
+                        if not same:
+                            print(f"[ERROR] {strategy} {a['symbol']}.{key}: {value} != {b[key]}")
+                            return False
+        print("[OK] Escaneo en panel coincide con el cálculo por ticker")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en escaneo en panel: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+class _QueryCounter:
+    """Cuenta las sentencias SQL ejecutadas sobre un engine mientras está activo."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        from sqlalchemy import event
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+def test_bulk_loading():
+    """Verificar que el escaneo por ticker carga precios con una sola consulta."""
+    print("\n=== Probando carga masiva de precios ===")
+    try:
+        import numpy as np
+        import app as app_module
+        from database import db, Ticker
+        from finance_service import FinanceService
+
+        from signal_cache import SignalCache
+
+        test_app = _seeded_app()
+        shared_cache = app_module.signals_cache
+        app_module.signals_cache = SignalCache(os.path.join(tempfile.mkdtemp(), 'cache.db'))
+        try:
+            with test_app.app_context():
+                tickers = Ticker.query.all()
+                expected = [FinanceService.get_signals(t, 'rsi_macd') for t in tickers]
+                with _QueryCounter(db.engine) as cold:
+                    got = app_module.get_cached_signals(tickers, 'rsi_macd')
+                with _QueryCounter(db.engine) as warm:
+                    app_module.get_cached_signals(tickers, 'rsi_macd')
+                ids, _, _ = FinanceService.load_price_arrays([t.id for t in tickers], max_bars=50)
+                bars_per_ticker = np.bincount(ids)[np.unique(ids)]
+        finally:
+            app_module.signals_cache = shared_cache
+
+        if bars_per_ticker.max() != 50:
+            print("[ERROR] max_bars no recorta el histórico a la ventana pedida")
+            return False
+        # Una consulta liviana de versiones (última barra por ticker) y, en frío, la de precios
+        print(f"  Consultas SQL: escaneo en frío={cold.count}, en caliente={warm.count}")
+        if cold.count != 2 or warm.count != 1:
+            print("[ERROR] Se esperaban 2 consultas en frío y 1 en caliente")
+            return False
+        if got != expected:
+            print("[ERROR] La carga masiva cambia los resultados")
+            return False
+        print("[OK] Carga masiva sin N+1")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en carga masiva: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_strategy_registry():
+    """Verificar el registro de estrategias y que el grafo comparte indicadores."""
+    print("\n=== Probando registro de estrategias ===")
+    try:
+        from app import app
+        import strategies
+
+        closes = _synthetic_closes(300)
+        panel = _panel_from_closes([closes, closes[50:]])
+        graph = strategies.IndicatorGraph(panel)
+        for name in ('rsi_macd', '3_emas'):
+            strategies.evaluate(panel, name, graph=graph)
+        computed = set(graph._values)
+        declared = {n for s in strategies.STRATEGIES.values() for n in s.indicators(s.params).values()}
+        if not declared <= computed:
+            print("[ERROR] Faltan indicadores declarados en el grafo")
+            return False
+        # close('D') aparece en las dos estrategias y en varias EMAs: un solo nodo
+        if sum(1 for n in computed if n == strategies.close('D')) != 1:
+            print("[ERROR] El cierre diario se calcula más de una vez")
+            return False
+
+        singles = [strategies.evaluate(panel, name) for name in ('rsi_macd', '3_emas')]
+        if strategies.evaluate(panel, 'all') != [{**a, **b} for a, b in zip(*singles)]:
+            print("[ERROR] strategy=all no combina los resultados de cada estrategia")
+            return False
+
+        with app.test_client() as client:
+            response = client.get('/api/scan?strategy=no_existe')
+            if response.status_code != 400:
+                print(f"[ERROR] Estrategia desconocida devolvió {response.status_code}")
+                return False
+        print(f"[OK] {len(computed)} nodos únicos para {len(strategies.STRATEGIES)} estrategias")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en registro de estrategias: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_strategy_params():
+    """Verificar parámetros de estrategia y la evaluación de grillas."""
+    print("\n=== Probando parámetros de estrategia ===")
+    try:
+        import app as app_module
+        import strategies
+        from database import Ticker
+        from scan_engine import ScanEngine
+
+        closes = _synthetic_closes(600)
+        panel = _panel_from_closes([closes, closes[100:]])
+        if strategies.evaluate(panel, 'rsi_macd', params={'rsi_length': '14'}) != strategies.evaluate(panel, 'rsi_macd'):
+            print("[ERROR] Los parámetros por defecto explícitos cambian el resultado")
+            return False
+        if strategies.evaluate(panel, 'rsi_macd', params={'rsi_length': 7})[0]['rsi'] == \
+                strategies.evaluate(panel, 'rsi_macd')[0]['rsi']:
+            print("[ERROR] rsi_length no modifica el RSI")
+            return False
+        for bad in ({'rsi_length': 'x'}, {'rsi_length': 0}, {'no_existe': 1}, {'rsi_length': 100000},
+                    {'oversold_days': 99999999}, {'oversold': 150}):
+            try:
+                strategies.normalize_params('rsi_macd', bad)
+                print(f"[ERROR] Parámetro inválido aceptado: {bad}")
+                return False
+            except strategies.InvalidParameterError:
+                pass
+
+        test_app = _seeded_app()
+        grid = {'rsi_length': [10, 14], 'macd_days': [30, 60]}
+        with test_app.app_context():
+            tickers = Ticker.query.all()
+            results = ScanEngine.scan_grid(tickers, 'rsi_macd', grid)
+            for combo in results:
+                if combo['signals'] != ScanEngine.scan(tickers, 'rsi_macd', params=combo['params']):
+                    print(f"[ERROR] La grilla difiere del escaneo individual para {combo['params']}")
+                    return False
+            # Parámetros fuera de rango, ejes vacíos o tipos inválidos: 400 con un mensaje claro
+            statuses = []
+            for body in ({'grid': {'rsi_length': [100000]}}, {'grid': {'rsi_length': []}}, {'strategy': 5},
+                         {'as_of': 20240101}, ['rsi_macd']):
+                with test_app.test_request_context('/api/scan/grid', method='POST', json=body):
+                    response, status = app_module.scan_grid()
+                    statuses.append((status, response.get_json()['error']))
+            with test_app.test_request_context('/api/scan?rsi_length=100000'):
+                statuses.append(app_module.scan_tickers()[1])
+        if [s if isinstance(s, int) else s[0] for s in statuses] != [400] * 6 \
+                or 'rsi_length' not in statuses[1][1]:
+            print(f"[ERROR] Parámetros fuera de rango no devuelven 400: {statuses}")
+            return False
+        print(f"[OK] Grilla de {len(results)} combinaciones sobre una sola carga")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en parámetros de estrategia: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_period_bars():
+    """Verificar las barras semanales/mensuales almacenadas y su actualización incremental."""
+    print("\n=== Probando barras semanales y mensuales ===")
+    try:
+        import numpy as np
+        import pandas as pd
+        from database import db, Ticker, Price, PeriodPrice
+        from finance_service import FinanceService
+        from scan_engine import ScanEngine
+
+        def stored(ticker_id):
+            return [(p.timeframe, p.date, p.last_date, p.open, p.high, p.low, p.close, p.volume)
+                    for p in PeriodPrice.query.filter_by(ticker_id=ticker_id)
+                    .order_by(PeriodPrice.timeframe, PeriodPrice.date)]
+
+        test_app = _seeded_app()
+        with test_app.app_context():
+            tickers = Ticker.query.all()
+            expected = ScanEngine.scan(tickers, '3_emas')
+            for t in tickers:
+                FinanceService.update_period_bars(t.id)
+            db.session.commit()
+
+            history = FinanceService.load_histories([tickers[1].id])[tickers[1].id]
+            history.index = pd.DatetimeIndex(history.index)
+            for timeframe, rule in (('W', 'W-FRI'), ('M', 'ME')):
+                ref = history.resample(rule).agg({'open': 'first', 'high': 'max', 'close': 'last'}).dropna()
+                rows = [r for r in stored(tickers[1].id) if r[0] == timeframe]
+                got = np.array([(r[3], r[4], r[6]) for r in rows])
+                if [r[1] for r in rows] != list(ref.index.date) or not np.allclose(got, ref.to_numpy()):
+                    print(f"[ERROR] Barras '{timeframe}' difieren de resample('{rule}')")
+                    return False
+
+            panel = ScanEngine.load_panel(tickers, timeframes={'W'})
+            if 'W' not in panel.frames or ScanEngine.scan(tickers, '3_emas') != expected:
+                print("[ERROR] Las barras semanales almacenadas cambian el escaneo")
+                return False
+
+            # Incremental: quitar las últimas barras, reconstruir y volver a agregarlas
+            ticker = tickers[2]
+            full = stored(ticker.id)
+            last = Price.query.filter_by(ticker_id=ticker.id).order_by(Price.date.desc()).limit(6).all()
+            removed = [(p.date, p.open, p.high, p.low, p.close, p.volume) for p in last]
+            for p in last:
+                db.session.delete(p)
+            FinanceService.update_period_bars(ticker.id)
+            for d, o, h, lo, c, v in removed:
+                db.session.add(Price(ticker_id=ticker.id, date=d, open=o, high=h, low=lo, close=c, volume=v))
+            FinanceService.update_period_bars(ticker.id, since=min(r[0] for r in removed))
+            db.session.commit()
+            if stored(ticker.id) != full:
+                print("[ERROR] La actualización incremental difiere de la reconstrucción completa")
+                return False
+        print("[OK] Barras agregadas coinciden con resample y se actualizan incrementalmente")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en barras agregadas: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_signal_cache():
+    """Verificar la caché de señales compartida: versiones, invalidación y desalojo."""
+    print("\n=== Probando caché de señales compartida ===")
+    try:
+        from signal_cache import SignalCache
+
+        path = os.path.join(tempfile.mkdtemp(), 'cache.db')
+        writer, reader = SignalCache(path, max_entries=5), SignalCache(path, max_entries=5)
+        versions = {1: '2024-01-05', 2: '2024-01-05'}
+        writer.set_many('rsi_macd', '[]', versions, '2024-01-06', {1: {'rsi': 25.0}, 2: None})
+        # Otra instancia sobre el mismo archivo (otro worker) ve los resultados
+        if reader.get_many('rsi_macd', '[]', versions, '2024-01-06') != {1: {'rsi': 25.0}, 2: None}:
+            print("[ERROR] La caché no se comparte entre instancias")
+            return False
+        if reader.get_many('rsi_macd', '[]', {1: '2024-01-08'}, '2024-01-06') \
+                or reader.get_many('rsi_macd', '[]', versions, '2024-01-07'):
+            print("[ERROR] Una barra nueva o un cambio de día devuelven resultados viejos")
+            return False
+        writer.invalidate(1)
+        if 1 in reader.get_many('rsi_macd', '[]', versions, '2024-01-06'):
+            print("[ERROR] invalidate no borra las entradas del ticker")
+            return False
+        writer.set_many('3_emas', '[]', {i: 'v' for i in range(10)}, 'd', {i: {} for i in range(10)})
+        if len(writer) != 5:
+            print(f"[ERROR] La caché excede su tope ({len(writer)} entradas)")
+            return False
+        stats = reader.stats()
+        expected = {'hits': 3, 'misses': 4, 'evictions': 6, 'invalidations': 1, 'computed': 12, 'entries': 5}
+        if any(stats[k] != v for k, v in expected.items()) or stats['memory_bytes'] <= 0:
+            print(f"[ERROR] Métricas de la caché incorrectas: {stats}")
+            return False
+
+        # Una lectura no espera el lock de escritura que tiene otro worker
+        import sqlite3
+        import threading
+        blocker = sqlite3.connect(path, isolation_level=None)
+        blocker.execute('BEGIN IMMEDIATE')
+        read = threading.Thread(target=reader.get_many, args=('3_emas', '[]', {9: 'v'}, 'd'))
+        read.start()
+        read.join(timeout=5)
+        blocked = read.is_alive()
+        blocker.execute('ROLLBACK')
+        read.join()
+        if blocked or reader.stats()['hits'] != 4:
+            print("[ERROR] La lectura de la caché toma el lock de escritura")
+            return False
+
+        # Otra versión del código descarta lo calculado por la anterior
+        versioned = os.path.join(tempfile.mkdtemp(), 'cache.db')
+        SignalCache(versioned, version='a').set_many('rsi_macd', '[]', versions, 'd', {1: {}})
+        same, other = len(SignalCache(versioned, version='a')), len(SignalCache(versioned, version='b'))
+        if (same, other) != (1, 0):
+            print(f"[ERROR] Un cambio de versión del código no vacía la caché: {same}, {other}")
+            return False
+
+        # Un escaneo en frío y otro en caliente: cada ticker cuenta un fallo y un acierto
+        import app as app_module
+        from database import Ticker
+        test_app = _seeded_app()
+        shared_cache = app_module.signals_cache
+        app_module.signals_cache = SignalCache(os.path.join(tempfile.mkdtemp(), 'cache.db'))
+        try:
+            with test_app.app_context():
+                tickers = Ticker.query.all()
+                for _ in range(2):
+                    app_module.get_cached_signals(tickers, app_module.resolve('rsi_macd'))
+                scans = app_module.signals_cache.stats()
+        finally:
+            app_module.signals_cache = shared_cache
+        if (scans['misses'], scans['computed'], scans['hits']) != (len(tickers),) * 3 or scans['hit_rate'] != 0.5:
+            print(f"[ERROR] Métricas de escaneo en frío y caliente incorrectas: {scans}")
+            return False
+        print("[OK] Caché compartida por versión de datos, con invalidación y tope")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en caché de señales: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_scan_etag():
+    """Verificar ETag y GET condicional en /api/scan, y la capa de métricas de cada endpoint."""
+    print("\n=== Probando ETag de /api/scan ===")
+    try:
+        import app as app_module
+        from database import Ticker
+        from signal_cache import SignalCache
+
+        def get(view, path, etag=None, **kwargs):
+            headers = {'If-None-Match': etag} if etag else {}
+            with test_app.test_request_context(path, headers=headers):
+                return view(**kwargs)
+
+        def counts():
+            stats = app_module.cache_stats()
+            return {layer: (stats[layer]['hits'], stats[layer]['misses']) for layer in app_module.RESPONSE_LAYERS}
+
+        test_app = _seeded_app()
+        shared_cache = app_module.signals_cache
+        app_module.signals_cache = SignalCache(os.path.join(tempfile.mkdtemp(), 'cache.db'))
+        app_module.clear_scan_responses()
+        try:
+            with test_app.app_context():
+                ticker_id = Ticker.query.first().id
+                first = get(app_module.scan_tickers, '/api/scan?strategy=rsi_macd')
+                etag = first.headers.get('ETag')
+                again = get(app_module.scan_tickers, '/api/scan?strategy=rsi_macd', etag)
+                other = get(app_module.scan_tickers, '/api/scan?strategy=rsi_macd&rsi_length=10', etag)
+                # Historial y precios cuentan en su propia capa, no en la de /api/scan
+                before = counts()
+                for _ in range(2):
+                    get(app_module.ticker_signal_history, f'/api/tickers/{ticker_id}/signals', ticker_id=ticker_id)
+                    get(app_module.ticker_prices, f'/api/tickers/{ticker_id}/prices', ticker_id=ticker_id)
+                after = counts()
+        finally:
+            app_module.signals_cache = shared_cache
+            app_module.clear_scan_responses()
+        if first.status_code != 200 or not etag or etag.startswith('W/'):
+            print("[ERROR] /api/scan no devuelve un ETag fuerte")
+            return False
+        if again.status_code != 304 or again.data:
+            print(f"[ERROR] If-None-Match devolvió {again.status_code} en lugar de 304")
+            return False
+        if other.status_code != 200 or other.headers.get('ETag') == etag:
+            print("[ERROR] Otros parámetros comparten el ETag")
+            return False
+        delta = {layer: tuple(a - b for a, b in zip(after[layer], before[layer])) for layer in after}
+        if delta != {'scan_responses': (0, 0), 'history_responses': (1, 1), 'price_responses': (1, 1)}:
+            print(f"[ERROR] Aciertos y fallos contados en otra capa: {delta}")
+            return False
+        print("[OK] 304 con If-None-Match y ETag distinto por parámetros; una capa de métricas por endpoint")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en ETag de /api/scan: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_cache_warmup():
+    """Verificar que el precálculo tras la sincronización deja la caché caliente."""
+    print("\n=== Probando precálculo de caché ===")
+    try:
+        import app as app_module
+        from database import db, Ticker
+        from signal_cache import SignalCache
+
+        test_app = _seeded_app()
+        shared_cache = app_module.signals_cache
+        app_module.signals_cache = SignalCache(os.path.join(tempfile.mkdtemp(), 'cache.db'))
+        try:
+            with test_app.app_context():
+                tickers = Ticker.query.all()
+                changed = [t.id for t in tickers[:4]]
+                app_module.schedule_warmup(changed).result()
+                status = dict(app_module.warmup_status)
+                with _QueryCounter(db.engine) as warm:
+                    app_module.get_cached_signals(tickers[:4], app_module.resolve('all'))
+                cached = len(app_module.signals_cache)
+        finally:
+            app_module.signals_cache = shared_cache
+
+        if status['running'] or status['done'] != status['total'] or not status['total']:
+            print(f"[ERROR] Progreso de precálculo inconsistente: {status}")
+            return False
+        # Solo los tickers cambiados, para cada estrategia y para 'all'
+        if cached != len(changed) * status['total'] or warm.count != 1:
+            print(f"[ERROR] El precálculo no dejó la caché caliente ({cached} entradas, {warm.count} consultas)")
+            return False
+        print(f"[OK] {status['done']} estrategias precalculadas para {len(changed)} tickers cambiados")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en precálculo de caché: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_single_flight():
+    """Verificar que escaneos concurrentes idénticos comparten un solo cálculo."""
+    print("\n=== Probando coalescencia de pedidos concurrentes ===")
+    try:
+        import threading
+        import time
+        import app as app_module
+        from database import Ticker
+        from finance_service import FinanceService
+        from signal_cache import SignalCache
+
+        test_app = _seeded_app()
+        calls = []
+        original = FinanceService.get_signals_bulk
+
+        def slow_bulk(tickers, *args, **kwargs):
+            calls.append(len(tickers))
+            time.sleep(0.2)
+            return original(tickers, *args, **kwargs)
+
+        def scan(out):
+            with test_app.app_context():
+                out.append(app_module.get_cached_signals(Ticker.query.all(), ('rsi_macd',)))
+
+        shared_cache = app_module.signals_cache
+        app_module.signals_cache = SignalCache(os.path.join(tempfile.mkdtemp(), 'cache.db'))
+        FinanceService.get_signals_bulk = staticmethod(slow_bulk)
+        try:
+            outputs = []
+            threads = [threading.Thread(target=scan, args=(outputs,)) for _ in range(6)]
+            for th in threads:
+                th.start()
+            for th in threads:
+                th.join()
+        finally:
+            FinanceService.get_signals_bulk = staticmethod(original)
+            app_module.signals_cache = shared_cache
+
+        if len(outputs) != 6 or any(o != outputs[0] for o in outputs):
+            print("[ERROR] Los pedidos concurrentes no obtuvieron el mismo resultado")
+            return False
+        if len(calls) != 1:
+            print(f"[ERROR] Se calcularon {len(calls)} veces los mismos tickers")
+            return False
+
+        # Caché de respuestas chica bajo muchos hilos: lecturas, altas y desalojos a la vez
+        def serve(worker, errors):
+            try:
+                for i in range(200):
+                    etag = f'e{(worker * 7 + i) % 24}'
+                    with test_app.test_request_context('/api/scan'):
+                        body = app_module.cached_json_response(etag, lambda: {'etag': etag}).get_json()
+                    if body != {'etag': etag}:
+                        errors.append(f'{etag}: {body}')
+            except Exception as e:
+                errors.append(repr(e))
+
+        cache_size = app_module.SCAN_RESPONSE_CACHE_SIZE
+        app_module.SCAN_RESPONSE_CACHE_SIZE = 4
+        app_module.clear_scan_responses()
+        try:
+            errors = []
+            threads = [threading.Thread(target=serve, args=(w, errors)) for w in range(8)]
+            for th in threads:
+                th.start()
+            for th in threads:
+                th.join()
+            entries, _ = app_module._scan_responses_size()
+        finally:
+            app_module.SCAN_RESPONSE_CACHE_SIZE = cache_size
+            app_module.clear_scan_responses()
+        if errors or entries > 4:
+            print(f"[ERROR] Caché de respuestas inconsistente con hilos: {errors[:3]}, {entries} entradas")
+            return False
+        print(f"[OK] 6 pedidos concurrentes, {len(calls)} cálculo de {calls[0]} tickers; caché de respuestas estable con 8 hilos")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en coalescencia de pedidos: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_screener():
+    """Verificar filtros, órdenes con nombre y paginación con cursor del screener."""
+    print("\n=== Probando screener ===")
+    try:
+        import strategies
+        import screener
+
+        histories = [_synthetic_closes(400, seed) for seed in range(40)]
+        rows = strategies.evaluate(_panel_from_closes(histories), 'all')
+
+        got, _, total = screener.query(rows, [screener.parse_filter('rsi<50'),
+                                              screener.parse_filter('macd_status!=none')])
+        expected = [r for r in rows if r['rsi'] is not None and r['rsi'] < 50 and r['macd_status'] != 'none']
+        if got != expected or total != len(expected):
+            print("[ERROR] Los filtros no coinciden con el filtrado manual")
+            return False
+
+        # Orden del dashboard para 3 EMAs, paginado de a 7 filas
+        key = lambda r: (-(r['emas_d_active'] + r['emas_w_active']),
+                         9999 if r['emas_w_days'] is None else r['emas_w_days'],
+                         9999 if r['emas_d_days'] is None else r['emas_d_days'], r['symbol'])
+        pages, cursor = [], None
+        while True:
+            page, cursor, _ = screener.query(rows, sort='emas', limit=7, cursor=cursor)
+            pages.extend(page)
+            if cursor is None:
+                break
+        if [r['symbol'] for r in pages] != [r['symbol'] for r in sorted(rows, key=key)]:
+            print("[ERROR] La paginación con cursor no recorre el orden completo")
+            return False
+
+        for bad in ('rsi<<3', 'rsi'):
+            try:
+                screener.parse_filter(bad)
+                print(f"[ERROR] Filtro inválido aceptado: {bad}")
+                return False
+            except screener.ScreenerError:
+                pass
+        print(f"[OK] {len(expected)} filas filtradas, {len(pages)} filas paginadas en orden")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en screener: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_ticker_stats():
+    """Verificar ticker_stats y el pre-filtro previo al cálculo de indicadores."""
+    print("\n=== Probando ticker_stats y pre-filtro ===")
+    try:
+        from datetime import timedelta
+        import numpy as np
+        import app as app_module
+        from database import db, Ticker, TickerStats
+        from finance_service import FinanceService, STATS_TYPES
+        import screener
+
+        test_app = _seeded_app()
+        with test_app.app_context():
+            tickers = Ticker.query.all()
+            for t in tickers:
+                FinanceService.update_ticker_stats(t.id)
+            db.session.commit()
+
+            history = FinanceService.load_histories([tickers[1].id])[tickers[1].id]
+            stats = db.session.get(TickerStats, tickers[1].id)
+            year = history[history.index >= history.index[-1] - timedelta(days=365)]
+            expected = (history['close'].iloc[-1], history.index[-1], history['volume'].iloc[-20:].mean(),
+                        year['high'].max(), year['low'].min(), len(history))
+            got = (stats.last_close, stats.last_date, stats.avg_volume_20, stats.high_52w, stats.low_52w, stats.bar_count)
+            if got[1:2] + got[5:] != expected[1:2] + expected[5:] or \
+                    not np.allclose([got[0], got[2], got[3], got[4]], [expected[0], expected[2], expected[3], expected[4]]):
+                print(f"[ERROR] ticker_stats incorrecto: {got} vs {expected}")
+                return False
+
+            threshold = float(np.median([db.session.get(TickerStats, t.id).last_close for t in tickers]))
+            filters = [screener.parse_filter(f'last_close>{threshold}'), screener.parse_filter('bar_count>=100')]
+            kept = FinanceService.prefilter_tickers(tickers, filters)
+            manual = [t for t in tickers if db.session.get(TickerStats, t.id).last_close > threshold
+                      and db.session.get(TickerStats, t.id).bar_count >= 100]
+            if [t.id for t in kept] != [t.id for t in manual] or not 0 < len(kept) < len(tickers):
+                print("[ERROR] El pre-filtro no coincide con el filtrado manual")
+                return False
+
+            # last_date se compara como fecha; valores que no son YYYY-MM-DD son un 400
+            last = max(db.session.get(TickerStats, t.id).last_date for t in tickers)
+            recent = FinanceService.prefilter_tickers(tickers, [screener.parse_filter(f'last_date>={last}', STATS_TYPES)])
+            if [t.id for t in recent] != [t.id for t in tickers if db.session.get(TickerStats, t.id).last_date >= last]:
+                print("[ERROR] El pre-filtro por last_date no compara fechas")
+                return False
+            statuses = []
+            for value in ('abc', '20240101'):
+                with test_app.test_request_context(f'/api/scan?prefilter=last_date>{value}'):
+                    statuses.append(app_module.scan_tickers()[1])
+            if statuses != [400, 400]:
+                print(f"[ERROR] last_date inválido no devuelve 400: {statuses}")
+                return False
+        print(f"[OK] Pre-filtro deja {len(kept)} de {len(tickers)} tickers con una consulta")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en ticker_stats: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_window_parity():
+    """Verificar que el escaneo con ventana coincide con exact=True en históricos largos con tendencia."""
+    print("\n=== Probando ventana de barras contra histórico completo ===")
+    try:
+        import math
+        from datetime import date, timedelta
+        from database import db, Ticker, Price
+        from finance_service import FinanceService
+        from scan_engine import ScanEngine
+
+        def mismatch(expected, got):
+            for a, b in zip(expected, got):
+                for key, value in a.items():
+                    same = (math.isclose(value, b[key], rel_tol=1e-6)
+                            if isinstance(value, float) and isinstance(b[key], float) else value == b[key])
+                    if not same:
+                        return f"{a['symbol']}.{key}: {value} != {b[key]}"
+            return None if len(expected) == len(got) else f"{len(got)} resultados, se esperaban {len(expected)}"
+
+        test_app = _seeded_app(n_tickers=30, bars=1500, drift=0.003)
+        with test_app.app_context():
+            tickers = Ticker.query.all()
+            # Tickers sin barras recientes: la ventana se cuenta desde su última barra, no desde hoy
+            stale = tickers[4:6]
+            for t, days in zip(stale, (900, 1500)):
+                Price.query.filter(Price.ticker_id == t.id,
+                                   Price.date > date.today() - timedelta(days=days)).delete(synchronize_session=False)
+            for t in tickers:
+                FinanceService.update_period_bars(t.id)
+            db.session.commit()
+            exact = ScanEngine.scan(tickers, 'all', exact=True)
+            bulk = FinanceService.get_signals_bulk(tickers, 'all')
+            exact_rsi = ScanEngine.scan(tickers, 'rsi_macd', exact=True)
+            bulk_rsi = FinanceService.get_signals_bulk(tickers, 'rsi_macd')
+            checks = {
+                'rsi_macd': (exact_rsi, ScanEngine.scan(tickers, 'rsi_macd')),
+                'rsi_macd bulk': (exact_rsi, [bulk_rsi[t.id] for t in tickers if bulk_rsi[t.id]]),
+                'panel': ScanEngine.scan(tickers, 'all'),
+                'parallel': ScanEngine.scan(tickers, 'all', workers=2),
+                'bulk': [bulk[t.id] for t in tickers if bulk[t.id]],
+            }
+            grid = {'ema_slow': [18, 21]}
+            exact_grid = ScanEngine.scan_grid(tickers, '3_emas', grid, exact=True)
+            windowed_grid = ScanEngine.scan_grid(tickers, '3_emas', grid)
+
+        for name, got in checks.items():
+            expected, got = got if isinstance(got, tuple) else (exact, got)
+            error = mismatch(expected, got)
+            if error:
+                print(f"[ERROR] {name} con ventana difiere de exact: {error}")
+                return False
+        for a, b in zip(exact_grid, windowed_grid):
+            error = mismatch(a['signals'], b['signals'])
+            if error:
+                print(f"[ERROR] Grilla {a['params']} con ventana difiere de exact: {error}")
+                return False
+        if not all(bulk[t.id] and bulk_rsi[t.id] for t in stale):
+            print("[ERROR] Los tickers sin barras recientes quedaron sin resultado")
+            return False
+        old = sum(1 for r in exact if r['emas_w_days'] is not None and r['emas_w_days'] > 365)
+        print(f"[OK] Ventana idéntica a exact en {len(exact)} tickers ({old} con racha o cruce semanal de más de un año, "
+              f"{len(stale)} sin barras recientes)")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en paridad de ventana: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_as_of():
+    """Verificar que as_of equivale a escanear con los datos que había ese día."""
+    print("\n=== Probando escaneo a una fecha (as_of) ===")
+    try:
+        from datetime import timedelta
+        import strategies
+        from database import db, Ticker, Price
+        from finance_service import FinanceService
+        from scan_engine import ScanEngine
+
+        test_app = _seeded_app()
+        with test_app.app_context():
+            tickers = Ticker.query.all()
+            for t in tickers:
+                FinanceService.update_period_bars(t.id)
+            db.session.commit()
+            # Un miércoles de hace unos meses: la semana y el mes en curso quedan a medias
+            last = db.session.query(db.func.max(Price.date)).scalar()
+            as_of = last - timedelta(days=90)
+            as_of -= timedelta(days=(as_of.weekday() - 2) % 7)
+
+            got = ScanEngine.scan(tickers, 'all', exact=True, as_of=as_of)
+            bulk = FinanceService.get_signals_bulk(tickers, 'all', exact=True, as_of=as_of)
+            windowed = ScanEngine.scan(tickers, 'all', as_of=as_of)
+
+            # Referencia: borrar las barras posteriores y evaluar con esa fecha como "hoy"
+            Price.query.filter(Price.date > as_of).delete()
+            for t in tickers:
+                FinanceService.update_period_bars(t.id)
+            db.session.commit()
+            panel = ScanEngine.load_panel(tickers, timeframes=strategies.strategy_timeframes('all'))
+            expected = strategies.evaluate(panel, 'all', today=as_of)
+
+            if got != expected or [bulk[t.id] for t in panel.tickers] != expected:
+                print("[ERROR] as_of difiere de escanear con los datos truncados")
+                return False
+            if [r['symbol'] for r in windowed] != [r['symbol'] for r in expected]:
+                print("[ERROR] La ventana de barras con as_of no coincide")
+                return False
+            days = [r['days_since_rsi_bullish'] for r in got if r['days_since_rsi_bullish'] is not None]
+            if any(d < 0 for d in days):
+                print("[ERROR] Conteos de días negativos con as_of")
+                return False
+        print(f"[OK] Escaneo al {as_of} idéntico al de los datos truncados ({len(expected)} tickers)")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en as_of: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_scan_snapshots():
+    """Verificar las fotos diarias del escaneo y su lectura sin recalcular."""
+    print("\n=== Probando fotos diarias del escaneo ===")
+    try:
+        from datetime import timedelta
+        import app as app_module
+        from database import db, Ticker, Price
+        from finance_service import FinanceService
+        from signal_cache import SignalCache
+
+        test_app = _seeded_app()
+        shared_cache = app_module.signals_cache
+        app_module.signals_cache = SignalCache(os.path.join(tempfile.mkdtemp(), 'cache.db'))
+        try:
+            with test_app.app_context():
+                tickers = Ticker.query.all()
+                last = db.session.query(db.func.max(Price.date)).scalar()
+                days = [last - timedelta(days=7), last]
+                for day in days:
+                    app_module.schedule_snapshot(day).result()
+                # Repetir el día la reemplaza en lugar de duplicarla
+                app_module.schedule_snapshot(days[-1]).result()
+                names = app_module.resolve('all')
+                checks = []
+                for day in days:
+                    expected = FinanceService.get_signals_bulk(tickers, names, as_of=day)
+                    with _QueryCounter(db.engine) as counter:
+                        stored = FinanceService.load_scan_snapshot(names, day)
+                    checks.append((stored == [r for r in expected.values() if r], counter.count))
+                partial = FinanceService.load_scan_snapshot(('rsi_macd',), days[0], [tickers[1].id])
+                missing = FinanceService.scan_snapshot_version(names, last + timedelta(days=1))
+        finally:
+            app_module.signals_cache = shared_cache
+
+        if not all(ok for ok, _ in checks):
+            print("[ERROR] La foto guardada difiere del escaneo de ese día")
+            return False
+        if any(count != 1 for _, count in checks) or len(partial) != 1 or missing is not None:
+            print(f"[ERROR] Lectura de fotos inesperada: consultas {[c for _, c in checks]}, parcial {len(partial)}")
+            return False
+        with app_module.app.test_client() as client:
+            absent = client.get('/api/scan?strategy=all&date=2000-01-03')
+            custom = client.get('/api/scan?strategy=rsi_macd&date=2000-01-03&rsi_length=10')
+        if absent.status_code != 404 or custom.status_code != 400:
+            print(f"[ERROR] /api/scan?date= respondió {absent.status_code}/{custom.status_code}")
+            return False
+        print(f"[OK] Fotos de {len(days)} días coinciden con el escaneo y se leen con una consulta")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en fotos del escaneo: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_signal_transitions():
+    """Verificar el registro de transiciones entre fotos diarias."""
+    print("\n=== Probando transiciones de señales ===")
+    try:
+        import app as app_module
+        from database import db, Ticker, Price
+        from finance_service import FinanceService
+        from signal_cache import SignalCache
+        from strategies import STRATEGIES
+
+        test_app = _seeded_app()
+        shared_cache = app_module.signals_cache
+        app_module.signals_cache = SignalCache(os.path.join(tempfile.mkdtemp(), 'cache.db'))
+        try:
+            with test_app.app_context():
+                tickers = Ticker.query.all()
+                days = [d for (d,) in db.session.query(Price.date).distinct().order_by(Price.date.desc()).limit(15)][::-1]
+                expected = []
+                previous = None
+                for day in days:
+                    app_module.schedule_snapshot(day).result()
+                    current = {name: FinanceService.get_signals_bulk(tickers, (name,), as_of=day) for name in STRATEGIES}
+                    if previous:
+                        for name, spec in STRATEGIES.items():
+                            for t in tickers:
+                                old, new = previous[name][t.id], current[name][t.id]
+                                if old and new:
+                                    expected.extend(
+                                        {'date': day.isoformat(), 'symbol': t.symbol, 'strategy': name,
+                                         'field': f, 'old': old[f], 'new': new[f]}
+                                        for f in spec.states if old[f] != new[f]
+                                    )
+                    previous = current
+                # Volver a fotografiar el último día no duplica sus transiciones
+                app_module.schedule_snapshot(days[-1]).result()
+                changes = FinanceService.signal_changes(days[0])
+                latest = FinanceService.signal_changes()
+                emas = FinanceService.signal_changes(days[0], ('3_emas',))
+        finally:
+            app_module.signals_cache = shared_cache
+
+        key = lambda c: (c['date'], c['strategy'], c['symbol'], c['field'])
+        if sorted(changes, key=key) != sorted(expected, key=key) or not expected:
+            print(f"[ERROR] Transiciones incorrectas: {len(changes)} registradas, {len(expected)} esperadas")
+            return False
+        if latest != [c for c in changes if c['date'] == days[-1].isoformat()] or \
+                emas != [c for c in changes if c['strategy'] == '3_emas']:
+            print("[ERROR] Filtros de /api/signals/changes incorrectos")
+            return False
+        with app_module.app.test_client() as client:
+            bad = client.get('/api/signals/changes?since=ayer')
+        if bad.status_code != 400:
+            print(f"[ERROR] since inválido respondió {bad.status_code}")
+            return False
+        print(f"[OK] {len(changes)} transiciones en {len(days)} fotos diarias")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en transiciones de señales: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_scan_delta():
+    """Verificar /api/scan?since=: solo filas cambiadas y borradas, y el merge del cliente."""
+    print("\n=== Probando escaneo delta (since=) ===")
+    try:
+        from datetime import datetime, timedelta
+        import app as app_module
+        from database import db, Ticker, Price
+        from finance_service import FinanceService
+        from signal_cache import SignalCache
+
+        def get(query):
+            with test_app.test_request_context(f'/api/scan?{query}'):
+                response = app_module.scan_tickers()
+                if isinstance(response, tuple):
+                    return response[1], response[0].get_json()
+                return response.status_code, response.get_json()
+
+        test_app = _seeded_app()
+        shared_cache = app_module.signals_cache
+        app_module.signals_cache = SignalCache(os.path.join(tempfile.mkdtemp(), 'cache.db'))
+        try:
+            with test_app.app_context():
+                args = 'strategy=all&sort=rsi_bullish'
+                _, first = get(f'{args}&since=')
+                _, unchanged = get(f'{args}&since={first["version"]}')
+
+                # Se borra el ticker con las barras de mayor id (SQLite reutiliza esos ids de price);
+                # después un ticker recibe una barra nueva y otro se sincroniza sin barras nuevas
+                tickers = Ticker.query.all()
+                edited, synced, removed = tickers[2], tickers[3], tickers[-1]
+                max_price_id = db.session.query(db.func.max(Price.id)).scalar()
+                Price.query.filter_by(ticker_id=removed.id).delete()
+                db.session.delete(removed)
+                db.session.commit()
+                bar = Price.query.filter_by(ticker_id=edited.id).order_by(Price.date.desc()).first()
+                new_bar = Price(ticker_id=edited.id, date=bar.date + timedelta(days=1), open=bar.close,
+                                high=bar.close * 1.06, low=bar.close, close=bar.close * 1.05, volume=bar.volume)
+                db.session.add(new_bar)
+                FinanceService.record_ingest(edited.id, 1)
+                edited.last_sync = synced.last_sync = datetime.now()
+                db.session.commit()
+                reused = new_bar.id <= max_price_id
+
+                _, second = get(f'{args}&since={first["version"]}')
+                _, full = get(f'{args}&since=')
+                _, other = get(f'strategy=rsi_macd&since={first["version"]}')
+                bad, _ = get(f'{args}&since=xyz')
+                paged, _ = get(f'{args}&since=&limit=5')
+                # El dashboard: una sola petición strategy=all con la clave de cada vista
+                _, views = get('strategy=all&sort=rsi_bullish&sort=emas&since=')
+                _, by_emas = get('strategy=all&sort=emas&since=')
+                malformed = [get(q)[0] for q in ('limit=abc', 'limit=0', 'filter=rsi>abc', 'sort=emas&sort=rsi_bullish')]
+        finally:
+            app_module.signals_cache = shared_cache
+
+        full_row = lambda i: next(r for r in full['results'] if r['id'] == i)
+        if not first['full'] or unchanged['full'] or unchanged['results'] or unchanged['deleted'] \
+                or unchanged['synced']:
+            print("[ERROR] Sin cambios el delta no viene vacío")
+            return False
+        if [r['id'] for r in second['results']] != [edited.id] or second['deleted'] != [removed.id]:
+            print(f"[ERROR] Delta incorrecto: {[r['id'] for r in second['results']]}, borrados {second['deleted']}")
+            return False
+        if not reused or second['synced'] != {str(synced.id): full_row(synced.id)['last_sync']}:
+            print(f"[ERROR] last_sync de los sincronizados sin barras nuevas: {second['synced']}")
+            return False
+        # Merge del lado del cliente: igual a pedir todo de nuevo
+        rows = {r['id']: r for r in first['results']}
+        for i in second['deleted']:
+            rows.pop(i, None)
+        rows.update((r['id'], r) for r in second['results'])
+        for i, last_sync in second['synced'].items():
+            rows[int(i)]['last_sync'] = last_sync
+        merged = sorted(rows.values(), key=lambda r: r['sort_key'])
+        if merged != full['results'] or not other['full'] or (bad, paged) != (400, 400):
+            print("[ERROR] El merge del delta no coincide con la respuesta completa")
+            return False
+        keys = sorted(r['sort_keys']['emas'] for r in views['results'])
+        if keys != [r['sort_key'] for r in by_emas['results']] \
+                or any(set(r['sort_keys']) != {'rsi_bullish', 'emas'} for r in views['results']) \
+                or sorted(r['id'] for r in views['results']) != sorted(r['id'] for r in full['results']):
+            print("[ERROR] El delta con varios órdenes no trae sort_keys por vista")
+            return False
+        if malformed != [400] * 4:
+            print(f"[ERROR] limit/filter/sort mal formados deberían dar 400: {malformed}")
+            return False
+        print(f"[OK] Delta con {len(second['results'])} fila y {len(second['deleted'])} borrado sobre {len(merged)} filas")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en escaneo delta: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_backtest():
+    """Verificar el backtest vectorizado contra las señales del escaneo."""
+    print("\n=== Probando backtest vectorizado ===")
+    try:
+        import numpy as np
+        import app as app_module
+        import backtest
+        from database import db, Ticker, Price
+        from finance_service import FinanceService
+        from scan_engine import ScanEngine
+
+        test_app = _seeded_app(bars=800)
+        with test_app.app_context():
+            tickers = Ticker.query.all()
+            last = db.session.query(db.func.max(Price.date)).scalar()
+            summary, trades = backtest.run(tickers, 'all', horizons=(5, 20))
+            parallel, _ = backtest.run(tickers, 'all', horizons=(5, 20), workers=2)
+            current = ScanEngine.scan(tickers, 'all', exact=True, as_of=last)
+            histories = FinanceService.load_histories([t.id for t in tickers])
+            by_symbol = {t.symbol: histories[t.id] for t in tickers}
+            # Cuerpos con tipos inválidos son un 400; workers se limita a uno por CPU
+            statuses = []
+            for body in ({'workers': '2'}, {'params': 'x'}, {'workers': True}, {'strategy': 5}, {'strategy': None},
+                         [1, 2], {'workers': 2000, 'horizons': [5, 20]}):
+                with test_app.test_request_context('/api/backtest', method='POST', json=body):
+                    response = app_module.run_backtest()
+                    statuses.append(response[1] if isinstance(response, tuple) else response.status_code)
+                    clamped = None if isinstance(response, tuple) else response.get_json()['summary']
+
+        def entries(signal, symbol):
+            t = trades[signal]
+            return {str(d) for d in t['date'][t['symbol'] == symbol]}
+
+        # La señal vigente del escaneo es una entrada del backtest ese mismo día
+        for r in current:
+            checks = [('rsi_macd.rsi_bullish', r['date_rsi_bullish'])]
+            if r['macd_status'] == 'active':
+                checks.append(('rsi_macd.macd', r['macd_date']))
+            if r['emas_d_active']:
+                checks.append(('3_emas.emas_d', r['emas_d_date']))
+            for signal, date in checks:
+                if date is not None and '20' + date not in entries(signal, r['symbol']):
+                    print(f"[ERROR] {r['symbol']}: {signal} del {date} no aparece como entrada")
+                    return False
+
+        t = trades['rsi_macd.rsi_bullish']
+        k = len(t['date']) // 2
+        history = by_symbol[t['symbol'][k]]
+        i = list(history.index).index(t['date'][k].astype(object))
+        expected = history['close'].iloc[i + 20] / history['close'].iloc[i] - 1
+        if not np.isclose(t['returns'][20][k], expected) or t['price'][k] != history['close'].iloc[i]:
+            print("[ERROR] Retorno a 20 barras incorrecto")
+            return False
+        if parallel != summary or not all(s['trades'] for s in summary.values()):
+            print("[ERROR] El backtest en procesos difiere del secuencial")
+            return False
+        if statuses != [400] * 6 + [200] or clamped != app_module.app.json.loads(app_module.app.json.dumps(summary)):
+            print(f"[ERROR] Validación del cuerpo de /api/backtest incorrecta: {statuses}")
+            return False
+        counts = ', '.join(f"{name} {s['trades']}" for name, s in summary.items())
+        print(f"[OK] Entradas coinciden con el escaneo ({counts})")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en backtest: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_signal_history():
+    """Verificar /api/tickers/<id>/signals contra el escaneo y el backtest."""
+    print("\n=== Probando historial de señales por ticker ===")
+    try:
+        import numpy as np
+        import app as app_module
+        import backtest
+        from database import Ticker
+        from scan_engine import ScanEngine
+        from signal_cache import SignalCache
+
+        def get(ticker_id, query=''):
+            with test_app.test_request_context(f'/api/tickers/{ticker_id}/signals?{query}'):
+                response = app_module.ticker_signal_history(ticker_id)
+                if isinstance(response, tuple):
+                    return response[1], response[0].get_json()
+                return response.status_code, response.get_json()
+
+        test_app = _seeded_app()
+        shared_cache = app_module.signals_cache
+        app_module.signals_cache = SignalCache(os.path.join(tempfile.mkdtemp(), 'cache.db'))
+        try:
+            with test_app.app_context():
+                tickers = Ticker.query.all()
+                ticker, short = tickers[2], tickers[0]
+                status, history = get(ticker.id, 'strategy=all')
+                # Sin la respuesta en memoria sale de la caché compartida
+                app_module.clear_scan_responses()
+                before = app_module.signals_cache.stats()
+                _, again = get(ticker.id, 'strategy=all')
+                after = app_module.signals_cache.stats()
+                current = {r['symbol']: r for r in ScanEngine.scan(tickers, 'all', exact=True)}[ticker.symbol]
+                panel = ScanEngine.load_panel([ticker], timeframes={'D', 'W'})
+                entries = backtest.entry_signals(panel, 'all')
+                early = str(panel.dates[-20, 0])
+                errors = [get(short.id, f'as_of={early}')[0], get(ticker.id, 'strategy=nope')[0],
+                          get(ticker.id, 'rsi_length=x')[0]]
+        finally:
+            app_module.signals_cache = shared_cache
+
+        daily, weekly = history['timeframes']['D'], history['timeframes']['W']
+        if status != 200 or again != history or after['hits'] != before['hits'] + 1:
+            print("[ERROR] La segunda consulta no sale de la caché")
+            return False
+        if len(daily['dates']) != len(panel.close) or any(len(v) != len(daily['dates']) for v in daily['indicators'].values()):
+            print("[ERROR] Las series diarias no están alineadas a las fechas")
+            return False
+        # El último valor de cada serie es el estado que reporta el escaneo
+        if not np.isclose(daily['indicators']['rsi_macd.rsi'][-1], current['rsi']) \
+                or daily['conditions']['3_emas.emas_d'][-1] != current['emas_d_active'] \
+                or weekly['conditions']['3_emas.emas_w'][-1] != current['emas_w_active']:
+            print("[ERROR] El último valor de las series difiere del escaneo")
+            return False
+        if any(daily['entries'][name] != cond[:, 0].tolist() for name, cond in entries.items()):
+            print("[ERROR] Las entradas difieren de las del backtest")
+            return False
+        if errors != [404, 400, 400]:
+            print(f"[ERROR] Códigos de error inesperados: {errors}")
+            return False
+        print(f"[OK] {len(daily['dates'])} barras diarias y {len(weekly['dates'])} semanales, "
+              f"{len(daily['conditions']) + len(weekly['conditions'])} condiciones")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en historial de señales: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_price_series():
+    """Verificar /api/tickers/<id>/prices y /api/prices: rango, LTTB y variante por lotes."""
+    print("\n=== Probando series de precios (rango y LTTB) ===")
+    try:
+        import numpy as np
+        import app as app_module
+        from database import Ticker, Price
+        from downsample import lttb
+
+        def get(path, view, *args):
+            with test_app.test_request_context(path):
+                response = view(*args)
+                if isinstance(response, tuple):
+                    return response[1], response[0].get_json()
+                return response.status_code, response.get_json()
+
+        # LTTB conserva los extremos y un pico aislado
+        y = np.zeros(1000)
+        y[437] = 10.0
+        picked = lttb(np.arange(1000), y, 20)
+        if len(picked) != 20 or picked[0] != 0 or picked[-1] != 999 or 437 not in picked \
+                or not (np.diff(picked) > 0).all():
+            print(f"[ERROR] LTTB no conserva extremos y picos: {picked}")
+            return False
+
+        test_app = _seeded_app()
+        with test_app.app_context():
+            ticker, other = Ticker.query.all()[2:4]
+            stored = Price.query.filter_by(ticker_id=ticker.id).order_by(Price.date).all()
+            start, end = stored[100].date, stored[299].date
+            _, full = get(f'/api/tickers/{ticker.id}/prices', app_module.ticker_prices, ticker.id)
+            _, ranged = get(f'/api/tickers/{ticker.id}/prices?from={start}&to={end}', app_module.ticker_prices,
+                            ticker.id)
+            _, reduced = get(f'/api/tickers/{ticker.id}/prices?from={start}&to={end}&max_points=50',
+                             app_module.ticker_prices, ticker.id)
+            _, batch = get(f'/api/prices?symbols={ticker.symbol},{other.symbol}&from={start}&to={end}',
+                           app_module.batch_prices)
+            errors = [
+                get(f'/api/tickers/{ticker.id}/prices?from={end}&to={start}', app_module.ticker_prices, ticker.id)[0],
+                get(f'/api/tickers/{ticker.id}/prices?max_points=2', app_module.ticker_prices, ticker.id)[0],
+                get('/api/prices?symbols=NOPE', app_module.batch_prices)[0],
+                get('/api/prices', app_module.batch_prices)[0],
+            ]
+
+        if full['bars'] != len(stored) or full['close'] != [p.close for p in stored]:
+            print("[ERROR] La serie completa no coincide con las barras almacenadas")
+            return False
+        if ranged['bars'] != 200 or ranged['dates'] != [str(p.date) for p in stored[100:300]]:
+            print("[ERROR] El rango from/to no coincide")
+            return False
+        index = {d: k for k, d in enumerate(ranged['dates'])}
+        if len(reduced['dates']) != 50 or reduced['bars'] != 200 \
+                or reduced['dates'][0] != str(start) or reduced['dates'][-1] != str(end) \
+                or any(ranged['close'][index[d]] != c for d, c in zip(reduced['dates'], reduced['close'])):
+            print("[ERROR] La reducción LTTB no elige barras del rango")
+            return False
+        if batch[ticker.symbol] != {k: v for k, v in ranged.items() if k != 'symbol'} or other.symbol not in batch:
+            print("[ERROR] La variante por lotes difiere de la individual")
+            return False
+        if errors != [400, 400, 404, 400]:
+            print(f"[ERROR] Códigos de error inesperados: {errors}")
+            return False
+        print(f"[OK] {ranged['bars']} barras en el rango reducidas a {len(reduced['dates'])} con LTTB")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error en series de precios: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
 def main():
     """Ejecutar todas las pruebas."""
     print("=" * 60)
@@ -116,6 +1488,27 @@ def main():
     results.append(("Esquema de BD", test_database_schema()))
     results.append(("FinanceService", test_finance_service()))
     results.append(("Rutas de App", test_app_routes()))
+    results.append(("Indicadores incrementales", test_streaming_indicators()))
+    results.append(("Kernels de indicadores", test_indicator_kernels()))
+    results.append(("Escaneo en panel", test_scan_engine()))
+    results.append(("Carga masiva", test_bulk_loading()))
+    results.append(("Registro de estrategias", test_strategy_registry()))
+    results.append(("Parámetros de estrategia", test_strategy_params()))
+    results.append(("Barras semanales y mensuales", test_period_bars()))
+    results.append(("Caché de señales", test_signal_cache()))
+    results.append(("ETag de /api/scan", test_scan_etag()))
+    results.append(("Precálculo de caché", test_cache_warmup()))
+    results.append(("Coalescencia de pedidos", test_single_flight()))
+    results.append(("Screener", test_screener()))
+    results.append(("Ticker stats y pre-filtro", test_ticker_stats()))
+    results.append(("Paridad de ventana", test_window_parity()))
+    results.append(("Escaneo a una fecha", test_as_of()))
+    results.append(("Fotos diarias del escaneo", test_scan_snapshots()))
+    results.append(("Transiciones de señales", test_signal_transitions()))
+    results.append(("Escaneo delta", test_scan_delta()))
+    results.append(("Backtest vectorizado", test_backtest()))
+    results.append(("Historial de señales", test_signal_history()))
+    results.append(("Series de precios", test_price_series()))
 
     print("\n" + "=" * 60)
     print("RESUMEN DE PRUEBAS")
@@ -0,0 +1,287 @@
+"""
+Caché de señales compartida entre procesos (SQLite en disco).
+
+Todos los workers de gunicorn abren el mismo archivo, así que un resultado
+calculado por uno lo sirven todos. La clave incluye la versión de los datos
+(fecha de la última barra del ticker) y la fecha de referencia de los
+conteos de días (``as_of``): una barra nueva o el cambio de día generan
+claves nuevas sin depender de que alguien limpie la caché. La ingesta
+además borra las entradas del ticker (``invalidate``) y el tamaño se acota
+desalojando las entradas usadas hace más tiempo. El archivo guarda además
+la versión del código que calculó los resultados: si al abrirlo no
+coincide (un despliegue cambió las estrategias), se vacía.
+
+Las lecturas no toman el lock de escritura: la marca de uso de cada
+acierto y los contadores se acumulan en memoria y se escriben por lotes
+(ver ``flush``).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from single_flight import process_lock
+
+DEFAULT_MAX_ENTRIES = 50000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS signal_cache (
+    ticker_id INTEGER NOT NULL,
+    strategy TEXT NOT NULL,
+    params TEXT NOT NULL,
+    last_bar TEXT NOT NULL,
+    as_of TEXT NOT NULL,
+    value TEXT NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (ticker_id, strategy, params, last_bar, as_of)
+);
+CREATE INDEX IF NOT EXISTS idx_signal_cache_accessed ON signal_cache (accessed);
+CREATE TABLE IF NOT EXISTS signal_cache_stats (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS signal_cache_meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Las marcas de uso y los contadores pendientes se escriben cada tantos segundos o entradas
+FLUSH_INTERVAL = 5.0
+FLUSH_ENTRIES = 1000
+
+# Bytes aproximados por entrada además del valor JSON (clave, índices, página)
+_ENTRY_OVERHEAD = 120
+STAT_NAMES = ('hits', 'misses', 'evictions', 'invalidations', 'computed', 'compute_seconds')
+
+
+def source_version(*modules):
+    """Huella del código fuente de ``modules`` (cambia con cualquier edición)."""
+    digest = hashlib.sha1()
+    for module in modules:
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def summarize(counts, entries, nbytes):
+    """Métricas de una caché a partir de sus contadores.
+
+    ``compute_seconds_saved`` estima el tiempo ahorrado como aciertos por el
+    costo medio de calcular una entrada.
+    """
+    counts = {name: counts.get(name, 0) for name in STAT_NAMES}
+    lookups = counts['hits'] + counts['misses']
+    per_entry = counts['compute_seconds'] / counts['computed'] if counts['computed'] else 0.0
+    for name in ('hits', 'misses', 'evictions', 'invalidations', 'computed'):
+        counts[name] = int(counts[name])
+    return dict(
+        counts,
+        entries=entries,
+        memory_bytes=nbytes,
+        hit_rate=round(counts['hits'] / lookups, 4) if lookups else None,
+        compute_seconds=round(float(counts['compute_seconds']), 3),
+        avg_compute_ms=round(per_entry * 1000, 3),
+        compute_seconds_saved=round(counts['hits'] * per_entry, 3),
+    )
+
+
+class CacheCounters:
+    """Contadores en memoria (por proceso) para cachés locales como la de respuestas."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(STAT_NAMES, 0)
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                self._counts[name] += value
+
+    def summary(self, entries, nbytes):
+        with self._lock:
+            return summarize(dict(self._counts), entries, nbytes)
+
+
+class SignalCache:
+    """Caché ``(ticker_id, estrategia, params, última barra, as_of) -> resultado``.
+
+    ``strategy`` y ``params`` son cadenas estables (ver ``key_parts``); los
+    resultados se guardan como JSON. Cada hilo y cada proceso usa su propia
+    conexión al mismo archivo. ``version`` identifica el código que calcula
+    los resultados (ver ``source_version``): con otra versión las entradas
+    del archivo se descartan al abrirlo.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, version=''):
+        self.path = path
+        self.max_entries = max_entries
+        self.version = version
+        self._local = threading.local()
+        self._pending_lock = threading.Lock()
+        self._touched = {}
+        self._pending = {}
+        self._flushed = time.monotonic()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        with self._transaction() as conn:
+            stored = conn.execute("SELECT value FROM signal_cache_meta WHERE name = 'version'").fetchone()
+            if stored is None or stored[0] != version:
+                conn.execute("DELETE FROM signal_cache")
+                conn.execute("INSERT OR REPLACE INTO signal_cache_meta VALUES ('version', ?)", (version,))
+
+    def _connect(self):
+        # Una conexión por hilo y por proceso (no sobrevive a un fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # Una sola transacción por lote (autocommit haría un fsync por fila)
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    @staticmethod
+    def key_parts(strategy, params_key, exact=False):
+        """Convierte estrategia(s) y parámetros normalizados en las columnas de la clave."""
+        name = ','.join(strategy) if not isinstance(strategy, str) else strategy
+        return name + (':exact' if exact else ''), json.dumps(params_key)
+
+    def get_many(self, strategy, params, versions, as_of, count=True):
+        """Resultados en caché para ``versions`` (ticker_id -> última barra).
+
+        Devuelve ``{ticker_id: resultado}`` solo con los aciertos y marca
+        esas entradas como usadas (en memoria, ver ``flush``). Con
+        ``count=False`` no suma aciertos ni fallos (una segunda consulta de
+        las mismas claves, ya contadas).
+        """
+        if not versions:
+            return {}
+        conn = self._connect()
+        found = {}
+        ids = list(versions)
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows = conn.execute(
+                f"SELECT ticker_id, last_bar, value FROM signal_cache "
+                f"WHERE strategy = ? AND params = ? AND as_of = ? AND ticker_id IN ({','.join('?' * len(chunk))})",
+                [strategy, params, as_of] + chunk
+            ).fetchall()
+            for ticker_id, last_bar, value in rows:
+                if last_bar == str(versions[ticker_id]):
+                    found[ticker_id] = json.loads(value)
+        now = time.time()
+        with self._pending_lock:
+            self._touched.update(((t, strategy, params, str(versions[t]), as_of), now) for t in found)
+            if count:
+                for name, value in (('hits', len(found)), ('misses', len(versions) - len(found))):
+                    self._pending[name] = self._pending.get(name, 0) + value
+            due = (len(self._touched) >= FLUSH_ENTRIES
+                   or time.monotonic() - self._flushed >= FLUSH_INTERVAL)
+        if due:
+            self.flush()
+        return found
+
+    def flush(self, conn=None):
+        """Escribe las marcas de uso y los contadores acumulados por este proceso.
+
+        Con ``conn`` se escriben dentro de esa transacción ya abierta.
+        """
+        with self._pending_lock:
+            touched, self._touched = self._touched, {}
+            pending, self._pending = self._pending, {}
+            self._flushed = time.monotonic()
+        if not (touched or pending):
+            return
+        if conn is None:
+            with self._transaction() as conn:
+                self._write_pending(conn, touched, pending)
+        else:
+            self._write_pending(conn, touched, pending)
+
+    def _write_pending(self, conn, touched, pending):
+        conn.executemany(
+            "UPDATE signal_cache SET accessed = ? "
+            "WHERE ticker_id = ? AND strategy = ? AND params = ? AND last_bar = ? AND as_of = ?",
+            [(accessed,) + key for key, accessed in touched.items()]
+        )
+        self._count(conn, **pending)
+
+    def set_many(self, strategy, params, versions, as_of, results, compute_seconds=0.0):
+        """Guarda ``results`` (ticker_id -> resultado) y desaloja lo que exceda el tope.
+
+        ``compute_seconds`` es lo que costó calcularlos (para estimar el
+        tiempo que ahorra cada acierto).
+        """
+        if not results:
+            return
+        now = time.time()
+        rows = [(t, strategy, params, str(versions[t]), as_of, json.dumps(r), now) for t, r in results.items()]
+        with self._transaction() as conn:
+            # Ya se tiene el lock de escritura: se aprovecha para escribir lo pendiente
+            self.flush(conn)
+            conn.executemany("INSERT OR REPLACE INTO signal_cache VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._count(conn, computed=len(rows), compute_seconds=compute_seconds, evictions=self._evict(conn))
+
+    def _evict(self, conn):
+        excess = conn.execute("SELECT count(*) FROM signal_cache").fetchone()[0] - self.max_entries
+        if excess <= 0:
+            return 0
+        return conn.execute(
+            "DELETE FROM signal_cache WHERE rowid IN "
+            "(SELECT rowid FROM signal_cache ORDER BY accessed LIMIT ?)", (excess,)
+        ).rowcount
+
+    @staticmethod
+    def _count(conn, **counts):
+        # Contadores compartidos por todos los workers, en la misma transacción
+        conn.executemany(
+            "INSERT INTO signal_cache_stats VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+            [(name, value) for name, value in counts.items() if value]
+        )
+
+    def stats(self):
+        """Métricas de la caché sumadas entre todos los workers (ver ``summarize``).
+
+        Incluye lo pendiente de este proceso; el de otros workers llega con
+        su próximo ``flush``.
+        """
+        self.flush()
+        conn = self._connect()
+        counts = dict(conn.execute("SELECT name, value FROM signal_cache_stats").fetchall())
+        entries, nbytes = conn.execute("SELECT count(*), coalesce(sum(length(value)), 0) FROM signal_cache").fetchone()
+        return dict(summarize(counts, entries, nbytes + entries * _ENTRY_OVERHEAD), max_entries=self.max_entries)
+
+    def lock(self, strategy, params):
+        """Lock entre procesos para calcular las entradas faltantes de (estrategia, params)."""
+        return process_lock(self.path + '.locks', strategy + params)
+
+    def invalidate(self, ticker_id):
+        """Borra todas las entradas de un ticker (llamado por la ingesta)."""
+        with self._transaction() as conn:
+            deleted = conn.execute("DELETE FROM signal_cache WHERE ticker_id = ?", (ticker_id,)).rowcount
+            self._count(conn, invalidations=deleted)
+
+    def clear(self):
+        self._connect().execute("DELETE FROM signal_cache")
+
+    def __len__(self):
+        return self._connect().execute("SELECT count(*) FROM signal_cache").fetchone()[0]
@@ -0,0 +1,84 @@
+"""
+Coalescencia de cálculos idénticos concurrentes (single-flight).
+
+Si varios hilos piden la misma clave mientras se está calculando, solo el
+primero la calcula y el resto espera y comparte su resultado (o su
+excepción). ``process_lock`` extiende la idea entre procesos con un lock
+de archivo: quien lo obtiene después de esperar debe volver a consultar la
+caché antes de calcular.
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo coalescencia entre hilos del mismo proceso
+    fcntl = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def do(self, key, compute):
+        """Resultado de ``compute()`` para ``key``, compartido con llamadas concurrentes."""
+        return self.do_many([key], lambda keys: {key: compute()})[key]
+
+    def do_many(self, keys, compute):
+        """Resultados para ``keys``; ``compute(claves)`` devuelve un dict clave -> valor.
+
+        Las claves que ya calcula otro hilo se esperan; ``compute`` recibe
+        solo las que este hilo tomó a su cargo, todas juntas en una llamada.
+        """
+        owned, waiting = {}, {}
+        with self._lock:
+            for key in keys:
+                if key in self._inflight:
+                    if key not in owned:
+                        waiting[key] = self._inflight[key]
+                else:
+                    owned[key] = self._inflight[key] = Future()
+
+        results = {}
+        if owned:
+            try:
+                computed = compute(list(owned))
+            except BaseException as e:
+                self._finish(owned, error=e)
+                raise
+            self._finish(owned, computed)
+            results.update((key, computed[key]) for key in owned)
+        for key, future in waiting.items():
+            results[key] = future.result()
+        return results
+
+    def _finish(self, owned, computed=None, error=None):
+        # Primero se publican los resultados y después se liberan las claves
+        for key, future in owned.items():
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(computed[key])
+        with self._lock:
+            for key in owned:
+                del self._inflight[key]
+
+
+@contextmanager
+def process_lock(directory, name):
+    """Lock exclusivo entre procesos para ``name`` (sin efecto si no hay ``fcntl``)."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, hashlib.sha1(name.encode()).hexdigest()[:16] + '.lock')
+    with open(path, 'a') as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
@@ -0,0 +1,648 @@
+"""
+Registro declarativo de estrategias y grafo compartido de indicadores.
+
+Cada estrategia declara los indicadores que necesita (con sus parámetros)
+como nodos de un grafo, y una función de condiciones que recibe esos
+indicadores ya calculados. ``IndicatorGraph`` memoiza cada nodo por su
+clave (operación, entradas, parámetros), de modo que los indicadores
+compartidos (la misma EMA en varias estrategias, el remuestreo semanal, el
+RSI que alimenta a su SMA) se calculan una sola vez por panel.
+
+Los nodos operan sobre un ``PricePanel`` (``barras x tickers``), así que la
+misma definición sirve para un ticker (panel de una columna) o para todo el
+universo.
+"""
+import math
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+import indicators as ind
+
+MIN_BARS = 30
+_NAT = np.datetime64('NaT', 'D')
+
+
+class UnknownStrategyError(ValueError):
+    pass
+
+
+class PricePanel:
+    """Precios de varios tickers como matrices ``barras x tickers``.
+
+    Alineado por la última barra de cada ticker (la fila -1 es la última
+    barra de cada columna) con una matriz paralela de fechas: cada columna
+    ve exactamente su propia serie aunque los calendarios difieran.
+    ``frames`` guarda temporalidades mayores ya cargadas (timeframe ->
+    ``(fechas, cierres)`` con la misma alineación); las que falten se
+    remuestrean desde las barras diarias.
+    """
+
+    def __init__(self, tickers, dates, close, frames=None):
+        self.tickers = tickers
+        self.dates = dates
+        self.close = close
+        self.frames = frames or {}
+
+    def __len__(self):
+        return len(self.tickers)
+
+    @classmethod
+    def from_rows(cls, tickers, ticker_ids, dates, close):
+        """Arma el panel a partir de filas ordenadas por (ticker_id, date)."""
+        by_id = {t.id: t for t in tickers}
+        starts = np.flatnonzero(np.r_[True, ticker_ids[1:] != ticker_ids[:-1]])
+        lengths = np.diff(np.r_[starts, len(ticker_ids)])
+        keep = lengths >= MIN_BARS
+        col_ids = ticker_ids[starts[keep]]
+        n_rows = int(lengths[keep].max()) if keep.any() else 0
+
+        col_of_group = np.cumsum(keep) - 1
+        group = np.repeat(np.arange(len(starts)), lengths)
+        rows_kept = keep[group]
+        group = group[rows_kept]
+        rank = np.arange(len(ticker_ids))[rows_kept] - starts[group]
+        row = n_rows - lengths[group] + rank
+        col = col_of_group[group]
+
+        panel_dates = np.full((n_rows, len(col_ids)), _NAT)
+        panel_close = np.full((n_rows, len(col_ids)), np.nan)
+        panel_dates[row, col] = dates[rows_kept]
+        panel_close[row, col] = close[rows_kept]
+        return cls([by_id[int(i)] for i in col_ids], panel_dates, panel_close)
+
+
+# --- Temporalidades mayores ------------------------------------------------
+
+TIMEFRAMES = ('D', 'W', 'M')
+
+
+def period_index(dates, timeframe):
+    """Número de período (semana ``W-FRI`` o mes) de cada fecha, contado desde 1970."""
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    if timeframe == 'W':
+        # 1970-01-01 fue jueves: (días + 3) % 7 da el día de semana con lunes = 0,
+        # y los viernes son 7k + 1
+        return (days + (4 - (days + 3) % 7) % 7) // 7
+    if timeframe == 'M':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f"Temporalidad no soportada: {timeframe}")
+
+
+def period_end(index, timeframe):
+    """Fecha que etiqueta cada período: el viernes de la semana o el último día del mes."""
+    index = np.asarray(index, dtype=np.int64)
+    if timeframe == 'W':
+        return (index * 7 + 1).astype('datetime64[D]')
+    if timeframe == 'M':
+        return (index + 1).astype('datetime64[M]').astype('datetime64[D]') - np.timedelta64(1, 'D')
+    raise ValueError(f"Temporalidad no soportada: {timeframe}")
+
+
+def period_frame(periods, close, cols, n_cols, timeframe, first=None):
+    """Coloca cierres por período en una matriz ``períodos x tickers``.
+
+    ``periods``/``close``/``cols`` son filas (índice de período, cierre,
+    columna). Cada columna se alinea por su último período y, como en
+    ``resample``, los períodos sin barras entre el primero y el último
+    quedan como NaN. ``first`` recorta cada columna desde ese período.
+    """
+    last = np.full(n_cols, np.iinfo(np.int64).min)
+    np.maximum.at(last, cols, periods)
+    start = np.full(n_cols, np.iinfo(np.int64).max)
+    np.minimum.at(start, cols, periods)
+    if first is not None:
+        start = np.maximum(start, first)
+    has = last >= start
+    n_rows = int((last - start + 1)[has].max()) if has.any() else 0
+
+    keep = periods >= start[cols]
+    row = n_rows - 1 - (last[cols] - periods)
+    f_close = np.full((n_rows, n_cols), np.nan)
+    f_close[row[keep], cols[keep]] = close[keep]
+
+    offsets = (n_rows - 1 - np.arange(n_rows))[:, None]
+    f_periods = last[None, :] - offsets
+    f_dates = np.where((f_periods >= start) & has, period_end(np.where(has, f_periods, 0), timeframe), _NAT)
+    return f_dates, f_close
+
+
+def resample_close(dates, close, timeframe):
+    """Remuestrea el panel diario a semanas (``W-FRI``) o meses, como ``resample``.
+
+    Igual que ``resample``, los períodos sin barras quedan como NaN entre el
+    primero y el último de cada columna.
+    """
+    valid = ~np.isnat(dates)
+    periods = period_index(np.where(valid, dates, np.datetime64(0, 'D')), timeframe)
+    period_last = valid.copy()
+    period_last[:-1] &= periods[:-1] != periods[1:]
+    rows, cols = np.nonzero(period_last)
+    return period_frame(periods[rows, cols], close[rows, cols], cols, dates.shape[1], timeframe)
+
+
+def weekly_close(dates, close):
+    """Remuestrea el panel diario a semanas que cierran el viernes (``W-FRI``)."""
+    return resample_close(dates, close, 'W')
+
+
+# --- Nodos del grafo -------------------------------------------------------
+
+class Node(namedtuple('Node', 'op inputs params')):
+    """Nodo del grafo: operación, nodos de entrada y parámetros (hashable)."""
+
+
+def _node(op, *inputs, **params):
+    return Node(op, tuple(inputs), tuple(sorted(params.items())))
+
+
+def bars(timeframe='D'):
+    """Fechas y cierres del panel en la temporalidad pedida ('D', 'W' o 'M')."""
+    return _node('bars', timeframe=timeframe)
+
+
+def close(timeframe='D'):
+    return _node('pick', bars(timeframe), index=1)
+
+
+def ema(source, length):
+    return _node('ema', source, length=length)
+
+
+def sma(source, length):
+    return _node('sma', source, length=length)
+
+
+def rsi(source, length=14):
+    return _node('rsi', source, length=length)
+
+
+def macd(source, fast=12, slow=26, signal=9):
+    """Nodo ``(macd, histograma, señal)``; ver ``macd_line`` y ``macd_signal``."""
+    return _node('macd', source, fast=fast, slow=slow, signal=signal)
+
+
+def macd_line(source, **params):
+    return _node('pick', macd(source, **params), index=0)
+
+
+def macd_signal(source, **params):
+    return _node('pick', macd(source, **params), index=2)
+
+
+def _bars(g, timeframe):
+    if timeframe == 'D':
+        return g.panel.dates, g.panel.close
+    if timeframe in g.panel.frames:
+        return g.panel.frames[timeframe]
+    return resample_close(g.panel.dates, g.panel.close, timeframe)
+
+
+_OPS = {
+    'bars': _bars,
+    'pick': lambda g, value, index: value[index],
+    'ema': lambda g, x, length: ind.ema(x, length),
+    'sma': lambda g, x, length: ind.sma(x, length),
+    'rsi': lambda g, x, length: ind.rsi(x, length),
+    'macd': lambda g, x, fast, slow, signal: ind.macd(x, fast, slow, signal),
+}
+
+
+class IndicatorGraph:
+    """Evalúa nodos sobre un panel calculando cada uno una sola vez."""
+
+    def __init__(self, panel, today=None):
+        self.panel = panel
+        # Fecha de referencia de los conteos de días (date o datetime64); por defecto hoy
+        self.today = np.datetime64(today if today is not None else datetime.now().date(), 'D')
+        self._values = {}
+
+    def __getitem__(self, node):
+        if node not in self._values:
+            inputs = [self[i] for i in node.inputs]
+            self._values[node] = _OPS[node.op](self, *inputs, **dict(node.params))
+        return self._values[node]
+
+    def dates(self, timeframe='D'):
+        return self[bars(timeframe)][0]
+
+
+# --- Registro de estrategias -----------------------------------------------
+
+class StrategyWindow(namedtuple('StrategyWindow', 'lookback warmup')):
+    """Barras que inspecciona una estrategia (lookback) más las previas que
+    necesitan sus indicadores para converger (warmup)."""
+
+    @property
+    def bars(self):
+        return self.lookback + self.warmup
+
+
+Strategy = namedtuple('Strategy', 'name params indicators conditions window states entries series limits')
+
+STRATEGIES = {}
+
+# Campo reservado de las condiciones: columnas que necesitan más histórico que el panel
+NEEDS_HISTORY = '_needs_history'
+
+
+class InvalidParameterError(ValueError):
+    pass
+
+
+def register(name, params, indicators, window, limits, states=(), entries=None, series=None):
+    """Registra una estrategia.
+
+    ``params`` son los valores por defecto y ``limits`` el rango ``(mínimo,
+    máximo)`` admitido de cada uno; ``indicators(p)`` devuelve un dict
+    alias -> nodo y ``window(p)`` su ``StrategyWindow`` para los parámetros
+    ``p``. La función decorada recibe ``(grafo, valores, p)`` y devuelve
+    campo -> lista por ticker; el campo ``NEEDS_HISTORY`` (opcional, no se
+    publica) marca las columnas cuyo resultado puede depender de barras
+    anteriores a las cargadas (ver ``evaluate``). ``states`` son los campos cuyo cambio entre
+    un día y el siguiente es una transición de la señal. ``entries`` recibe
+    lo mismo que las condiciones y devuelve señal -> matriz booleana
+    ``barras x tickers`` (diaria) con las barras de entrada, evaluadas con
+    los datos disponibles en cada barra (ver ``backtest``). ``series`` (mismos
+    argumentos) devuelve condición -> ``(temporalidad, matriz booleana)`` con
+    el estado de cada condición en cada barra (ver ``signal_history``).
+    """
+    def decorator(conditions):
+        STRATEGIES[name] = Strategy(name, params, indicators, conditions, window, tuple(states), entries, series,
+                                    limits)
+        return conditions
+    return decorator
+
+
+def get_strategy(name):
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        raise UnknownStrategyError(f"Estrategia desconocida: {name}") from None
+
+
+def resolve(strategy):
+    """Normaliza ``'all'``, ``'a,b'`` o una lista a una tupla de estrategias registradas."""
+    if isinstance(strategy, str):
+        names = tuple(STRATEGIES) if strategy == 'all' else tuple(s.strip() for s in strategy.split(','))
+    else:
+        names = tuple(strategy)
+    for name in names:
+        get_strategy(name)
+    return names
+
+
+def normalize_params(strategy, params=None):
+    """Parámetros completos por estrategia: ``{estrategia: {param: valor}}``.
+
+    Completa con los valores por defecto, convierte al tipo del valor por
+    defecto (los de la query string llegan como texto) y rechaza parámetros
+    que ninguna de las estrategias declara o fuera de su rango (``limits``).
+    """
+    params = dict(params or {})
+    normalized = {}
+    used = set()
+    for name in resolve(strategy):
+        values = {}
+        for key, default in STRATEGIES[name].params.items():
+            if key in params:
+                used.add(key)
+                try:
+                    values[key] = type(default)(params[key])
+                except (TypeError, ValueError):
+                    raise InvalidParameterError(f"Parámetro inválido: {key}={params[key]}") from None
+                low, high = STRATEGIES[name].limits[key]
+                if not low <= values[key] <= high:
+                    raise InvalidParameterError(f"Parámetro fuera de rango: {key}={params[key]} ({low} a {high})")
+            else:
+                values[key] = default
+        normalized[name] = values
+    unknown = set(params) - used
+    if unknown:
+        raise InvalidParameterError(f"Parámetros desconocidos: {', '.join(sorted(unknown))}")
+    return normalized
+
+
+def params_key(normalized):
+    """Clave hashable y estable de unos parámetros normalizados (para cachés)."""
+    return tuple(sorted((name, tuple(sorted(values.items()))) for name, values in normalized.items()))
+
+
+def strategy_bars(strategy, exact=False, params=None):
+    """Barras diarias a cargar para ``strategy`` (None = todo el histórico).
+
+    Con varias estrategias se carga la ventana más larga entre ellas.
+    """
+    normalized = normalize_params(strategy, params)
+    if exact:
+        return None
+    return max(STRATEGIES[name].window(p).bars for name, p in normalized.items())
+
+
+def strategy_timeframes(strategy, params=None):
+    """Temporalidades que leen los indicadores de ``strategy``."""
+    timeframes = set()
+    pending = [node for name, p in normalize_params(strategy, params).items()
+               for node in STRATEGIES[name].indicators(p).values()]
+    while pending:
+        node = pending.pop()
+        if node.op == 'bars':
+            timeframes.add(dict(node.params)['timeframe'])
+        pending.extend(node.inputs)
+    return timeframes
+
+
+def evaluate(panel, strategy, today=None, graph=None, params=None, incomplete=None):
+    """Resultados por ticker del panel (mismo formato que ``get_signals``).
+
+    ``strategy`` puede nombrar varias estrategias (ver ``resolve``): se
+    evalúan en una sola pasada sobre el mismo grafo y sus campos se combinan
+    en un único diccionario por ticker. Un mismo ``graph`` puede reutilizarse
+    entre llamadas con distintos ``params``: los nodos que no cambian (por
+    ejemplo el MACD al variar el largo del RSI) no se recalculan. Si se pasa
+    el set ``incomplete`` se le agregan las columnas cuyo resultado puede
+    cambiar con barras anteriores a las del panel (ver ``truncated``).
+    """
+    graph = graph or IndicatorGraph(panel, today)
+    results = _base_results(panel)
+    for name, p in normalize_params(strategy, params).items():
+        spec = STRATEGIES[name]
+        values = {alias: graph[node] for alias, node in spec.indicators(p).items()}
+        fields = spec.conditions(graph, values, p)
+        needs_history = fields.pop(NEEDS_HISTORY, None)
+        if incomplete is not None and needs_history is not None:
+            incomplete.update(np.flatnonzero(needs_history).tolist())
+        for j, result in enumerate(results):
+            result.update({field: column[j] for field, column in fields.items()})
+    return results
+
+
+def truncated(panel, ticker_ids, max_bars):
+    """Tickers de ``ticker_ids`` a los que la ventana de ``max_bars`` barras les recortó histórico.
+
+    Son los que marcó ``evaluate`` como incompletos y tienen cargadas
+    ``max_bars`` barras: hay que evaluarlos con todo el histórico.
+    """
+    if not max_bars or not ticker_ids:
+        return []
+    bars = (~np.isnat(panel.dates)).sum(axis=0)
+    return [t for j, t in enumerate(panel.tickers) if t.id in ticker_ids and bars[j] >= max_bars]
+
+
+def _node_timeframe(node):
+    """Temporalidad de las barras de las que sale ``node``."""
+    while node.op != 'bars':
+        node = node.inputs[0]
+    return dict(node.params)['timeframe']
+
+
+def signal_history(panel, strategy, params=None, column=0, graph=None):
+    """Series completas de indicadores, condiciones y entradas de una columna del panel.
+
+    Formato columnar por temporalidad: ``{tf: {'dates', 'indicators',
+    'conditions', 'entries'}}`` con listas alineadas a ``dates`` (NaN ->
+    None). Los nombres llevan el prefijo de su estrategia; las entradas
+    son siempre diarias.
+    """
+    graph = graph or IndicatorGraph(panel)
+    frames = {}
+
+    def frame(timeframe):
+        if timeframe not in frames:
+            dates = graph.dates(timeframe)[:, column]
+            valid = ~np.isnat(dates)
+            frames[timeframe] = valid, {
+                'dates': [str(d) for d in dates[valid]], 'indicators': {}, 'conditions': {}, 'entries': {}
+            }
+        return frames[timeframe]
+
+    for name, p in normalize_params(strategy, params).items():
+        spec = STRATEGIES[name]
+        nodes = spec.indicators(p)
+        values = {alias: graph[node] for alias, node in nodes.items()}
+        for alias, node in nodes.items():
+            valid, out = frame(_node_timeframe(node))
+            out['indicators'][f'{name}.{alias}'] = [_float(x) for x in values[alias][valid, column]]
+        for condition, (timeframe, cond) in (spec.series(graph, values, p) if spec.series else {}).items():
+            valid, out = frame(timeframe)
+            out['conditions'][f'{name}.{condition}'] = cond[valid, column].tolist()
+        for signal, cond in (spec.entries(graph, values, p) if spec.entries else {}).items():
+            valid, out = frame('D')
+            out['entries'][f'{name}.{signal}'] = cond[valid, column].tolist()
+    return {timeframe: out for timeframe, (_, out) in sorted(frames.items(), key=lambda f: TIMEFRAMES.index(f[0]))}
+
+
+def _converged(alpha, tol=1e-8):
+    """Barras hasta que el peso de la semilla de una media exponencial cae bajo ``tol``."""
+    return math.ceil(math.log(tol) / math.log(1.0 - alpha))
+
+
+def _fmt(d):
+    return None if np.isnat(d) else d.astype(object).strftime('%y-%m-%d')
+
+
+def _float(v):
+    return None if np.isnan(v) else float(v)
+
+
+def _pick(dates, idx):
+    """Fecha en la fila ``idx`` de cada columna (NaT donde ``idx`` es -1)."""
+    picked = dates[np.maximum(idx, 0), np.arange(dates.shape[1])]
+    return np.where(idx >= 0, picked, _NAT)
+
+
+def _days(today, d):
+    return None if np.isnat(d) else int((today - d).astype(int))
+
+
+def format_last_sync(last_sync):
+    return last_sync.strftime('%y-%m-%d %H:%M') if last_sync else 'Never'
+
+
+def _base_results(panel):
+    return [{
+        'symbol': t.symbol,
+        'price': float(panel.close[-1, j]),
+        'price_date': _fmt(panel.dates[-1, j]),
+        'last_sync': format_last_sync(t.last_sync)
+    } for j, t in enumerate(panel.tickers)]
+
+
+# --- Estrategias -----------------------------------------------------------
+
+def _rsi_macd_series(g, v, p):
+    with np.errstate(invalid='ignore'):
+        return {
+            'oversold': ('D', v['rsi'] < p['oversold']),
+            'rsi_above_sma': ('D', v['rsi'] > v['rsi_sma']),
+            'macd_active': ('D', (v['macd'] > v['signal']) & (v['macd'] <= 0)),
+        }
+
+
+def _rsi_macd_entries(g, v, p):
+    dates = g.dates()
+    rows = np.arange(len(dates))[:, None]
+    (_, oversold), (_, above), (_, macd_on) = _rsi_macd_series(g, v, p).values()
+    # Cruce alcista: primera barra con RSI > SMA después del último oversold
+    # (ocurrido dentro de oversold_days), como date_rsi_bullish en cada barra
+    last_oversold = ind.last_true_so_far(oversold)
+    prev_above = np.full_like(last_oversold, -1)
+    prev_above[1:] = ind.last_true_so_far(above)[:-1]
+    oversold_date = dates[np.maximum(last_oversold, 0), np.arange(dates.shape[1])]
+    recent = oversold_date >= dates - np.timedelta64(p['oversold_days'], 'D')
+    return {
+        'rsi_bullish': above & (last_oversold >= 0) & (rows > last_oversold) & (prev_above <= last_oversold) & recent,
+        'macd': ind.rising(macd_on),
+    }
+
+
+def _on_daily(g, cond, timeframe):
+    """Eventos de una temporalidad mayor en la última barra diaria de cada período.
+
+    Un período solo se conoce completo al cierre de su última barra diaria,
+    así que la entrada se ubica ahí (la del período en curso, en la última
+    barra del panel).
+    """
+    daily = g.dates('D')
+    n_cols = daily.shape[1]
+    cols = np.arange(n_cols)
+    rows, event_cols = np.nonzero(cond)
+    events = period_index(g.dates(timeframe)[rows, event_cols], timeframe) * n_cols + event_cols
+    valid = ~np.isnat(daily)
+    periods = period_index(np.where(valid, daily, np.datetime64(0, 'D')), timeframe)
+    period_last = valid.copy()
+    period_last[:-1] &= periods[:-1] != periods[1:]
+    return period_last & np.isin(periods * n_cols + cols, events)
+
+
+def _emas_cond(close_values, emas):
+    with np.errstate(invalid='ignore'):
+        return np.logical_and.reduce([close_values > e for e in emas])
+
+
+def _emas_series(g, v, p):
+    return {
+        'emas_d': ('D', _emas_cond(v['close_d'], [v['ema4_d'], v['ema9_d'], v['ema18_d']])),
+        'emas_w': ('W', _emas_cond(v['close_w'], [v['ema4_w'], v['ema9_w'], v['ema18_w']])),
+    }
+
+
+def _emas_entries(g, v, p):
+    (_, daily), (_, weekly) = _emas_series(g, v, p).values()
+    return {'emas_d': ind.rising(daily), 'emas_w': _on_daily(g, ind.rising(weekly), 'W')}
+
+
+@register(
+    'rsi_macd',
+    params={'rsi_length': 14, 'rsi_sma_length': 14, 'oversold': 30.0, 'oversold_days': 365,
+            'macd_fast': 12, 'macd_slow': 26, 'macd_signal': 9, 'macd_days': 30},
+    # Largos de hasta 500 barras y ventanas de hasta 10 años: acotan las barras a cargar
+    limits={'rsi_length': (1, 500), 'rsi_sma_length': (1, 500), 'oversold': (0.01, 100.0),
+            'oversold_days': (1, 3650), 'macd_fast': (1, 500), 'macd_slow': (1, 500), 'macd_signal': (1, 500),
+            'macd_days': (1, 3650)},
+    indicators=lambda p: {
+        'rsi': rsi(close(), p['rsi_length']),
+        'rsi_sma': sma(rsi(close(), p['rsi_length']), p['rsi_sma_length']),
+        'macd': macd_line(close(), fast=p['macd_fast'], slow=p['macd_slow'], signal=p['macd_signal']),
+        'signal': macd_signal(close(), fast=p['macd_fast'], slow=p['macd_slow'], signal=p['macd_signal']),
+    },
+    # Sesiones en oversold_days (~262 en un año) más barras hasta que la semilla
+    # de RSI y MACD pesa < 1e-8 (262 + 263 barras con los valores por defecto)
+    window=lambda p: StrategyWindow(
+        lookback=p['oversold_days'] * 5 // 7 + 2,
+        warmup=max(_converged(1.0 / p['rsi_length']) + p['rsi_sma_length'],
+                   _converged(2.0 / (max(p['macd_fast'], p['macd_slow']) + 1)) + p['macd_signal']),
+    ),
+    # Un cruce alcista nuevo cambia su fecha; el MACD pasa entre active/inactive/none
+    states=('date_rsi_bullish', 'macd_status'),
+    entries=_rsi_macd_entries,
+    series=_rsi_macd_series,
+)
+def rsi_macd(g, v, p):
+    dates, today = g.dates(), g.today
+
+    last_year = dates >= today - np.timedelta64(p['oversold_days'], 'D')
+    oversold_idx = ind.last_true(last_year & (v['rsi'] < p['oversold']))
+    bullish_idx = ind.first_after(last_year & (v['rsi'] > v['rsi_sma']), oversold_idx)
+
+    last_30 = dates >= today - np.timedelta64(p['macd_days'], 'D')
+    cond = last_30 & (v['macd'] > v['signal']) & (v['macd'] <= 0)
+    active_today = cond[-1]
+    macd_idx = np.where(active_today, ind.streak_start(cond), ind.last_true(cond))
+    macd_status = np.where(active_today, 'active', np.where(macd_idx >= 0, 'inactive', 'none'))
+
+    oversold_dates = _pick(dates, oversold_idx)
+    bullish_dates = _pick(dates, bullish_idx)
+    macd_dates = _pick(dates, macd_idx)
+    return {
+        'rsi': [_float(x) for x in v['rsi'][-1]],
+        'days_since_rsi_30': [_days(today, d) for d in oversold_dates],
+        'date_rsi_30': [_fmt(d) for d in oversold_dates],
+        'days_since_rsi_bullish': [_days(today, d) for d in bullish_dates],
+        'date_rsi_bullish': [_fmt(d) for d in bullish_dates],
+        'macd_status': macd_status.tolist(),
+        'macd_date': [_fmt(d) for d in macd_dates],
+        'macd_days': [_days(today, d) for d in macd_dates],
+    }
+
+
+def _emas_state(close_values, emas, dates, today, warmup, cap_today=False):
+    cond = _emas_cond(close_values, emas)
+    active = cond[-1]
+    idx = np.where(active, ind.streak_start(cond), ind.last_true(cond))
+    when = _pick(dates, idx)
+    if cap_today:
+        # Si el viernes de la racha aún no llegó, se limita a hoy
+        when = np.where(np.isnat(when), when, np.minimum(when, today))
+    # La racha o el último cruce no aparecen después del warm-up de la primera
+    # barra cargada: pueden estar (o cambiar) antes de la ventana
+    needs_history = idx < ind.first_true(~np.isnat(dates)) + warmup
+    return active, when, needs_history
+
+
+@register(
+    '3_emas',
+    params={'ema_fast': 4, 'ema_mid': 9, 'ema_slow': 18},
+    limits={'ema_fast': (1, 500), 'ema_mid': (1, 500), 'ema_slow': (1, 500)},
+    indicators=lambda p: {
+        'close_d': close('D'),
+        'ema4_d': ema(close('D'), p['ema_fast']),
+        'ema9_d': ema(close('D'), p['ema_mid']),
+        'ema18_d': ema(close('D'), p['ema_slow']),
+        'close_w': close('W'),
+        'ema4_w': ema(close('W'), p['ema_fast']),
+        'ema9_w': ema(close('W'), p['ema_mid']),
+        'ema18_w': ema(close('W'), p['ema_slow']),
+    },
+    # Rachas semanales de ema_slow semanas más las semanas hasta que la semilla de
+    # la EMA semanal más lenta pesa < 1e-8 (90 + 835 barras diarias con los valores
+    # por defecto). Las rachas y cruces más viejos se recalculan con todo el
+    # histórico (ver NEEDS_HISTORY)
+    window=lambda p: StrategyWindow(
+        lookback=5 * max(p.values()),
+        warmup=5 * (_converged(2.0 / (max(p.values()) + 1)) + 1),
+    ),
+    states=('emas_d_active', 'emas_w_active'),
+    entries=_emas_entries,
+    series=_emas_series,
+)
+def three_emas(g, v, p):
+    today = g.today
+    warmup = _converged(2.0 / (max(p.values()) + 1))
+    d_active, d_when, d_partial = _emas_state(v['close_d'], [v['ema4_d'], v['ema9_d'], v['ema18_d']],
+                                              g.dates('D'), today, warmup)
+    w_active, w_when, w_partial = _emas_state(v['close_w'], [v['ema4_w'], v['ema9_w'], v['ema18_w']],
+                                              g.dates('W'), today, warmup, cap_today=True)
+    return {
+        'emas_d_active': d_active.tolist(),
+        'emas_d_date': [_fmt(d) for d in d_when],
+        'emas_d_days': [_days(today, d) for d in d_when],
+        'emas_w_active': w_active.tolist(),
+        'emas_w_date': [_fmt(d) for d in w_when],
+        'emas_w_days': [_days(today, d) for d in w_when],
+        'ema4_d': [_float(x) for x in v['ema4_d'][-1]],
+        'ema9_d': [_float(x) for x in v['ema9_d'][-1]],
+        'ema18_d': [_float(x) for x in v['ema18_d'][-1]],
+        NEEDS_HISTORY: d_partial | w_partial,
+    }
@@ -0,0 +1,231 @@
+"""
+Indicadores incrementales (streaming) con actualización O(1) por barra.
+
+Cada objeto guarda su estado recursivo (última EMA, promedios de
+ganancia/pérdida de Wilder, buffer circular de la SMA) y se actualiza con
+``update(valor)`` a medida que llegan barras nuevas, sin recalcular toda la
+serie. Los valores reproducen los de pandas_ta (sin TA-Lib) dentro de la
+tolerancia de punto flotante:
+
+- ``EMA``: semilla SMA de las primeras ``length`` barras (``presma=True``).
+- ``RMA``: media de Wilder (``ewm(alpha=1/length, adjust=False)``).
+- ``SMA``: media simple; una ventana con NaN devuelve NaN.
+- ``RSI``: RMA de ganancias y pérdidas, como ``ta.rsi``.
+- ``MACD``: EMA rápida/lenta y señal sembrada con la SMA de los primeros
+  valores válidos del MACD, como ``ta.macd``.
+
+Todos los estados se serializan con ``to_dict()`` (JSON) y se restauran con
+``from_dict()``.
+"""
+import math
+from collections import deque
+
+NAN = float('nan')
+
+
+def _is_nan(value):
+    return value is None or math.isnan(value)
+
+
+class EMA:
+    kind = 'ema'
+
+    def __init__(self, length):
+        self.length = int(length)
+        self.alpha = 2.0 / (self.length + 1)
+        self.value = NAN
+        self._seed = []
+
+    def update(self, x):
+        if _is_nan(x):
+            return self.value
+        x = float(x)
+        if self._seed is not None:
+            self._seed.append(x)
+            if len(self._seed) == self.length:
+                self.value = sum(self._seed) / self.length
+                self._seed = None
+            return self.value
+        self.value = self.alpha * x + (1.0 - self.alpha) * self.value
+        return self.value
+
+    @property
+    def ready(self):
+        return self._seed is None
+
+    def to_dict(self):
+        return {'type': self.kind, 'length': self.length, 'value': _dump(self.value), 'seed': self._seed}
+
+    @classmethod
+    def from_dict(cls, data):
+        obj = cls(data['length'])
+        obj.value = _load(data['value'])
+        obj._seed = list(data['seed']) if data['seed'] is not None else None
+        return obj
+
+
+class RMA:
+    kind = 'rma'
+
+    def __init__(self, length):
+        self.length = int(length)
+        self.alpha = 1.0 / self.length if self.length > 0 else 0.5
+        self.value = NAN
+
+    def update(self, x):
+        if _is_nan(x):
+            return self.value
+        x = float(x)
+        if math.isnan(self.value):
+            self.value = x
+        else:
+            self.value = self.alpha * x + (1.0 - self.alpha) * self.value
+        return self.value
+
+    def to_dict(self):
+        return {'type': self.kind, 'length': self.length, 'value': _dump(self.value)}
+
+    @classmethod
+    def from_dict(cls, data):
+        obj = cls(data['length'])
+        obj.value = _load(data['value'])
+        return obj
+
+
+class SMA:
+    kind = 'sma'
+
+    def __init__(self, length):
+        self.length = int(length)
+        self._window = deque(maxlen=self.length)
+        self._sum = 0.0
+        self._nans = 0
+        self.value = NAN
+
+    def update(self, x):
+        x = NAN if x is None else float(x)
+        if len(self._window) == self.length:
+            old = self._window[0]
+            if math.isnan(old):
+                self._nans -= 1
+            else:
+                self._sum -= old
+        self._window.append(x)
+        if math.isnan(x):
+            self._nans += 1
+        else:
+            self._sum += x
+        if len(self._window) < self.length or self._nans:
+            self.value = NAN
+        else:
+            self.value = self._sum / self.length
+        return self.value
+
+    def to_dict(self):
+        return {'type': self.kind, 'length': self.length, 'window': [_dump(v) for v in self._window]}
+
+    @classmethod
+    def from_dict(cls, data):
+        obj = cls(data['length'])
+        for v in data['window']:
+            obj.update(_load(v))
+        return obj
+
+
+class RSI:
+    kind = 'rsi'
+
+    def __init__(self, length=14, scalar=100):
+        self.length = int(length)
+        self.scalar = scalar
+        self.prev = NAN
+        self.gain = RMA(self.length)
+        self.loss = RMA(self.length)
+        self.value = NAN
+
+    def update(self, close):
+        if _is_nan(close):
+            return self.value
+        close = float(close)
+        if not math.isnan(self.prev):
+            delta = close - self.prev
+            avg_gain = self.gain.update(max(delta, 0.0))
+            avg_loss = self.loss.update(max(-delta, 0.0))
+            total = avg_gain + avg_loss
+            self.value = self.scalar * avg_gain / total if total else NAN
+        self.prev = close
+        return self.value
+
+    def to_dict(self):
+        return {
+            'type': self.kind, 'length': self.length, 'scalar': self.scalar,
+            'prev': _dump(self.prev), 'value': _dump(self.value),
+            'gain': self.gain.to_dict(), 'loss': self.loss.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        obj = cls(data['length'], data['scalar'])
+        obj.prev = _load(data['prev'])
+        obj.value = _load(data['value'])
+        obj.gain = RMA.from_dict(data['gain'])
+        obj.loss = RMA.from_dict(data['loss'])
+        return obj
+
+
+class MACD:
+    kind = 'macd'
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        if slow < fast:
+            fast, slow = slow, fast
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal_ema = EMA(signal)
+        self.macd = NAN
+        self.signal = NAN
+        self.histogram = NAN
+
+    def update(self, close):
+        fast = self.fast.update(close)
+        slow = self.slow.update(close)
+        if not _is_nan(close) and self.fast.ready and self.slow.ready:
+            self.macd = fast - slow
+            self.signal = self.signal_ema.update(self.macd)
+            self.histogram = self.macd - self.signal
+        return self.macd, self.histogram, self.signal
+
+    def to_dict(self):
+        return {
+            'type': self.kind,
+            'fast': self.fast.to_dict(), 'slow': self.slow.to_dict(), 'signal_ema': self.signal_ema.to_dict(),
+            'macd': _dump(self.macd), 'signal': _dump(self.signal), 'histogram': _dump(self.histogram)
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        obj = cls()
+        obj.fast = EMA.from_dict(data['fast'])
+        obj.slow = EMA.from_dict(data['slow'])
+        obj.signal_ema = EMA.from_dict(data['signal_ema'])
+        obj.macd = _load(data['macd'])
+        obj.signal = _load(data['signal'])
+        obj.histogram = _load(data['histogram'])
+        return obj
+
+
+_KINDS = {cls.kind: cls for cls in (EMA, RMA, SMA, RSI, MACD)}
+
+
+def from_dict(data):
+    """Restaura cualquier indicador serializado con ``to_dict()``."""
+    return _KINDS[data['type']].from_dict(data)
+
+
+def _dump(value):
+    # JSON no admite NaN: se serializa como None
+    return None if _is_nan(value) else value
+
+
+def _load(value):
+    return NAN if value is None else float(value)